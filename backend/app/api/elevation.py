@@ -1,8 +1,29 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from typing import List, Optional, Tuple
+import json
 import sqlite3
 import math
-from pydantic import BaseModel
+import os
+import secrets
+import threading
+import numpy as np
+from pydantic import BaseModel, Field, ValidationError
+from elevation_common.elevation_profile import profile_statistics, resample_line
+from elevation_common.geodesy import METRES_PER_DEGREE, segment_lengths
+from app.core.config import settings
+from app.core.executors import elevation_executor
+from app.services.elevation_batcher import ElevationBatcher
+from app.services.elevation_cache import CachedLevel, LRUTileCache
+from app.services.elevation_datasets import ElevationDatasets
+from app.services.elevation_grid import (
+    ElevationGrid, ElevationTile, SQLiteTileSource, downsample_tile, level_for_spacing, overview_levels
+)
+from app.services.elevation_idw import PointIndex, inverse_distance_weights
+from app.services.elevation_index import ElevationIndex
+from app.services.elevation_roads import RoadProfileIndex, RoadProfileSource
+from app.services.elevation_tiles import TileStore
+from app.services import polyline
+from app.services.polyline import PolylineError
 
 router = APIRouter()
 
@@ -12,94 +33,314 @@ class ElevationRequest(BaseModel):
 class ElevationResponse(BaseModel):
     results: List[dict]  # [{"latitude": float, "longitude": float, "elevation": float}]
 
+class ProfileRequest(BaseModel):
+    coordinates: List[Tuple[float, float]]  # route polyline as [[lat, lng], ...]
+    interval: float = Field(default=20.0, gt=0)  # metres between samples
+    snap_to_roads: bool = False  # read on-road samples from the road profiles
+
+class ProfileResponse(BaseModel):
+    distance: float
+    interval: float
+    ascent: float
+    descent: float
+    min_elevation: float
+    max_elevation: float
+    max_gradient: float
+    avg_gradient: float
+    samples: List[dict]  # [{"distance", "latitude", "longitude", "elevation", "gradient", "local_max_gradient"}]
+
+class ReloadRequest(BaseModel):
+    db_path: Optional[str] = None  # defaults to the current database
+    tile_path: Optional[str] = None  # defaults to the current tile store, or the new database's; "" for none
+
 class ElevationService:
-    def __init__(self, db_path: str = "../elevation-scraper/elevation.db"):
+    def __init__(
+        self,
+        db_path: str = settings.ELEVATION_DB_PATH,
+        tile_path: Optional[str] = settings.ELEVATION_TILE_PATH,
+        cells_per_degree: int = settings.ELEVATION_GRID_CELLS_PER_DEGREE,
+        search_radius: float = settings.ELEVATION_GRID_SEARCH_RADIUS,
+        cache_bytes: int = settings.ELEVATION_TILE_CACHE_MB * 1024 * 1024,
+        knn_max_radius: float = settings.ELEVATION_KNN_MAX_RADIUS,
+        road_db_path: Optional[str] = settings.ELEVATION_ROAD_DB_PATH,
+        road_snap_metres: float = settings.ELEVATION_ROAD_SNAP_METRES
+    ):
         self.db_path = db_path
+        self.tile_path = tile_path
+        self.road_db_path = road_db_path
+        self.road_snap_metres = road_snap_metres
+        self.cells_per_degree = cells_per_degree
+        self.search_radius = search_radius
+        self.cache_bytes = cache_bytes
+        self.knn_max_radius = knn_max_radius
+        self.index = ElevationIndex(db_path)
+        # Fallback lookups outside the grid are rare, so their indexes get a quarter of the budget
+        self.point_cache = LRUTileCache(self._load_point_index, max(cache_bytes, 0) // 4)
+        self.road_cache = LRUTileCache(self._load_road_index, max(cache_bytes, 0) // 4)
+        self.tile_cache: Optional[LRUTileCache] = None
+        self.tile_store: Optional[TileStore] = None
+        self.tile_source: Optional[SQLiteTileSource] = None
+        self._grids: Optional[List[ElevationGrid]] = None
+        self._grid_lock = threading.Lock()
+    
+    @property
+    def grid(self) -> ElevationGrid:
+        """Full-resolution elevation grid"""
+        return self.grids[0]
+    
+    @property
+    def grids(self) -> List[ElevationGrid]:
+        """Elevation grid pyramid, finest first, opened on first use
+        
+        A prebuilt tile store is memory-mapped and shared by every worker; without
+        one, tiles are built from the database as they are first needed and
+        overviews are downsampled from them. Either way decoded tiles of every
+        level share a per-worker LRU cache of ``cache_bytes``.
+        """
+        if self._grids is None:
+            with self._grid_lock:
+                if self._grids is None:
+                    self._grids = self._open_grids()
+        return self._grids
+    
+    def _open_grids(self) -> List[ElevationGrid]:
+        if self.tile_path and os.path.exists(self.tile_path):
+            store = self.tile_store = TileStore(self.tile_path)
+            levels = [store.level(n) for n in range(store.levels)]
+            if self.cache_bytes <= 0:
+                return [ElevationGrid(store if n == 0 else level, level.cells_per_degree) for n, level in enumerate(levels)]
+            
+            def load(key):
+                tile = levels[key[0]].get(key[1:])
+                return None if tile is None else ElevationTile(tile.elevations().astype(np.float32))
+            
+            cells_per_degree = [level.cells_per_degree for level in levels]
+        else:
+            source = self.tile_source = SQLiteTileSource(self.db_path, self.cells_per_degree, self.search_radius)
+            
+            def load(key):
+                if key[0] == 0:
+                    return source.load(key[1:])
+                finer = self.tile_cache.get((key[0] - 1, *key[1:]))
+                return None if finer is None else downsample_tile(finer)
+            
+            cells_per_degree = overview_levels(self.cells_per_degree, settings.ELEVATION_OVERVIEW_LEVELS)
+        
+        self.tile_cache = LRUTileCache(load, max(self.cache_bytes, 0))
+        return [
+            ElevationGrid(CachedLevel(self.tile_cache, n), cells)
+            for n, cells in enumerate(cells_per_degree)
+        ]
+    
+    def reopen(self, db_path: Optional[str] = None, tile_path: Optional[str] = None) -> "ElevationService":
+        """A new service over the same (or the given) files with the same settings and empty caches"""
+        return ElevationService(
+            db_path=db_path or self.db_path,
+            tile_path=tile_path,
+            cells_per_degree=self.cells_per_degree,
+            search_radius=self.search_radius,
+            cache_bytes=self.cache_bytes,
+            knn_max_radius=self.knn_max_radius,
+            road_db_path=self.road_db_path,
+            road_snap_metres=self.road_snap_metres
+        )
+    
+    def files(self) -> List[str]:
+        """Every file the service reads, watched for dataset reloads"""
+        return [path for path in (self.db_path, self.tile_path, self.road_db_path) if path]
+    
+    def warm(self, previous: Optional["ElevationService"] = None):
+        """Open the grids and load the tiles ``previous`` has cached, least recent first
+        
+        Used before a reloaded dataset is swapped in, so the first requests
+        after the swap hit the same warm tiles the old dataset was serving.
+        """
+        levels = len(self.grids)
+        if os.path.exists(self.db_path):
+            self.index.storage()
+        if previous is None:
+            return
+        if self.tile_cache is not None and previous.tile_cache is not None:
+            for key in previous.tile_cache.keys():
+                if key[0] < levels:
+                    self.tile_cache.get(key)
+        for key in previous.point_cache.keys():
+            self.point_cache.get(key)
+        for key in previous.road_cache.keys():
+            self.road_cache.get(key)
+    
+    def close(self):
+        """Release the caches, tile store mapping and database connections"""
+        if self.tile_cache is not None:
+            self.tile_cache.clear()
+        self.point_cache.clear()
+        self.road_cache.clear()
+        self._grids = None
+        if self.tile_store is not None:
+            self.tile_store.close()
+            self.tile_store = None
+        if self.tile_source is not None:
+            self.tile_source.index.close()
+            self.tile_source = None
+        self.index.close()
+    
+    def cache_stats(self) -> Optional[dict]:
+        """Tile cache counters, None until the grid has been opened"""
+        return self.tile_cache.stats() if self.tile_cache else None
     
     def get_elevation_batch(self, coordinates: List[tuple]) -> List[dict]:
         """Get elevation for multiple coordinates with intelligent fallback"""
-        results = []
-        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                for lat, lng in coordinates:
-                    elevation = self._get_elevation_with_interpolation(conn, lat, lng)
-                    
-                    results.append({
-                        "latitude": lat,
-                        "longitude": lng,
-                        "elevation": elevation
-                    })
-                    
+            points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+            elevations = self.get_elevations(points[:, 0], points[:, 1])
         except Exception as e:
             # If local database fails, could fallback to external API here
             raise HTTPException(status_code=500, detail=f"Elevation service error: {str(e)}")
         
-        return results
-    
-    def _get_elevation_with_interpolation(self, conn, lat: float, lng: float) -> Optional[float]:
-        """Get elevation with intelligent interpolation if exact point not available"""
-        
-        # Try exact match first (within 0.0001 degrees ≈ 10m)
-        cursor = conn.execute("""
-            SELECT elevation FROM elevation_data 
-            WHERE lat BETWEEN ? AND ? 
-            AND lng BETWEEN ? AND ?
-            ORDER BY ABS(lat - ?) + ABS(lng - ?) ASC
-            LIMIT 1
-        """, (
-            lat - 0.0001, lat + 0.0001,
-            lng - 0.0001, lng + 0.0001,
-            lat, lng
-        ))
-        
-        result = cursor.fetchone()
-        if result:
-            return result[0]
-        
-        # If no close match, try broader search with interpolation
-        cursor = conn.execute("""
-            SELECT lat, lng, elevation FROM elevation_data 
-            WHERE lat BETWEEN ? AND ? 
-            AND lng BETWEEN ? AND ?
-            ORDER BY ABS(lat - ?) + ABS(lng - ?) ASC
-            LIMIT 4
-        """, (
-            lat - 0.01, lat + 0.01,  # ~1km radius
-            lng - 0.01, lng + 0.01,
-            lat, lng
-        ))
-        
-        nearby_points = cursor.fetchall()
-        
-        if len(nearby_points) >= 3:
-            # Use inverse distance weighting for interpolation
-            return self._interpolate_elevation(lat, lng, nearby_points)
-        elif len(nearby_points) > 0:
-            # Return closest point
-            return nearby_points[0][2]
-        else:
-            # No data available - could estimate based on region or return None
-            return self._estimate_elevation(lat, lng)
+        return [
+            {"latitude": lat, "longitude": lng, "elevation": elevation}
+            for (lat, lng), elevation in zip(coordinates, elevations.tolist())
+        ]
+    
+    def get_elevations(
+        self,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        spacing: Optional[float] = None,
+        snap_to_roads: bool = False
+    ) -> np.ndarray:
+        """Elevations for arrays of coordinates: grid, then nearest points, then estimate
+        
+        ``spacing`` is the distance in metres between the points, e.g. a profile's
+        sample interval. Sparse samples are read from the coarsest overview whose
+        nodes are no further apart, falling back to full resolution where it has no data.
+        With ``snap_to_roads``, points within ``road_snap_metres`` of a stored road
+        profile are interpolated along the road instead, and only the rest use the grid.
+        """
+        if snap_to_roads:
+            elevations = self.get_road_elevations(lats, lngs)
+            off_road = np.isnan(elevations)
+            if off_road.any():
+                elevations[off_road] = self.get_elevations(lats[off_road], lngs[off_road], spacing)
+            return elevations
+        
+        level = 0 if spacing is None else level_for_spacing([grid.cells_per_degree for grid in self.grids], spacing)
+        elevations = self.grids[level].sample(lats, lngs)
+        
+        missing = np.isnan(elevations)
+        if level and missing.any():
+            elevations[missing] = self.grid.sample(lats[missing], lngs[missing])
+            missing = np.isnan(elevations)
+        if missing.any():
+            elevations[missing] = self._get_nearest_elevations(lats[missing], lngs[missing])
+        
+        # No data available - estimate based on region
+        for i in np.nonzero(np.isnan(elevations))[0]:
+            elevations[i] = self._estimate_elevation(lats[i], lngs[i])
+        
+        return elevations
+    
+    def get_route_profile(self, coordinates: List[tuple], interval: float, snap_to_roads: bool = False) -> dict:
+        """Elevation profile of a route polyline resampled every ``interval`` metres"""
+        points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        lats, lngs, distances = resample_line(points[:, 0], points[:, 1], interval)
+        elevations = self.get_elevations(lats, lngs, spacing=interval, snap_to_roads=snap_to_roads)
+        stats = profile_statistics(distances, elevations)
+        
+        return {
+            "distance": float(distances[-1]),
+            "interval": interval,
+            "ascent": round(stats.total_ascent, 1),
+            "descent": round(stats.total_descent, 1),
+            "min_elevation": round(stats.min_elevation, 1),
+            "max_elevation": round(stats.max_elevation, 1),
+            "max_gradient": round(stats.max_gradient, 2),
+            "avg_gradient": round(stats.avg_gradient, 2),
+            "samples": [
+                {
+                    "distance": round(distance, 1),
+                    "latitude": lat,
+                    "longitude": lng,
+                    "elevation": round(elevation, 1),
+                    "gradient": None if math.isnan(gradient) else round(gradient, 2),
+                    "local_max_gradient": None if math.isnan(local_max) else round(local_max, 2)
+                }
+                for distance, lat, lng, elevation, gradient, local_max in zip(
+                    distances.tolist(), lats.tolist(), lngs.tolist(), elevations.tolist(),
+                    stats.gradients.tolist(), stats.local_max_gradients.tolist()
+                )
+            ]
+        }
+    
+    def get_road_elevations(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """Elevations interpolated along the nearest road profile, NaN off-road
+        
+        Points are grouped by 1° tile and snapped in one batch per tile's
+        RoadProfileIndex; NaN beyond ``road_snap_metres`` of every road.
+        """
+        elevations = np.full(lats.shape, np.nan)
+        if not self.road_db_path or not os.path.exists(self.road_db_path):
+            return elevations
+        
+        keys = np.stack([np.floor(lats), np.floor(lngs)], axis=1).astype(np.int64)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        for group, key in enumerate(map(tuple, unique_keys.tolist())):
+            road_index = self.road_cache.get(key)
+            if road_index is None:
+                continue
+            members = np.nonzero(inverse.ravel() == group)[0]
+            elevations[members], _ = road_index.snap(lats[members], lngs[members], self.road_snap_metres)
+        
+        return elevations
     
-    def _interpolate_elevation(self, target_lat: float, target_lng: float, points: List[tuple]) -> float:
-        """Interpolate elevation using inverse distance weighting"""
-        total_weight = 0
-        weighted_elevation = 0
+    def _get_nearest_elevations(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """Interpolate from the nearest stored points where the grid has no coverage
+        
+        Points are grouped by 1° tile and answered from that tile's PointIndex in
+        one vectorized kNN query; NaN where nothing is within ``knn_max_radius``.
+        """
+        elevations = np.full(lats.shape, np.nan)
+        keys = np.stack([np.floor(lats), np.floor(lngs)], axis=1).astype(np.int64)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
         
-        for point_lat, point_lng, elevation in points:
-            # Calculate distance
-            distance = math.sqrt((target_lat - point_lat)**2 + (target_lng - point_lng)**2)
+        for group, key in enumerate(map(tuple, unique_keys.tolist())):
+            point_index = self.point_cache.get(key)
+            if point_index is None:
+                continue
             
-            if distance == 0:
-                return elevation  # Exact match
+            members = np.nonzero(inverse.ravel() == group)[0]
+            distances, neighbours = point_index.query(
+                lats[members], lngs[members], k=4,
+                max_distance=self.knn_max_radius * METRES_PER_DEGREE
+            )
+            found = (neighbours >= 0).sum(axis=1)
+            values = point_index.elevations[neighbours]
             
-            # Inverse distance weighting
-            weight = 1 / (distance ** 2)
-            weighted_elevation += elevation * weight
-            total_weight += weight
+            # Use inverse distance weighting with 3+ neighbours, else the closest point
+            interpolated = (inverse_distance_weights(distances) * values).sum(axis=1)
+            elevations[members] = np.where(
+                found >= 3, interpolated, np.where(found > 0, values[:, 0], np.nan)
+            )
         
-        return weighted_elevation / total_weight if total_weight > 0 else 0
+        return elevations
+    
+    def _load_point_index(self, key) -> Optional[PointIndex]:
+        """PointIndex of the stored points within knn_max_radius of a tile"""
+        if not os.path.exists(self.db_path):
+            return None
+        
+        lat_min, lng_min = key
+        points = self.index.window(
+            lat_min - self.knn_max_radius, lat_min + 1 + self.knn_max_radius,
+            lng_min - self.knn_max_radius, lng_min + 1 + self.knn_max_radius
+        )
+        if points.size == 0:
+            return None
+        return PointIndex(points[:, 0], points[:, 1], points[:, 2])
+    
+    def _load_road_index(self, key) -> Optional[RoadProfileIndex]:
+        """RoadProfileIndex of the road profiles a point of the tile can snap to"""
+        return RoadProfileSource(self.road_db_path, self.road_snap_metres).load(key)
     
     def _estimate_elevation(self, lat: float, lng: float) -> float:
         """Rough elevation estimation based on geographic location"""
@@ -122,21 +363,185 @@ class ElevationService:
         # Default continental elevation
         return 200
 
-# Initialize service
-elevation_service = ElevationService()
+# Initialize service; reloads swap in a new generation without a restart
+elevation_datasets = ElevationDatasets(ElevationService())
+
+def _start_dataset_watch():
+    if settings.ELEVATION_RELOAD_POLL_SECONDS > 0:
+        elevation_datasets.watch(settings.ELEVATION_RELOAD_POLL_SECONDS)
+
+def _stop_dataset_watch():
+    elevation_datasets.stop()
+
+# The file watch runs with the app that serves the router, not on import
+router.add_event_handler("startup", _start_dataset_watch)
+router.add_event_handler("shutdown", _stop_dataset_watch)
+
+def _resolve_elevations(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    with elevation_datasets.acquire() as service:
+        return service.get_elevations(lats, lngs)
+
+# Concurrent lookups are coalesced into one deduplicated pass over the service
+elevation_batcher = ElevationBatcher(
+    _resolve_elevations,
+    elevation_executor,
+    window=settings.ELEVATION_BATCH_WINDOW_MS / 1000,
+    max_points=settings.ELEVATION_BATCH_MAX_POINTS
+)
 
-@router.post("/lookup", response_model=ElevationResponse)
-async def get_elevation(request: ElevationRequest):
+# Media types of the compact /lookup encodings (Content-Type in, Accept out)
+COLUMNS_MEDIA_TYPE = "application/vnd.baroudeek.columns+json"  # {"lats": [...], "lngs": [...]}
+POLYLINE_MEDIA_TYPE = "application/vnd.baroudeek.polyline"  # encoded polyline; ;precision=5|6
+BINARY_MEDIA_TYPE = "application/octet-stream"  # little-endian float32 elevations
+
+LOOKUP_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": ElevationRequest.model_json_schema()},
+            COLUMNS_MEDIA_TYPE: {"schema": {
+                "type": "object",
+                "properties": {
+                    "lats": {"type": "array", "items": {"type": "number"}},
+                    "lngs": {"type": "array", "items": {"type": "number"}}
+                },
+                "required": ["lats", "lngs"]
+            }},
+            POLYLINE_MEDIA_TYPE: {"schema": {"type": "string"}}
+        }
+    }
+}
+
+def _media_type(header: str) -> Tuple[str, dict]:
+    """Split a Content-Type header into its media type and parameters"""
+    media_type, *params = header.split(";")
+    parameters = {}
+    for param in params:
+        name, _, value = param.partition("=")
+        parameters[name.strip().lower()] = value.strip().strip('"')
+    return media_type.strip().lower(), parameters
+
+def _reject_constant(name: str):
+    """json.loads hook: Python's parser accepts NaN and Infinity, which aren't JSON or coordinates"""
+    raise ValueError(f"{name} is not a valid number")
+
+def _parse_lookup(content_type: str, body: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Coordinates of a compact /lookup body as (lats, lngs) arrays, checked to lie on the globe"""
+    media_type, params = _media_type(content_type)
+    
+    if media_type == POLYLINE_MEDIA_TYPE:
+        precision = params.get("precision", "5")
+        if precision not in ("5", "6"):
+            raise HTTPException(status_code=400, detail="Polyline precision must be 5 or 6")
+        try:
+            lats, lngs = polyline.decode(body.decode("ascii").strip(), precision=int(precision))
+        except (UnicodeDecodeError, PolylineError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid polyline: {e}")
+    else:
+        try:
+            columns = json.loads(body, parse_constant=_reject_constant)
+            lats = np.asarray(columns["lats"], dtype=np.float64)
+            lngs = np.asarray(columns["lngs"], dtype=np.float64)
+        except (ValueError, TypeError, KeyError) as e:
+            raise HTTPException(status_code=400, detail=f"Expected {{\"lats\": [...], \"lngs\": [...]}}: {e}")
+        if lats.ndim != 1 or lats.shape != lngs.shape:
+            raise HTTPException(status_code=400, detail="lats and lngs must be flat arrays of equal length")
+    
+    # NaN fails both comparisons; numbers too large for a float parse as infinity and fail them too
+    outside = ~((lats >= -90) & (lats <= 90) & (lngs >= -180) & (lngs <= 180))
+    if outside.any():
+        i = int(np.argmax(outside))
+        raise HTTPException(
+            status_code=400,
+            detail=f"Coordinate {i} ({lats[i]}, {lngs[i]}) is outside latitude [-90, 90] or longitude [-180, 180]"
+        )
+    return lats, lngs
+
+@router.post("/lookup", response_model=ElevationResponse, openapi_extra=LOOKUP_REQUEST_BODY)
+async def get_elevation(
+    request: Request,
+    spacing: Optional[float] = Query(None, gt=0, description="metres between the points, for overview lookups"),
+    snap_to_roads: bool = Query(False, description="interpolate points on a stored road along its profile")
+):
     """
     Get elevation data for multiple coordinates
     
-    Compatible with Open-Elevation API format for easy frontend integration
+    Compatible with Open-Elevation API format for easy frontend integration.
+    Large batches can skip the per-point objects: send ``lats``/``lngs`` columns
+    or an encoded polyline (see the media types above), and ask for
+    ``Accept: application/octet-stream`` to get the elevations back as packed
+    float32 in input order. Compact requests answered as JSON get
+    ``{"elevations": [...]}``. Points sampled far apart (e.g. a zoomed-out
+    profile) can pass ``spacing`` to be read from a coarser overview grid, and
+    points on cyclable roads can pass ``snap_to_roads`` to be interpolated along
+    the road scraper's dense profiles.
     """
+    content_type = request.headers.get("content-type", "application/json")
+    body = await request.body()
+    binary = BINARY_MEDIA_TYPE in request.headers.get("accept", "")
+    
+    if _media_type(content_type)[0] in (COLUMNS_MEDIA_TYPE, POLYLINE_MEDIA_TYPE):
+        lats, lngs = _parse_lookup(content_type, body)
+        locations = None
+    else:
+        try:
+            locations = ElevationRequest.model_validate_json(body).locations
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    
     try:
-        coordinates = [(loc["latitude"], loc["longitude"]) for loc in request.locations]
-        results = elevation_service.get_elevation_batch(coordinates)
+        if locations is not None:
+            lats = np.array([loc["latitude"] for loc in locations], dtype=np.float64)
+            lngs = np.array([loc["longitude"] for loc in locations], dtype=np.float64)
+        if spacing is None and not snap_to_roads:
+            elevations = await elevation_batcher.lookup(lats, lngs)
+        else:
+            with elevation_datasets.acquire() as service:
+                elevations = await elevation_executor.run(service.get_elevations, lats, lngs, spacing, snap_to_roads)
         
-        return ElevationResponse(results=results)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if locations is not None and not binary:
+        return ElevationResponse(results=[
+            {"latitude": loc["latitude"], "longitude": loc["longitude"], "elevation": elevation}
+            for loc, elevation in zip(locations, elevations.tolist())
+        ])
+    
+    if binary:
+        return Response(
+            content=elevations.astype("<f4").tobytes(),
+            media_type=BINARY_MEDIA_TYPE,
+            headers={"X-Elevation-Count": str(elevations.size)}
+        )
+    return Response(content=json.dumps({"elevations": elevations.tolist()}), media_type="application/json")
+
+@router.post("/profile", response_model=ProfileResponse)
+async def get_route_profile(request: ProfileRequest):
+    """
+    Elevation profile of a whole route
+    
+    The polyline is resampled every ``interval`` metres server-side, so clients
+    send the route once instead of subsampling it and computing gradients themselves.
+    """
+    if len(request.coordinates) < 2:
+        raise HTTPException(status_code=400, detail="A route needs at least two coordinates")
+    
+    points = np.asarray(request.coordinates, dtype=np.float64)
+    samples = segment_lengths(points[:, 0], points[:, 1]).sum() / request.interval
+    if samples > settings.ELEVATION_PROFILE_MAX_SAMPLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Route would need {samples:.0f} samples at {request.interval}m; "
+                   f"the limit is {settings.ELEVATION_PROFILE_MAX_SAMPLES}, use a larger interval"
+        )
+    
+    try:
+        with elevation_datasets.acquire() as service:
+            profile = await elevation_executor.run(
+                service.get_route_profile, request.coordinates, request.interval, request.snap_to_roads
+            )
+        return ProfileResponse(**profile)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -146,7 +551,10 @@ async def elevation_health():
     """Health check for elevation service"""
     try:
         # Test with a known location
-        test_results = elevation_service.get_elevation_batch([(51.4308, -0.9101)])  # London
+        with elevation_datasets.acquire() as service:
+            test_results = await elevation_executor.run(
+                service.get_elevation_batch, [(51.4308, -0.9101)]  # London
+            )
         
         return {
             "status": "healthy",
@@ -164,38 +572,71 @@ async def elevation_health():
 async def elevation_stats():
     """Get statistics about the elevation database"""
     try:
-        with sqlite3.connect(elevation_service.db_path) as conn:
-            # Count total points
-            cursor = conn.execute("SELECT COUNT(*) FROM elevation_data")
-            total_points = cursor.fetchone()[0]
-            
-            # Count coverage by region
-            cursor = conn.execute("""
-                SELECT 
-                    COUNT(*) as count,
-                    MIN(lat) as min_lat, MAX(lat) as max_lat,
-                    MIN(lng) as min_lng, MAX(lng) as max_lng
-                FROM elevation_data
-            """)
-            coverage = cursor.fetchone()
-            
-            # Scraping progress
-            cursor = conn.execute("""
+        return await elevation_executor.run(_elevation_stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _elevation_stats() -> dict:
+    with elevation_datasets.acquire() as service:
+        return _dataset_stats(service)
+
+def _dataset_stats(service: ElevationService) -> dict:
+    stats = service.index.statistics()
+    if stats is None:
+        # Database written before the running totals existed: scan it
+        coverage = service.index.coverage()
+        with sqlite3.connect(service.db_path) as conn:
+            progress = dict(conn.execute("""
                 SELECT status, COUNT(*) 
                 FROM scrape_progress 
                 GROUP BY status
-            """)
-            progress = dict(cursor.fetchall())
-            
-            return {
-                "total_elevation_points": total_points,
-                "coverage_bounds": {
-                    "lat_range": [coverage[1], coverage[2]],
-                    "lng_range": [coverage[3], coverage[4]]
-                },
-                "scraping_progress": progress,
-                "estimated_coverage_km2": total_points * 0.01  # Rough estimate
-            }
-            
+            """).fetchall())
+        stats = {"points": coverage[0], "bounds": coverage[1:], "sources": None, "accuracy": None, "grid_status": progress}
+    
+    total_points = stats["points"]
+    bounds = stats["bounds"]
+    return {
+        "total_elevation_points": total_points,
+        "coverage_bounds": {
+            "lat_range": [bounds[0], bounds[1]],
+            "lng_range": [bounds[2], bounds[3]]
+        },
+        "points_by_source": stats["sources"],
+        "points_by_accuracy": stats["accuracy"],
+        "scraping_progress": stats["grid_status"],
+        "estimated_coverage_km2": total_points * 0.01,  # Rough estimate
+        "tile_cache": service.cache_stats(),
+        "road_cache": service.road_cache.stats(),
+        "executor": elevation_executor.stats(),
+        "batcher": elevation_batcher.stats(),
+        "dataset": elevation_datasets.stats()
+    }
+
+@router.post("/admin/reload")
+async def reload_dataset(
+    request: Optional[ReloadRequest] = None,
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Load the elevation database and tile store again and swap them in
+    
+    The new generation is opened and warmed with the tiles currently being
+    served while requests keep running on the old one, which is closed once
+    they have drained. Pass ``db_path``/``tile_path`` to switch datasets, e.g.
+    to uk_elevation.db, which brings its own uk_elevation.tiles if there is
+    one. Requires the ``X-Admin-Token`` header to match
+    ``ELEVATION_ADMIN_TOKEN``.
+    """
+    if not settings.ELEVATION_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ELEVATION_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    
+    request = request or ReloadRequest()
+    if request.db_path and not os.path.exists(request.db_path):
+        raise HTTPException(status_code=400, detail=f"No elevation database at {request.db_path}")
+    
+    try:
+        return await elevation_executor.run(elevation_datasets.reload, request.db_path, request.tile_path)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Reload failed, still serving the previous dataset: {e}")
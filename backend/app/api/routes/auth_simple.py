@@ -3,6 +3,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.db.database import get_db
+from app.core.executors import db_executor
 from app.schemas.user import UserCreate, UserLogin, Token, UserResponse, UserStats
 from app.core.security import verify_password, get_password_hash, create_access_token, verify_token
 import uuid
@@ -14,6 +15,9 @@ security = HTTPBearer()
 
 @router.post("/register", response_model=Token)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+    return await db_executor.run(_register, user_data, db)
+
+def _register(user_data: UserCreate, db: Session):
     # Debug logging
     print(f"Registration attempt for email: {user_data.email}")
     print(f"Username: {user_data.username}")
@@ -98,6 +102,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 @router.post("/login", response_model=Token)
 async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+    return await db_executor.run(_login, user_credentials, db)
+
+def _login(user_credentials: UserLogin, db: Session):
     # Debug logging
     print(f"Login attempt for email: {user_credentials.email}")
     
@@ -156,6 +163,9 @@ async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
+    return await db_executor.run(_get_current_user, credentials, db)
+
+def _get_current_user(credentials: HTTPAuthorizationCredentials, db: Session):
     token_data = verify_token(credentials.credentials)
     
     user = db.execute(text("""
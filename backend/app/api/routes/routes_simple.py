@@ -5,6 +5,7 @@ from sqlalchemy import text
 from typing import List
 from datetime import datetime, timezone
 from app.db.database import get_db
+from app.core.executors import db_executor
 from app.schemas.route_simple import RouteCreateSimple, RouteUpdateSimple, RouteResponseSimple
 from app.core.security import verify_token
 import uuid
@@ -19,6 +20,9 @@ async def create_route(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
+    return await db_executor.run(_create_route, route_data, db, credentials)
+
+def _create_route(route_data: RouteCreateSimple, db: Session, credentials: HTTPAuthorizationCredentials):
     # Get current user
     token_data = verify_token(credentials.credentials)
     
@@ -109,6 +113,9 @@ async def get_user_routes(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
+    return await db_executor.run(_get_user_routes, db, credentials)
+
+def _get_user_routes(db: Session, credentials: HTTPAuthorizationCredentials):
     # Get current user
     token_data = verify_token(credentials.credentials)
     
@@ -171,6 +178,9 @@ async def get_route(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
+    return await db_executor.run(_get_route, route_id, db, credentials)
+
+def _get_route(route_id: str, db: Session, credentials: HTTPAuthorizationCredentials):
     # Get route
     route = db.execute(text("""
         SELECT id, user_id, name, description, distance, estimated_time, difficulty,
@@ -224,6 +234,9 @@ async def update_route(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
+    return await db_executor.run(_update_route, route_id, route_update, db, credentials)
+
+def _update_route(route_id: str, route_update: RouteUpdateSimple, db: Session, credentials: HTTPAuthorizationCredentials):
     # Get current user
     token_data = verify_token(credentials.credentials)
     
@@ -283,7 +296,7 @@ async def update_route(
         db.commit()
         
         # Return updated route
-        return await get_route(route_id, db, credentials)
+        return _get_route(route_id, db, credentials)
         
     except Exception as e:
         print(f"Error updating route: {e}")
@@ -299,6 +312,9 @@ async def delete_route(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
+    return await db_executor.run(_delete_route, route_id, db, credentials)
+
+def _delete_route(route_id: str, db: Session, credentials: HTTPAuthorizationCredentials):
     # Get current user
     token_data = verify_token(credentials.credentials)
     
@@ -0,0 +1,95 @@
+"""
+Dedicated thread pools for blocking work called from async handlers.
+
+Handlers are ``async def``, but SQLAlchemy sessions, sqlite3 and password
+hashing all block. Running that work on the event loop stalls every other
+request on the worker, so it is handed to a sized pool instead:
+
+    user = await db_executor.run(load_user, db, email)
+
+Each pool tracks its queue depth, busy threads and how long tasks waited for a
+thread, so saturation shows up in the health endpoint rather than as latency.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, TypeVar
+
+import numpy as np
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# Recent queue waits kept for percentiles
+_WAIT_SAMPLES = 1024
+
+
+class InstrumentedExecutor:
+    """Fixed-size thread pool with queue-depth and wait-time metrics"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=_WAIT_SAMPLES)
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.max_queued = 0
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run ``fn(*args, **kwargs)`` on the pool and await its result"""
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, fn, *args, **kwargs)
+        submitted = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+        def task():
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self._waits.append(time.perf_counter() - submitted)
+            try:
+                return call()
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        return await asyncio.get_running_loop().run_in_executor(self._pool, task)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits = np.array(self._waits) * 1000
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "max_queued": self.max_queued,
+                "wait_ms_p50": round(float(np.percentile(waits, 50)), 3) if waits.size else None,
+                "wait_ms_p99": round(float(np.percentile(waits, 99)), 3) if waits.size else None
+            }
+
+
+# Sized to the SQLAlchemy connection pool, so threads never wait on connections
+db_executor = InstrumentedExecutor("db", settings.DB_EXECUTOR_WORKERS)
+
+# Elevation lookups are NumPy/sqlite3 work that mostly releases the GIL
+elevation_executor = InstrumentedExecutor("elevation", settings.ELEVATION_EXECUTOR_WORKERS)
+
+EXECUTORS: List[InstrumentedExecutor] = [db_executor, elevation_executor]
+
+
+def executor_stats() -> Dict[str, Dict]:
+    """Metrics of every pool, keyed by name"""
+    return {executor.name: executor.stats() for executor in EXECUTORS}
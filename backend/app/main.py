@@ -4,6 +4,7 @@ from fastapi.middleware.gzip import GZipMiddleware
 from app.api.routes import auth_simple, routes_simple
 # from app.api.routes import auth, routes, collaboration, community  # Temporarily disabled
 from app.core.config import settings
+from app.core.executors import executor_stats
 from app.db.database import engine
 # from app.db.base import Base  # Temporarily disabled to avoid relationship issues
 
@@ -41,7 +42,7 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "version": "1.0.0"}
+    return {"status": "healthy", "version": "1.0.0", "executors": executor_stats()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,150 @@
+"""
+Micro-batching for concurrent elevation lookups.
+
+Requests arriving within a short window are merged: their points are
+concatenated, quantized coordinates are deduplicated, the unique points are
+resolved in one vectorized call on the elevation pool, and each request gets
+its own slice of the results back. Users panning over the same area ask for
+many of the same points, so a batch usually costs less than its requests
+would separately.
+
+    elevations = await batcher.lookup(lats, lngs)
+"""
+
+import asyncio
+from collections import Counter, deque
+from typing import Callable, Dict, List, Set, Tuple
+
+import numpy as np
+
+from app.core.executors import InstrumentedExecutor
+
+# Recent batch sizes kept for percentiles
+_BATCH_SAMPLES = 1024
+
+
+def quantized_keys(lats: np.ndarray, lngs: np.ndarray, decimals: int) -> np.ndarray:
+    """One int64 per coordinate rounded to ``decimals`` places (at most 7)"""
+    scale = 10 ** decimals
+    rows = np.round((np.asarray(lats, dtype=np.float64) + 90) * scale).astype(np.int64)
+    cols = np.round((np.asarray(lngs, dtype=np.float64) + 180) * scale).astype(np.int64)
+    return rows * (360 * scale + 1) + cols
+
+
+def _bucket(size: int) -> str:
+    """Power-of-two histogram bucket label of a batch size"""
+    low = 1 << (size.bit_length() - 1)
+    return str(low) if low == 1 else f"{low}-{2 * low - 1}"
+
+
+class ElevationBatcher:
+    """Coalesces concurrent lookups into deduplicated batches"""
+
+    def __init__(
+        self,
+        resolve: Callable[[np.ndarray, np.ndarray], np.ndarray],
+        executor: InstrumentedExecutor,
+        window: float = 0.002,
+        max_points: int = 50_000,
+        decimals: int = 6
+    ):
+        self.resolve = resolve
+        self.executor = executor
+        self.window = window
+        self.max_points = max_points
+        self.decimals = decimals
+        self._pending: List[Tuple[np.ndarray, np.ndarray, asyncio.Future]] = []
+        self._pending_points = 0
+        self._timer = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._batch_requests = Counter()
+        self._batch_points = deque(maxlen=_BATCH_SAMPLES)
+        self.batches = 0
+        self.requests = 0
+        self.points = 0
+        self.unique_points = 0
+
+    async def lookup(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """Elevations of the given points, resolved together with concurrent lookups"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        if lats.size == 0:
+            return np.empty(0)
+        if self.window <= 0:
+            self._record(1, lats.size, lats.size)
+            return await self.executor.run(self.resolve, lats, lngs)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((lats, lngs, future))
+        self._pending_points += lats.size
+
+        if self._pending_points >= self.max_points:
+            self._start(self._take())
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._on_window)
+
+        return await future
+
+    def _on_window(self):
+        self._timer = None
+        if self._pending:
+            self._start(self._take())
+
+    def _take(self) -> List[Tuple[np.ndarray, np.ndarray, asyncio.Future]]:
+        batch, self._pending, self._pending_points = self._pending, [], 0
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _start(self, batch: List[Tuple[np.ndarray, np.ndarray, asyncio.Future]]):
+        # Resolved in a task of its own so a cancelled request can't strand the others
+        task = asyncio.ensure_future(self._resolve(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: List[Tuple[np.ndarray, np.ndarray, asyncio.Future]]):
+        lats = np.concatenate([entry[0] for entry in batch])
+        lngs = np.concatenate([entry[1] for entry in batch])
+        _, first, inverse = np.unique(
+            quantized_keys(lats, lngs, self.decimals), return_index=True, return_inverse=True
+        )
+        self._record(len(batch), lats.size, first.size)
+
+        try:
+            elevations = await self.executor.run(self.resolve, lats[first], lngs[first])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        results = elevations[inverse]
+        offset = 0
+        for entry_lats, _, future in batch:
+            if not future.done():
+                future.set_result(results[offset:offset + entry_lats.size])
+            offset += entry_lats.size
+
+    def _record(self, requests: int, points: int, unique_points: int):
+        self.batches += 1
+        self.requests += requests
+        self.points += points
+        self.unique_points += unique_points
+        self._batch_requests[_bucket(requests)] += 1
+        self._batch_points.append(unique_points)
+
+    def stats(self) -> Dict:
+        sizes = np.array(self._batch_points)
+        return {
+            "window_ms": self.window * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "points": self.points,
+            "unique_points": self.unique_points,
+            "dedup_ratio": round(1 - self.unique_points / self.points, 4) if self.points else None,
+            "requests_per_batch": dict(sorted(self._batch_requests.items(), key=lambda item: int(item[0].split("-")[0]))),
+            "points_per_batch_p50": float(np.percentile(sizes, 50)) if sizes.size else None,
+            "points_per_batch_p99": float(np.percentile(sizes, 99)) if sizes.size else None
+        }
@@ -0,0 +1,107 @@
+"""
+Size-bounded LRU cache of decoded elevation tiles.
+
+Route profiles keep hitting the same few tiles, so decoded tiles are kept in
+memory up to a byte budget and the least recently used ones are evicted first.
+Hit/miss/eviction counters are exposed so the budget can be sized from real
+traffic.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from app.services.elevation_grid import ElevationTile, TileKey
+
+# Nominal cost of remembering that a tile has no data
+_MISSING_TILE_BYTES = 64
+
+
+class LRUTileCache:
+    """Thread-safe LRU of tiles produced by ``loader``, bounded by total bytes
+
+    ``loader`` returns the decoded tile for a key or None when there is no data;
+    empty tiles are cached too so uncovered areas don't go back to disk. Any
+    value with an ``nbytes`` size can be cached, e.g. a PointIndex per tile.
+    """
+
+    def __init__(self, loader: Callable[[TileKey], Optional[ElevationTile]], max_bytes: int):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self._tiles: "OrderedDict[TileKey, Optional[ElevationTile]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: TileKey, default=None) -> Optional[ElevationTile]:
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                tile = self._tiles[key]
+                return default if tile is None else tile
+            self.misses += 1
+
+        # Load outside the lock so slow disk reads don't serialise cache hits
+        tile = self.loader(key)
+        self._insert(key, tile)
+        return default if tile is None else tile
+
+    def _insert(self, key: TileKey, tile: Optional[ElevationTile]):
+        size = _entry_bytes(tile)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._tiles:
+                # Another thread loaded it concurrently
+                return
+            self._tiles[key] = tile
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self.nbytes -= _entry_bytes(evicted)
+                self.evictions += 1
+
+    def keys(self) -> List[TileKey]:
+        """Cached keys, least recently used first"""
+        with self._lock:
+            return list(self._tiles)
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._tiles),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+def _entry_bytes(tile: Optional[ElevationTile]) -> int:
+    return _MISSING_TILE_BYTES if tile is None else tile.nbytes
+
+
+class CachedLevel:
+    """Mapping-style ``get`` over one pyramid level of a cache keyed by (level, lat, lng)
+
+    Lets every level of a pyramid share a single cache and byte budget.
+    """
+
+    def __init__(self, cache: LRUTileCache, level: int):
+        self.cache = cache
+        self.level = level
+
+    def get(self, key: TileKey, default=None) -> Optional[ElevationTile]:
+        return self.cache.get((self.level, *key), default)
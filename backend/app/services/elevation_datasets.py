@@ -0,0 +1,207 @@
+"""
+Hot-swappable elevation dataset generations.
+
+The API serves one generation of the elevation data at a time: a service
+over a database and tile store, with its own caches and memory mappings. A
+reload opens the files again as a new generation, warms it in the
+background with the tiles the current one is serving, then swaps it in
+atomically:
+
+    with datasets.acquire() as service:
+        elevations = service.get_elevations(lats, lngs)
+
+Requests hold the generation they acquired until they finish, so a swap
+never changes the data under a running request. A replaced generation is
+closed, releasing its caches, mappings and connections, once its last
+request has drained.
+
+Reloads are triggered through the admin endpoint or by ``watch``, which
+polls the files and reloads once a change has settled, e.g. after a scraper
+finished a region or build_elevation_tiles replaced the tile store.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Protocol
+
+from elevation_common.dataset_files import Fingerprint, dataset_fingerprint
+
+from app.services.elevation_tiles import tile_path_for
+
+
+class DatasetService(Protocol):
+    db_path: str
+    tile_path: Optional[str]
+
+    def reopen(self, db_path: Optional[str] = None, tile_path: Optional[str] = None) -> "DatasetService": ...
+
+    def files(self) -> List[str]: ...
+
+    def warm(self, previous: "DatasetService"): ...
+
+    def close(self): ...
+
+
+class DatasetGeneration:
+    """One loaded version of the dataset and the requests still using it"""
+
+    def __init__(self, number: int, service: DatasetService, fingerprint: Fingerprint, warm_seconds: float = 0.0):
+        self.number = number
+        self.service = service
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+        self.warm_seconds = warm_seconds
+        self.active = 0
+        self.retired = False
+        self.closed = False
+
+    def describe(self) -> Dict:
+        return {
+            "generation": self.number,
+            "db_path": self.service.db_path,
+            "tile_path": self.service.tile_path,
+            "loaded_at": self.loaded_at,
+            "warm_seconds": round(self.warm_seconds, 3),
+            "active_requests": self.active
+        }
+
+
+class ElevationDatasets:
+    """The generation being served, swapped atomically on reload"""
+
+    def __init__(self, service: DatasetService):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._current = DatasetGeneration(1, service, dataset_fingerprint(service.files()))
+        self._draining: Dict[int, DatasetGeneration] = {}
+        self._pending: Optional[Fingerprint] = None
+        self._failed: Optional[Fingerprint] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def current(self) -> DatasetService:
+        """The service of the generation being served (not held against reloads)"""
+        return self._current.service
+
+    @contextmanager
+    def acquire(self) -> Iterator[DatasetService]:
+        """The current generation's service, kept open until the block exits"""
+        with self._lock:
+            generation = self._current
+            generation.active += 1
+        try:
+            yield generation.service
+        finally:
+            with self._lock:
+                generation.active -= 1
+                drained = generation.retired and generation.active == 0
+            if drained:
+                self._close(generation)
+
+    def reload(self, db_path: Optional[str] = None, tile_path: Optional[str] = None) -> Dict:
+        """Load the files (or new paths) as a new generation, warm it and swap it in
+
+        Runs on the caller's thread; requests keep being served from the
+        current generation meanwhile. Concurrent reloads run one at a time.
+        Without ``tile_path`` the current tile store is kept, unless the
+        database changes: tiles built from another database would serve its
+        elevations, so the new one gets the store beside it (``tile_path_for``),
+        read once it exists. An empty ``tile_path`` means no tile store.
+        """
+        with self._reload_lock:
+            previous = self._current
+            start = time.perf_counter()
+            db_path = db_path or previous.service.db_path
+            if tile_path is None:
+                same_db = os.path.abspath(db_path) == os.path.abspath(previous.service.db_path)
+                tile_path = previous.service.tile_path if same_db else tile_path_for(db_path)
+            tile_path = tile_path or None
+            service = previous.service.reopen(db_path, tile_path)
+            # Fingerprint before loading anything, so changes made while warming trigger another reload
+            fingerprint = dataset_fingerprint(service.files())
+            try:
+                service.warm(previous.service)
+            except Exception:
+                service.close()
+                raise
+
+            generation = DatasetGeneration(previous.number + 1, service, fingerprint, time.perf_counter() - start)
+            with self._lock:
+                self._current = generation
+                previous.retired = True
+                drained = previous.active == 0
+                if not drained:
+                    self._draining[previous.number] = previous
+                self.reloads += 1
+                self._pending = None
+            if drained:
+                self._close(previous)
+
+            return {**generation.describe(), "previous_generation": previous.number}
+
+    def poll(self) -> bool:
+        """Reload if the files changed and stayed unchanged since the last poll
+
+        Waiting for a quiet poll interval keeps a scraper that is still writing
+        from triggering a reload per commit. Returns whether a reload happened.
+        """
+        fingerprint = dataset_fingerprint(self._current.service.files())
+        if fingerprint == self._current.fingerprint or fingerprint == self._failed:
+            self._pending = None
+            return False
+        if fingerprint != self._pending:
+            self._pending = fingerprint
+            return False
+
+        try:
+            self.reload()
+        except Exception as e:
+            # Keep serving the current generation; retry once the files change again
+            self._failed = fingerprint
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        self._failed = None
+        self.last_error = None
+        return True
+
+    def watch(self, interval: float) -> threading.Thread:
+        """Poll the files every ``interval`` seconds on a daemon thread"""
+        if self._watcher is None:
+            def run():
+                while not self._stop.wait(interval):
+                    self.poll()
+
+            self._watcher = threading.Thread(target=run, name="elevation-dataset-watch", daemon=True)
+            self._watcher.start()
+        return self._watcher
+
+    def stop(self):
+        """Stop the file watch; watch() can start it again"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._stop.clear()
+
+    def _close(self, generation: DatasetGeneration):
+        with self._lock:
+            if generation.closed:
+                return
+            generation.closed = True
+            self._draining.pop(generation.number, None)
+        generation.service.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._current.describe(),
+                "reloads": self.reloads,
+                "draining": [generation.describe() for generation in self._draining.values()],
+                "watching": self._watcher is not None,
+                "last_error": self.last_error
+            }
@@ -0,0 +1,282 @@
+"""
+Gridded elevation engine.
+
+Scattered elevation points are resampled onto regular 1° NumPy tiles so that a
+whole batch of coordinates can be answered with one vectorized bilinear
+interpolation instead of one SQL query per coordinate.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from elevation_common.geodesy import METRES_PER_DEGREE
+
+from app.services.elevation_idw import PointIndex
+from app.services.elevation_index import ElevationIndex
+
+TileKey = Tuple[int, int]  # (floor(lat), floor(lng)) of the tile's south-west corner
+
+@dataclass(frozen=True)
+class ElevationTile:
+    """Square grid of elevation nodes covering one 1° tile
+
+    ``data`` holds raw node values; elevation = raw * scale + base. Integer tiles
+    mark missing nodes with ``nodata``, float tiles use NaN.
+    """
+    data: np.ndarray
+    scale: float = 1.0
+    base: float = 0.0
+    nodata: Optional[int] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def decode(self, raw: np.ndarray) -> np.ndarray:
+        """Convert raw node values to metres, NaN where missing"""
+        values = raw.astype(np.float64)
+        if self.nodata is not None:
+            values[raw == self.nodata] = np.nan
+        if self.scale != 1.0 or self.base != 0.0:
+            values = values * self.scale + self.base
+        return values
+
+    def elevations(self) -> np.ndarray:
+        """Whole tile decoded to metres"""
+        return self.decode(self.data)
+
+
+def tile_key(lat: float, lng: float) -> TileKey:
+    """Key of the 1° tile containing a coordinate"""
+    return (int(math.floor(lat)), int(math.floor(lng)))
+
+
+def build_tiles(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    elevations: np.ndarray,
+    cells_per_degree: int = 100,
+    search_radius: float = 0.15,
+    neighbours: int = 4
+) -> Dict[TileKey, ElevationTile]:
+    """Resample scattered points onto regular tiles using inverse distance weighting
+
+    Each tile holds a float32 array of shape (cells_per_degree + 1, cells_per_degree + 1)
+    whose nodes sit on lat_min + i / cells_per_degree, lng_min + j / cells_per_degree.
+    Nodes with no source point within ``search_radius`` degrees (measured in
+    metres along a meridian) are NaN.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    elevations = np.asarray(elevations, dtype=np.float64)
+
+    tiles: Dict[TileKey, ElevationTile] = {}
+    if lats.size == 0:
+        return tiles
+
+    # A point contributes to every tile its search radius overlaps
+    candidate_keys = set()
+    for dlat in (-search_radius, search_radius):
+        for dlng in (-search_radius, search_radius):
+            keys = np.stack([np.floor(lats + dlat), np.floor(lngs + dlng)], axis=1).astype(np.int64)
+            candidate_keys.update(map(tuple, np.unique(keys, axis=0).tolist()))
+
+    for key in sorted(candidate_keys):
+        lat_min, lng_min = key
+        in_reach = (
+            (lats >= lat_min - search_radius) & (lats <= lat_min + 1 + search_radius) &
+            (lngs >= lng_min - search_radius) & (lngs <= lng_min + 1 + search_radius)
+        )
+        if not in_reach.any():
+            continue
+
+        tile = _fill_tile(
+            key, lats[in_reach], lngs[in_reach], elevations[in_reach],
+            cells_per_degree, search_radius, neighbours
+        )
+        if not np.isnan(tile).all():
+            tiles[key] = ElevationTile(tile)
+
+    return tiles
+
+
+def _fill_tile(
+    key: TileKey,
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    elevations: np.ndarray,
+    cells_per_degree: int,
+    search_radius: float,
+    neighbours: int
+) -> np.ndarray:
+    """Compute every node of one tile from its k nearest source points
+
+    Distances are in metres; ``search_radius`` degrees is taken along a meridian.
+    """
+    size = cells_per_degree + 1
+    node_offsets = np.arange(size, dtype=np.float64) / cells_per_degree
+    node_lats = np.repeat(key[0] + node_offsets, size)
+    node_lngs = np.tile(key[1] + node_offsets, size)
+
+    values = PointIndex(lats, lngs, elevations).interpolate(
+        node_lats, node_lngs, k=neighbours, max_distance=search_radius * METRES_PER_DEGREE
+    )
+    return values.reshape(size, size).astype(np.float32)
+
+
+def overview_levels(cells_per_degree: int, max_overviews: int) -> List[int]:
+    """cells_per_degree of each pyramid level: full resolution, then halved while even"""
+    levels = [cells_per_degree]
+    while len(levels) <= max_overviews and levels[-1] % 2 == 0 and levels[-1] >= 4:
+        levels.append(levels[-1] // 2)
+    return levels
+
+
+def level_for_spacing(cells_per_degree: Sequence[int], spacing: float) -> int:
+    """Coarsest level whose node spacing (metres along a meridian) is within ``spacing``"""
+    level = 0
+    for i, cells in enumerate(cells_per_degree):
+        if METRES_PER_DEGREE / cells <= spacing:
+            level = i
+    return level
+
+
+def downsample_tile(tile: ElevationTile) -> ElevationTile:
+    """Half-resolution tile: every other node after a [1, 2, 1] smoothing
+
+    Smoothing skips missing nodes rather than spreading them. Edge nodes are
+    shared with the neighbouring tile, so they are only smoothed along the
+    edge; either way a planar surface comes through unchanged.
+    """
+    values = tile.elevations()
+    valid = ~np.isnan(values)
+    total = np.where(valid, values, 0.0)
+    weight = valid.astype(np.float64)
+    for axis in (0, 1):
+        total = _smooth(total, axis)
+        weight = _smooth(weight, axis)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        smoothed = np.where(weight > 0, total / weight, np.nan)
+    return ElevationTile(smoothed[::2, ::2].astype(np.float32))
+
+
+def _smooth(values: np.ndarray, axis: int) -> np.ndarray:
+    """[1, 2, 1] filter along one axis; the first and last rows keep their own value"""
+    values = np.moveaxis(values, axis, 0)
+    smoothed = 4 * values
+    smoothed[1:-1] = values[:-2] + 2 * values[1:-1] + values[2:]
+    return np.moveaxis(smoothed, 0, axis)
+
+
+def build_overviews(tiles: Mapping[TileKey, ElevationTile], levels: int) -> List[Dict[TileKey, ElevationTile]]:
+    """Successively halved copies of ``tiles``, finest first"""
+    overviews = []
+    current = tiles
+    for _ in range(levels):
+        current = {key: downsample_tile(tile) for key, tile in current.items()}
+        overviews.append(current)
+    return overviews
+
+
+class ElevationGrid:
+    """Bilinear lookups over a set of regular 1° elevation tiles
+
+    ``tiles`` is anything with a mapping-style ``get(key)``: a dict, a TileStore
+    or an LRUTileCache.
+    """
+
+    def __init__(self, tiles: Mapping[TileKey, ElevationTile], cells_per_degree: int):
+        self.tiles = tiles
+        self.cells_per_degree = cells_per_degree
+
+    def sample(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """Bilinearly interpolate elevations, NaN where the grid has no data"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        elevations = np.full(lats.shape, np.nan)
+        if lats.size == 0:
+            return elevations
+
+        lat_keys = np.floor(lats).astype(np.int64)
+        lng_keys = np.floor(lngs).astype(np.int64)
+        codes = (lat_keys + 90) * 512 + (lng_keys + 180)
+        unique_codes, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+
+        for group, index in enumerate(first):
+            key = (int(lat_keys[index]), int(lng_keys[index]))
+            tile = self.tiles.get(key)
+            if tile is None:
+                continue
+
+            members = np.nonzero(inverse == group)[0] if unique_codes.size > 1 else slice(None)
+            elevations[members] = self._bilinear(
+                tile,
+                (lats[members] - key[0]) * self.cells_per_degree,
+                (lngs[members] - key[1]) * self.cells_per_degree
+            )
+
+        return elevations
+
+    def _bilinear(self, tile: ElevationTile, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Interpolate fractional node positions, renormalising around missing corners"""
+        last = self.cells_per_degree - 1
+        row0 = np.clip(np.floor(rows).astype(np.int64), 0, last)
+        col0 = np.clip(np.floor(cols).astype(np.int64), 0, last)
+        dy = rows - row0
+        dx = cols - col0
+
+        data = tile.data
+        corners = tile.decode(np.stack([
+            data[row0, col0],
+            data[row0, col0 + 1],
+            data[row0 + 1, col0],
+            data[row0 + 1, col0 + 1]
+        ]))
+        weights = np.stack([
+            (1 - dy) * (1 - dx),
+            (1 - dy) * dx,
+            dy * (1 - dx),
+            dy * dx
+        ])
+
+        valid = ~np.isnan(corners)
+        weights = np.where(valid, weights, 0.0)
+        total = weights.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = (weights * np.where(valid, corners, 0.0)).sum(axis=0) / total
+        result[total == 0] = np.nan
+        return result
+
+
+def read_elevation_points(db_path: str) -> np.ndarray:
+    """All (lat, lng, elevation) points of a scraper elevation database"""
+    return ElevationIndex(db_path).all_points()
+
+
+class SQLiteTileSource:
+    """Builds tiles on demand from the stored elevation points around them"""
+
+    def __init__(self, db_path: str, cells_per_degree: int = 100, search_radius: float = 0.15, neighbours: int = 4):
+        self.index = ElevationIndex(db_path)
+        self.cells_per_degree = cells_per_degree
+        self.search_radius = search_radius
+        self.neighbours = neighbours
+
+    def load(self, key: TileKey) -> Optional[ElevationTile]:
+        """Build one tile from a single window query, None if it has no data"""
+        lat_min, lng_min = key
+        points = self.index.window(
+            lat_min - self.search_radius, lat_min + 1 + self.search_radius,
+            lng_min - self.search_radius, lng_min + 1 + self.search_radius
+        )
+        if points.size == 0:
+            return None
+
+        tile = _fill_tile(
+            key, points[:, 0], points[:, 1], points[:, 2],
+            self.cells_per_degree, self.search_radius, self.neighbours
+        )
+        return None if np.isnan(tile).all() else ElevationTile(tile)
@@ -0,0 +1,224 @@
+"""
+Vectorized inverse distance weighting over scattered elevation points.
+
+Points are projected once to local metres (equirectangular about the middle
+latitude of the set) and sorted into a uniform grid of buckets. k-nearest-
+neighbour queries for a whole batch then only look at the buckets around each
+query, widening the ring for the few queries that need it, and the IDW weights
+are computed for every query at once.
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+from elevation_common.geodesy import LocalProjection
+
+# Closer than this (1 mm) counts as an exact hit
+_MIN_DISTANCE_SQ = 1e-6
+
+# Widest bucket ring searched before falling back to a full scan
+_MAX_RING = 8
+
+# Upper bound on the query x point distance matrix of a full scan
+_SCAN_CHUNK_ELEMENTS = 1 << 21
+
+
+def inverse_distance_weights(distances: np.ndarray, power: float = 2.0) -> np.ndarray:
+    """Row-normalised IDW weights for (queries, k) distances in metres
+
+    Infinite distances (missing neighbours) get zero weight; rows without any
+    neighbour are all zero.
+    """
+    finite = np.isfinite(distances)
+    weights = np.zeros(distances.shape)
+    weights[finite] = 1.0 / np.maximum(distances[finite] ** 2, _MIN_DISTANCE_SQ) ** (power / 2)
+    total = weights.sum(axis=1, keepdims=True)
+    return np.divide(weights, total, out=np.zeros_like(weights), where=total > 0)
+
+
+class PointIndex:
+    """Grid-bucket index of (lat, lng, elevation) points for batch kNN and IDW"""
+
+    def __init__(self, lats: np.ndarray, lngs: np.ndarray, elevations: np.ndarray, points_per_bucket: int = 8):
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        if lats.size == 0:
+            raise ValueError("PointIndex needs at least one point")
+
+        self.ref_lat = float(lats.min() + lats.max()) / 2
+        self.projection = LocalProjection(self.ref_lat)
+        x, y = self.project(lats, lngs)
+        self._x0 = float(x.min())
+        self._y0 = float(y.min())
+        width = float(x.max()) - self._x0
+        height = float(y.max()) - self._y0
+
+        # Aim for points_per_bucket points per bucket, without letting points
+        # strung along a line (a single road) blow up the bucket count
+        size = max(math.sqrt(max(width * height, 1.0) * points_per_bucket / lats.size), 1.0)
+        while (width // size + 1) * (height // size + 1) > 4 * lats.size + 16:
+            size *= 2
+        self.bucket_size = size
+        self._nx = int(width // size) + 1
+        self._ny = int(height // size) + 1
+
+        buckets = self._bucket_ids(*self._cells(x, y))
+        order = np.argsort(buckets, kind="stable")
+        self.order = order  # position of each indexed point in the input arrays
+        self.lats = lats[order]
+        self.lngs = lngs[order]
+        self.elevations = np.asarray(elevations, dtype=np.float64)[order]
+        self._x = x[order]
+        self._y = y[order]
+        self._offsets = np.searchsorted(buckets[order], np.arange(self._nx * self._ny + 1))
+
+    def __len__(self) -> int:
+        return self.lats.size
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.lats.nbytes + self.lngs.nbytes + self.elevations.nbytes +
+            self._x.nbytes + self._y.nbytes + self._offsets.nbytes + self.order.nbytes
+        )
+
+    def project(self, lats, lngs) -> Tuple[np.ndarray, np.ndarray]:
+        """Local planar coordinates in metres"""
+        return self.projection.project(lats, lngs)
+
+    def _cells(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return (
+            np.floor((x - self._x0) / self.bucket_size).astype(np.int64),
+            np.floor((y - self._y0) / self.bucket_size).astype(np.int64)
+        )
+
+    def _bucket_ids(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        return np.clip(cy, 0, self._ny - 1) * self._nx + np.clip(cx, 0, self._nx - 1)
+
+    def query(
+        self,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        k: int = 4,
+        max_distance: float = math.inf
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Distances (metres) and indices of the k nearest points, closest first
+
+        Both arrays have shape (queries, k); neighbours beyond ``max_distance``
+        (or missing because the index is small) have distance inf and index -1.
+        """
+        qx, qy = self.project(lats, lngs)
+        qx = qx.ravel()
+        qy = qy.ravel()
+        distances = np.full((qx.size, k), np.inf)
+        indices = np.full((qx.size, k), -1, dtype=np.int64)
+
+        pending = np.arange(qx.size)
+        ring = 1
+        while pending.size and ring <= _MAX_RING:
+            found_d, found_i, reach = self._search_ring(qx[pending], qy[pending], ring, k)
+
+            # Exact once the k-th neighbour lies within the searched square
+            done = (found_d[:, -1] <= reach) | (reach >= max_distance)
+            distances[pending[done]] = found_d[done]
+            indices[pending[done]] = found_i[done]
+            pending = pending[~done]
+            ring *= 2
+
+        if pending.size:
+            distances[pending], indices[pending] = self._scan(qx[pending], qy[pending], k)
+
+        beyond = distances > max_distance
+        distances[beyond] = np.inf
+        indices[beyond] = -1
+        return distances, indices
+
+    def _search_ring(self, qx: np.ndarray, qy: np.ndarray, ring: int, k: int):
+        """kNN among the (2 * ring + 1) ** 2 buckets around each query
+
+        Returns distances, indices and the radius around each query that the
+        searched buckets are guaranteed to cover.
+        """
+        cx, cy = self._cells(qx, qy)
+        steps = np.arange(-ring, ring + 1)
+        bx = (cx[:, None, None] + steps[None, None, :]).repeat(steps.size, axis=1)
+        by = (cy[:, None, None] + steps[None, :, None]).repeat(steps.size, axis=2)
+        inside = (bx >= 0) & (bx < self._nx) & (by >= 0) & (by < self._ny)
+
+        buckets = self._bucket_ids(bx, by)
+        starts = self._offsets[buckets]
+        counts = np.where(inside, self._offsets[buckets + 1] - starts, 0).reshape(qx.size, -1)
+        starts = starts.reshape(qx.size, -1)
+
+        # Flatten every (query, candidate point) pair
+        per_query = counts.sum(axis=1)
+        pair_query = np.repeat(np.arange(qx.size), per_query)
+        flat_counts = counts.ravel()
+        pair_first = np.cumsum(flat_counts) - flat_counts
+        points = np.repeat(starts.ravel() - pair_first, flat_counts) + np.arange(flat_counts.sum())
+        pair_dist = np.hypot(self._x[points] - qx[pair_query], self._y[points] - qy[pair_query])
+
+        distances, indices = _k_smallest(pair_query, pair_dist, points, per_query, k)
+
+        edge_x = np.minimum(qx - self._x0 - (cx - ring) * self.bucket_size,
+                            self._x0 + (cx + ring + 1) * self.bucket_size - qx)
+        edge_y = np.minimum(qy - self._y0 - (cy - ring) * self.bucket_size,
+                            self._y0 + (cy + ring + 1) * self.bucket_size - qy)
+        reach = np.minimum(edge_x, edge_y)
+
+        # Rings that already span the whole grid have seen every point
+        covers_all = (cx - ring <= 0) & (cx + ring >= self._nx - 1) & (cy - ring <= 0) & (cy + ring >= self._ny - 1)
+        reach[covers_all] = np.inf
+        return distances, indices, reach
+
+    def _scan(self, qx: np.ndarray, qy: np.ndarray, k: int):
+        """Exact kNN against every point, for queries far from the data"""
+        kk = min(k, self.lats.size)
+        distances = np.full((qx.size, k), np.inf)
+        indices = np.full((qx.size, k), -1, dtype=np.int64)
+        chunk = max(1, _SCAN_CHUNK_ELEMENTS // self.lats.size)
+
+        for start in range(0, qx.size, chunk):
+            stop = start + chunk
+            dist = np.hypot(qx[start:stop, None] - self._x[None, :], qy[start:stop, None] - self._y[None, :])
+            nearest = np.argpartition(dist, kk - 1, axis=1)[:, :kk]
+            nearest_dist = np.take_along_axis(dist, nearest, axis=1)
+            order = np.argsort(nearest_dist, axis=1, kind="stable")
+            distances[start:stop, :kk] = np.take_along_axis(nearest_dist, order, axis=1)
+            indices[start:stop, :kk] = np.take_along_axis(nearest, order, axis=1)
+
+        return distances, indices
+
+    def interpolate(
+        self,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        k: int = 4,
+        max_distance: float = math.inf,
+        power: float = 2.0
+    ) -> np.ndarray:
+        """IDW elevations of the k nearest points, NaN where none is within max_distance"""
+        distances, indices = self.query(lats, lngs, k, max_distance)
+        weights = inverse_distance_weights(distances, power)
+        values = (weights * self.elevations[indices]).sum(axis=1)
+        values[indices[:, 0] < 0] = np.nan
+        return values
+
+
+def _k_smallest(groups: np.ndarray, distances: np.ndarray, points: np.ndarray, group_sizes: np.ndarray, k: int):
+    """Per-group k smallest distances of flattened (group, distance, point) triples"""
+    n_groups = group_sizes.size
+    out_d = np.full((n_groups, k), np.inf)
+    out_i = np.full((n_groups, k), -1, dtype=np.int64)
+    if distances.size == 0:
+        return out_d, out_i
+
+    order = np.lexsort((distances, groups))
+    groups = groups[order]
+    group_first = np.cumsum(group_sizes) - group_sizes
+    rank = np.arange(groups.size) - group_first[groups]
+    keep = rank < k
+    out_d[groups[keep], rank[keep]] = distances[order][keep]
+    out_i[groups[keep], rank[keep]] = points[order][keep]
+    return out_d, out_i
@@ -0,0 +1,214 @@
+"""
+Spatial queries against the scraper's elevation database.
+
+Understands both storage layouts ElevationDatabase can write:
+
+- compact: elevation_points keyed by a Morton code of integer microdegrees,
+  queried as a handful of key range scans
+- legacy: elevation_data keyed by REAL (lat, lng), queried through the
+  elevation_rtree R*Tree, or with a BETWEEN scan for databases created
+  before the R*Tree existed
+"""
+
+import math
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from elevation_common import elevation_keys, elevation_stats
+from elevation_common.geodesy import METRES_PER_DEGREE, LocalProjection
+
+COMPACT = "compact"
+RTREE = "rtree"
+SCAN = "scan"
+
+_FETCH_CHUNK = 1_000_000
+
+
+class ElevationIndex:
+    """Window and k-nearest-neighbour lookups over stored elevation points"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._storage: Optional[str] = None
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Read-only connection, kept open per thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only used by its own thread, but closed from whichever thread calls close()
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close every thread's connection; the index must not be used afterwards"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def storage(self, conn: Optional[sqlite3.Connection] = None) -> str:
+        """Storage layout of the database: COMPACT, RTREE or SCAN"""
+        if self._storage is None:
+            tables = {
+                name for (name,) in (conn or self._connect()).execute("""
+                    SELECT name FROM sqlite_master
+                    WHERE name IN ('elevation_points', 'elevation_rtree')
+                """)
+            }
+            if "elevation_points" in tables:
+                self._storage = COMPACT
+            elif "elevation_rtree" in tables:
+                self._storage = RTREE
+            else:
+                self._storage = SCAN
+        return self._storage
+
+    def window(self, lat_min: float, lat_max: float, lng_min: float, lng_max: float) -> np.ndarray:
+        """(lat, lng, elevation) rows inside a bounding box"""
+        return self._window(self._connect(), lat_min, lat_max, lng_min, lng_max)
+
+    def _window(self, conn, lat_min: float, lat_max: float, lng_min: float, lng_max: float) -> np.ndarray:
+        storage = self.storage(conn)
+        if storage == COMPACT:
+            ranges = elevation_keys.key_ranges(lat_min, lat_max, lng_min, lng_max)
+            keys = conn.execute(f"""
+                SELECT zkey, elevation_dm FROM elevation_points
+                WHERE ({" OR ".join(["zkey BETWEEN ? AND ?"] * len(ranges))})
+                AND elevation_dm IS NOT NULL
+            """, [bound for key_range in ranges for bound in key_range]).fetchall()
+
+            # Key ranges over-cover the box, so re-check the decoded coordinates
+            points = _decode_rows(keys)
+            inside = (
+                (points[:, 0] >= lat_min) & (points[:, 0] <= lat_max) &
+                (points[:, 1] >= lng_min) & (points[:, 1] <= lng_max)
+            )
+            return points[inside]
+
+        if storage == RTREE:
+            # R*Tree boxes are float32, so re-check the exact coordinates. The unary +
+            # stops the planner driving the join from idx_location instead of the R*Tree.
+            rows = conn.execute("""
+                SELECT d.lat, d.lng, d.elevation FROM elevation_rtree r
+                JOIN elevation_data d ON d.rowid = r.id
+                WHERE r.max_lat >= ? AND r.min_lat <= ?
+                AND r.max_lng >= ? AND r.min_lng <= ?
+                AND +d.lat BETWEEN ? AND ?
+                AND +d.lng BETWEEN ? AND ?
+                AND d.elevation IS NOT NULL
+            """, (lat_min, lat_max, lng_min, lng_max, lat_min, lat_max, lng_min, lng_max)).fetchall()
+        else:
+            rows = conn.execute("""
+                SELECT lat, lng, elevation FROM elevation_data
+                WHERE lat BETWEEN ? AND ?
+                AND lng BETWEEN ? AND ?
+                AND elevation IS NOT NULL
+            """, (lat_min, lat_max, lng_min, lng_max)).fetchall()
+
+        return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int = 4,
+        max_radius: float = 0.25,
+        initial_radius: float = 0.01
+    ) -> np.ndarray:
+        """The k nearest (lat, lng, elevation) rows within max_radius, closest first
+
+        Points are ranked by distance in metres (equirectangular about the
+        query, as PointIndex does); radii are in degrees of latitude. The
+        search window grows until k points lie inside its inscribed circle, so
+        the result is exact rather than the k nearest of an arbitrary box.
+        """
+        conn = self._connect()
+        projection = LocalProjection(lat)
+        # Degrees of longitude spanning one degree of latitude's distance
+        lng_stretch = 1 / max(math.cos(math.radians(lat)), 0.01)
+        radius = min(initial_radius, max_radius)
+        while True:
+            points = self._window(
+                conn, lat - radius, lat + radius, lng - radius * lng_stretch, lng + radius * lng_stretch
+            )
+            x, y = projection.project(points[:, 0] - lat, points[:, 1] - lng)
+            distances = np.hypot(x, y)
+            inside = distances <= radius * METRES_PER_DEGREE
+
+            if inside.sum() >= k or radius >= max_radius:
+                order = np.argsort(distances[inside], kind="stable")[:k]
+                return points[inside][order]
+            radius = min(radius * 4, max_radius)
+
+    def all_points(self) -> np.ndarray:
+        """Every stored (lat, lng, elevation) row"""
+        conn = self._connect()
+        if self.storage(conn) == COMPACT:
+            rows = conn.execute("""
+                SELECT zkey, elevation_dm FROM elevation_points
+                WHERE elevation_dm IS NOT NULL
+            """).fetchall()
+            return _decode_rows(rows)
+
+        rows = conn.execute("""
+            SELECT lat, lng, elevation FROM elevation_data
+            WHERE elevation IS NOT NULL
+        """).fetchall()
+        return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+    def coverage(self) -> Tuple[int, Optional[float], Optional[float], Optional[float], Optional[float]]:
+        """(count, min_lat, max_lat, min_lng, max_lng) of the stored points
+        
+        Read from the maintained statistics when the database has them,
+        otherwise computed with a full scan.
+        """
+        stats = self.statistics()
+        if stats is not None:
+            return (stats["points"], *stats["bounds"])
+
+        conn = self._connect()
+        if self.storage(conn) != COMPACT:
+            return conn.execute("""
+                SELECT
+                    COUNT(*) as count,
+                    MIN(lat) as min_lat, MAX(lat) as max_lat,
+                    MIN(lng) as min_lng, MAX(lng) as max_lng
+                FROM elevation_data
+            """).fetchone()
+
+        count = 0
+        bounds = [np.inf, -np.inf, np.inf, -np.inf]
+        cursor = conn.execute("SELECT zkey FROM elevation_points")
+        while True:
+            keys = cursor.fetchmany(_FETCH_CHUNK)
+            if not keys:
+                break
+            lats, lngs = elevation_keys.decode(np.array(keys, dtype=np.int64).ravel())
+            count += len(keys)
+            bounds = [
+                min(bounds[0], lats.min()), max(bounds[1], lats.max()),
+                min(bounds[2], lngs.min()), max(bounds[3], lngs.max())
+            ]
+
+        if not count:
+            return (0, None, None, None, None)
+        return (count, *(float(bound) for bound in bounds))
+
+    def statistics(self) -> Optional[Dict]:
+        """Running totals kept by the writer (see elevation_stats), None if absent"""
+        return elevation_stats.read_stats(self._connect())
+
+
+def _decode_rows(rows) -> np.ndarray:
+    """(zkey, elevation_dm) rows to (lat, lng, elevation)"""
+    data = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    lats, lngs = elevation_keys.decode(data[:, 0])
+    return np.column_stack([lats, lngs, data[:, 1] / elevation_keys.ELEVATION_SCALE])
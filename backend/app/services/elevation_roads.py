@@ -0,0 +1,155 @@
+"""
+Road-snapped elevations from the road scraper's dense profiles.
+
+RoadElevationDatabase stores every cyclable way as elevation samples 15-20m
+apart along the road. A query point near a road is snapped to the closest
+stretch between two consecutive samples of a profile, and its elevation is
+interpolated linearly along ``distance_along_road`` between them. Points
+further than the snap distance from every road get NaN so the caller can
+fall back to the grid.
+
+Profiles are found through road_profile_rtree, an R*Tree over each profile's
+bounding box kept by the scraper, and loaded per 1° tile into a
+RoadProfileIndex: the samples go into a PointIndex, and the stretches either
+side of a query's nearest samples are the snapping candidates.
+"""
+
+import math
+import sqlite3
+from typing import Optional, Tuple
+
+import numpy as np
+from elevation_common.geodesy import METRES_PER_DEGREE
+
+from app.services.elevation_grid import TileKey
+from app.services.elevation_idw import PointIndex
+
+# Nearest samples whose adjoining stretches are snapping candidates
+_CANDIDATE_SAMPLES = 8
+
+# Every stored sample as (profile, position, lat, lng, elevation), in road order
+_SAMPLES_SQL = """
+    SELECT p.rowid, CAST(s.key AS INTEGER),
+        json_extract(s.value, '$.lat'), json_extract(s.value, '$.lng'), json_extract(s.value, '$.elevation')
+    FROM {profiles}, json_each(p.elevation_samples) s
+    {where}
+    ORDER BY p.rowid, CAST(s.key AS INTEGER)
+"""
+
+
+class RoadProfileIndex:
+    """Consecutive road samples of one area, snapped to in batches"""
+
+    def __init__(
+        self,
+        roads: np.ndarray,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        elevations: np.ndarray
+    ):
+        """``roads`` identifies the profile of each sample; samples of a profile are consecutive, in road order"""
+        self.roads = np.asarray(roads, dtype=np.int64)
+        self.points = PointIndex(lats, lngs, elevations)
+        x, y = self.points.project(lats, lngs)
+        self._x = x
+        self._y = y
+        self._elevations = np.asarray(elevations, dtype=np.float64)
+        # Stretch i runs from sample i to i + 1 when both belong to the same road and have elevations
+        self._stretch = np.zeros(self.roads.size, dtype=bool)
+        self._stretch[:-1] = (
+            (self.roads[1:] == self.roads[:-1]) &
+            ~np.isnan(self._elevations[1:]) & ~np.isnan(self._elevations[:-1])
+        )
+        lengths = np.hypot(np.diff(x), np.diff(y))[self._stretch[:-1]]
+        self.max_stretch = float(lengths.max()) if lengths.size else 0.0
+
+    def __len__(self) -> int:
+        return self.roads.size
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.points.nbytes + self.roads.nbytes + self._x.nbytes + self._y.nbytes +
+            self._elevations.nbytes + self._stretch.nbytes
+        )
+
+    def snap(self, lats: np.ndarray, lngs: np.ndarray, max_distance: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Elevations on the nearest road stretch and the distance (metres) to it
+
+        NaN elevation and inf distance where no stretch is within ``max_distance``.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        # A stretch within max_distance has an endpoint within max_distance plus half its length
+        _, neighbours = self.points.query(
+            lats, lngs, k=_CANDIDATE_SAMPLES, max_distance=max_distance + self.max_stretch / 2
+        )
+        found = neighbours >= 0
+        samples = np.where(found, self.points.order[np.maximum(neighbours, 0)], -1)
+
+        # The stretches before and after each neighbouring sample
+        starts = np.concatenate([samples - 1, samples], axis=1)
+        valid = np.concatenate([found, found], axis=1) & (starts >= 0)
+        starts = np.maximum(starts, 0)
+        valid &= self._stretch[starts]
+        ends = np.where(valid, starts + 1, starts)
+
+        qx, qy = self.points.project(lats, lngs)
+        ax, ay = self._x[starts], self._y[starts]
+        dx, dy = self._x[ends] - ax, self._y[ends] - ay
+        length_sq = dx * dx + dy * dy
+        t = np.divide(
+            (qx[:, None] - ax) * dx + (qy[:, None] - ay) * dy, length_sq,
+            out=np.zeros_like(length_sq), where=length_sq > 0
+        )
+        t = np.clip(t, 0.0, 1.0)
+        distances = np.where(valid, np.hypot(ax + t * dx - qx[:, None], ay + t * dy - qy[:, None]), np.inf)
+
+        best = np.argmin(distances, axis=1)
+        rows = np.arange(lats.size)
+        distance = distances[rows, best]
+        start = self._elevations[starts[rows, best]]
+        end = self._elevations[ends[rows, best]]
+        # Linear along the stretch's chord is linear in distance_along_road between its samples
+        elevations = start + t[rows, best] * (end - start)
+        on_road = distance <= max_distance
+        return np.where(on_road, elevations, np.nan), np.where(on_road, distance, np.inf)
+
+
+class RoadProfileSource:
+    """Loads the road profiles around a 1° tile from a road elevation database"""
+
+    def __init__(self, db_path: str, max_distance: float):
+        self.db_path = db_path
+        self.max_distance = max_distance
+
+    def load(self, key: TileKey) -> Optional[RoadProfileIndex]:
+        # Any road a point of the tile can snap to passes within max_distance of it
+        lat_min, lng_min = key
+        lat_margin = self.max_distance / METRES_PER_DEGREE
+        lng_margin = lat_margin / max(math.cos(math.radians(max(abs(lat_min), abs(lat_min + 1)))), 0.01)
+        box = (lat_min - lat_margin, lat_min + 1 + lat_margin, lng_min - lng_margin, lng_min + 1 + lng_margin)
+        with sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True) as conn:
+            has_rtree = conn.execute("""
+                SELECT 1 FROM sqlite_master WHERE name = 'road_profile_rtree'
+            """).fetchone()
+            if has_rtree:
+                rows = conn.execute(_SAMPLES_SQL.format(
+                    profiles="road_profile_rtree r JOIN road_elevation_profiles p ON p.rowid = r.id",
+                    where="WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lng >= ? AND r.min_lng <= ?"
+                ), (box[0], box[1], box[2], box[3])).fetchall()
+            else:
+                # Database written before the R*Tree existed: read every profile
+                rows = conn.execute(_SAMPLES_SQL.format(profiles="road_elevation_profiles p", where="")).fetchall()
+
+        samples = np.array(rows, dtype=np.float64).reshape(-1, 5)
+        if not has_rtree and samples.size:
+            inside = (
+                (samples[:, 2] >= box[0]) & (samples[:, 2] <= box[1]) &
+                (samples[:, 3] >= box[2]) & (samples[:, 3] <= box[3])
+            )
+            samples = samples[np.isin(samples[:, 0], samples[inside, 0])]
+        samples = samples[~np.isnan(samples[:, 2]) & ~np.isnan(samples[:, 3])]
+        if samples.size == 0:
+            return None
+        return RoadProfileIndex(samples[:, 0], samples[:, 2], samples[:, 3], samples[:, 4])
@@ -0,0 +1,221 @@
+"""
+Memory-mapped binary elevation tile store.
+
+File layout (little endian, version 2):
+
+    header   64 bytes   magic, version, levels, cells_per_degree, tile_count
+    index    24 bytes   per tile: lat, lng, level, data offset, scale, base
+    data     int16      (cells_per_degree // 2 ** level + 1) ** 2 nodes per tile, page aligned
+
+Level 0 is full resolution; each further level is an overview at half the
+resolution of the one before (see elevation_grid.build_overviews), so coarse
+queries touch a fraction of the pages. Version 1 files, which have no
+overviews, are still read.
+
+Node values are quantized per tile (elevation = raw * scale + base) with
+-32768 marking missing nodes. The file is opened read-only with ``mmap`` so
+every worker process shares the same page-cache copy and tiles are handed out
+as zero-copy NumPy views.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Mapping as MappingType, Sequence, Tuple
+
+import numpy as np
+
+from app.services.elevation_grid import ElevationTile, TileKey
+
+MAGIC = b"BRDKTILE"
+VERSION = 2
+READABLE_VERSIONS = (1, 2)
+NODATA = -32768
+
+HEADER = struct.Struct("<8sHHII")
+HEADER_SIZE = 64
+INDEX_DTYPE = np.dtype([
+    ("lat", "<i2"),
+    ("lng", "<i2"),
+    ("level", "<u4"),  # always 0 in version 1 files
+    ("offset", "<u8"),
+    ("scale", "<f4"),
+    ("base", "<f4"),
+])
+DATA_ALIGNMENT = 4096
+
+# Finest quantization step; coarser steps are only used for tiles spanning >6.5km of relief
+MIN_SCALE = 0.1
+
+
+class TileStoreError(Exception):
+    """Raised when a tile file is missing, truncated or of an unknown version"""
+
+
+def tile_path_for(db_path: str) -> str:
+    """The tile store kept beside a database, e.g. elevation.tiles for elevation.db"""
+    return os.path.splitext(db_path)[0] + ".tiles"
+
+
+def _align(offset: int) -> int:
+    return (offset + DATA_ALIGNMENT - 1) // DATA_ALIGNMENT * DATA_ALIGNMENT
+
+
+def quantize_tile(tile: ElevationTile) -> ElevationTile:
+    """Encode a tile as int16 nodes with its own scale and base"""
+    values = tile.elevations()
+    valid = ~np.isnan(values)
+    low = float(values[valid].min()) if valid.any() else 0.0
+    high = float(values[valid].max()) if valid.any() else 0.0
+
+    # Quantize against the float32 values the index will actually store
+    base = np.float32((low + high) / 2).item()
+    scale = np.float32(max(MIN_SCALE, (high - low) / 65534)).item()
+    raw = np.full(values.shape, NODATA, dtype="<i2")
+    raw[valid] = np.clip(np.round((values[valid] - base) / scale), -32767, 32767)
+    return ElevationTile(raw, scale=scale, base=base, nodata=NODATA)
+
+
+def write_tile_store(
+    path: str,
+    tiles: MappingType[TileKey, ElevationTile],
+    cells_per_degree: int,
+    overviews: Sequence[MappingType[TileKey, ElevationTile]] = ()
+):
+    """Write tiles to a new store file, atomically replacing any existing one
+
+    ``overviews[i]`` holds level i + 1, at ``cells_per_degree // 2 ** (i + 1)``.
+    """
+    levels = [tiles, *overviews]
+    entries = [(level, key) for level, level_tiles in enumerate(levels) for key in sorted(level_tiles)]
+
+    index = np.zeros(len(entries), dtype=INDEX_DTYPE)
+    offset = _align(HEADER_SIZE + index.nbytes)
+    encoded = []
+    for i, (level, key) in enumerate(entries):
+        size = (cells_per_degree >> level) + 1
+        tile = quantize_tile(levels[level][key])
+        if tile.data.shape != (size, size):
+            raise ValueError(f"Level {level} tile {key} has shape {tile.data.shape}, expected {(size, size)}")
+        index[i] = (key[0], key[1], level, offset, tile.scale, tile.base)
+        encoded.append((offset, tile.data))
+        offset = _align(offset + size * size * 2)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(levels), cells_per_degree, len(entries)).ljust(HEADER_SIZE, b"\0"))
+            f.write(index.tobytes())
+            for data_offset, data in encoded:
+                f.seek(data_offset)
+                f.write(data.tobytes())
+            f.truncate(offset)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class TileStore(Mapping):
+    """Read-only, memory-mapped view of a tile file keyed by TileKey
+
+    The store itself maps the full-resolution tiles; ``level(n)`` gives the
+    overviews.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise TileStoreError(f"{path}: empty tile file") from e
+
+        if len(self._mmap) < HEADER_SIZE:
+            raise TileStoreError(f"{path}: truncated header")
+        magic, version, levels, cells_per_degree, tile_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise TileStoreError(f"{path}: not an elevation tile file")
+        if version not in READABLE_VERSIONS:
+            raise TileStoreError(f"{path}: unsupported tile format version {version}")
+
+        self.version = version
+        self.cells_per_degree = cells_per_degree
+        self.levels = max(levels, 1)
+        self._shapes = [((cells_per_degree >> n) + 1,) * 2 for n in range(self.levels)]
+
+        index = np.frombuffer(self._mmap, dtype=INDEX_DTYPE, count=tile_count, offset=HEADER_SIZE)
+        if tile_count and int(index["level"].max()) >= self.levels:
+            raise TileStoreError(f"{path}: tile index refers to a missing level")
+        ends = index["offset"] + np.array([2 * rows * cols for rows, cols in self._shapes])[index["level"]]
+        if tile_count and int(ends.max()) > len(self._mmap):
+            raise TileStoreError(f"{path}: truncated tile data")
+
+        self._indexes: List[Dict[TileKey, Tuple[int, float, float]]] = [{} for _ in range(self.levels)]
+        for entry in index:
+            self._indexes[int(entry["level"])][(int(entry["lat"]), int(entry["lng"]))] = (
+                int(entry["offset"]), float(entry["scale"]), float(entry["base"])
+            )
+        self._index = self._indexes[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the mapped file (shared between processes, not per worker)"""
+        return len(self._mmap)
+
+    def close(self):
+        """Unmap the file; tiles handed out earlier must no longer be used"""
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Some tile view is still referenced; the mapping goes when it is collected
+            pass
+
+    def level(self, level: int) -> "TileStoreLevel":
+        """Tiles of one pyramid level (0 is the store itself)"""
+        if not 0 <= level < self.levels:
+            raise IndexError(f"{self.path} has {self.levels} levels, not {level + 1}")
+        return TileStoreLevel(self, level)
+
+    def _tile(self, level: int, key: TileKey) -> ElevationTile:
+        offset, scale, base = self._indexes[level][key]
+        shape = self._shapes[level]
+        data = np.frombuffer(self._mmap, dtype="<i2", count=shape[0] * shape[1], offset=offset)
+        return ElevationTile(data.reshape(shape), scale=scale, base=base, nodata=NODATA)
+
+    def __getitem__(self, key: TileKey) -> ElevationTile:
+        return self._tile(0, key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[TileKey]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class TileStoreLevel(Mapping):
+    """One pyramid level of a TileStore, keyed by TileKey"""
+
+    def __init__(self, store: TileStore, level: int):
+        self.store = store
+        self.level = level
+        self.cells_per_degree = store.cells_per_degree >> level
+
+    def __getitem__(self, key: TileKey) -> ElevationTile:
+        return self.store._tile(self.level, key)
+
+    def __contains__(self, key) -> bool:
+        return key in self.store._indexes[self.level]
+
+    def __iter__(self) -> Iterator[TileKey]:
+        return iter(self.store._indexes[self.level])
+
+    def __len__(self) -> int:
+        return len(self.store._indexes[self.level])
@@ -3,6 +3,8 @@ from typing import List, Dict, Any
 from app.models.route import Route
 from app.models.waypoint import Waypoint
 from app.schemas.route import WaypointCreate
+from elevation_common.elevation_profile import profile_statistics
+from elevation_common.geodesy import cumulative_length
 import math
 
 class RouteService:
@@ -22,19 +24,11 @@ class RouteService:
         if len(waypoints) < 2:
             return route
         
-        # Calculate total distance
-        total_distance = 0
-        for i in range(len(waypoints) - 1):
-            current_wp = waypoints[i]
-            next_wp = waypoints[i + 1]
-            
-            # Extract coordinates from PostGIS POINT geometry
-            # This is a simplified calculation - in production, use proper routing
-            lat1, lng1 = self._extract_coordinates(current_wp.point)
-            lat2, lng2 = self._extract_coordinates(next_wp.point)
-            
-            distance = self._calculate_distance(lat1, lng1, lat2, lng2)
-            total_distance += distance
+        # Calculate total distance along the waypoints' PostGIS POINT geometries
+        # This is a simplified calculation - in production, use proper routing
+        lats, lngs = zip(*(self._extract_coordinates(wp.point) for wp in waypoints))
+        distances = cumulative_length(lats, lngs).tolist()
+        total_distance = distances[-1]
         
         # Update route metrics
         route.distance = total_distance
@@ -43,6 +37,10 @@ class RouteService:
         route.road_quality_score = 75.0  # Placeholder
         route.safety_score = 80.0  # Placeholder
         
+        elevations = [wp.elevation for wp in waypoints]
+        if all(elevation is not None for elevation in elevations):
+            route.elevation_data = self._calculate_elevation_data(distances, elevations)
+        
         self.db.commit()
         self.db.refresh(route)
         
@@ -96,22 +94,28 @@ class RouteService:
         # For now, return dummy coordinates
         return (51.5074, -0.1278)  # London coordinates as placeholder
     
-    def _calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-        """Calculate distance between two points using Haversine formula."""
-        R = 6371000  # Earth's radius in meters
-        
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lng = math.radians(lng2 - lng1)
-        
-        a = (math.sin(delta_lat / 2) * math.sin(delta_lat / 2) +
-             math.cos(lat1_rad) * math.cos(lat2_rad) *
-             math.sin(delta_lng / 2) * math.sin(delta_lng / 2))
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    def _calculate_elevation_data(self, distances: List[float], elevations: List[float]) -> Dict[str, Any]:
+        """Elevation summary and per-waypoint gradients, from the shared profile kernel."""
+        stats = profile_statistics(distances, elevations)
+        gradients = stats.gradients.tolist()
         
-        return R * c
+        return {
+            "max_elevation": stats.max_elevation,
+            "min_elevation": stats.min_elevation,
+            "total_ascent": round(stats.total_ascent, 1),
+            "total_descent": round(stats.total_descent, 1),
+            "max_gradient": round(stats.max_gradient, 2),
+            "avg_gradient": round(stats.avg_gradient, 2),
+            "points": [
+                {
+                    "distance": round(distance, 1),
+                    "elevation": elevation,
+                    # JSON has no NaN: the last waypoint and zero-length legs have no gradient
+                    **({} if math.isnan(gradient) else {"gradient": round(gradient, 2)})
+                }
+                for distance, elevation, gradient in zip(distances, elevations, gradients)
+            ]
+        }
     
     def _calculate_estimated_time(self, distance: float) -> int:
         """Calculate estimated time in seconds based on distance."""
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Benchmark request latency under mixed load, with and without the thread pools.
+
+Serves the elevation router with uvicorn in a child process and drives it with
+an open-loop load: most requests are small, cached lookups, a few hit /stats,
+which scans every stored point (a stand-in for any slow query). The run is
+repeated with the executor swapped for inline calls on the event loop, the
+behaviour before app/core/executors.py, to show how one slow query inflates
+everyone's p99.
+
+    python benchmarks/bench_concurrency.py --points 1000000 --rate 50 --duration 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.api import elevation  # noqa: E402
+from app.api.elevation import ElevationService  # noqa: E402
+from app.core import executors  # noqa: E402
+from app.services.elevation_datasets import ElevationDatasets  # noqa: E402
+
+INSERT_BATCH = 500_000
+
+
+def build_database(db_path: str, points: int, seed: int = 0):
+    """Synthetic scraper database with ``points`` random rows over one 1° tile"""
+    rng = np.random.default_rng(seed)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("""
+            CREATE TABLE elevation_data (
+                lat REAL, lng REAL, elevation REAL, source TEXT,
+                accuracy TEXT, timestamp INTEGER, PRIMARY KEY (lat, lng)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE scrape_progress (
+                grid_id TEXT PRIMARY KEY, lat_min REAL, lat_max REAL, lng_min REAL,
+                lng_max REAL, status TEXT, priority INTEGER, last_attempt INTEGER,
+                error_count INTEGER DEFAULT 0
+            )
+        """)
+        for start in range(0, points, INSERT_BATCH):
+            count = min(INSERT_BATCH, points - start)
+            conn.executemany(
+                "INSERT OR IGNORE INTO elevation_data VALUES (?, ?, ?, 'synthetic', 'medium', 0)",
+                zip(
+                    np.round(rng.uniform(51, 52, count), 6).tolist(),
+                    np.round(rng.uniform(-1, 0, count), 6).tolist(),
+                    np.round(rng.uniform(0, 500, count), 1).tolist()
+                )
+            )
+        conn.commit()
+
+
+def serve(db_path: str, mode: str, port: int):
+    """Run the elevation router under uvicorn (in a child process)"""
+    if mode == "inline":
+        executors.elevation_executor.run = run_inline
+    service = ElevationService(db_path=db_path, tile_path=None)
+    service.get_elevation_batch([(51.5, -0.5)])  # build the tile up front
+    elevation.elevation_datasets = ElevationDatasets(service)
+
+    app = FastAPI()
+    app.include_router(elevation.router)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", timeout_keep_alive=300)
+
+
+async def load(port: int, rate: float, duration: float, heavy_fraction: float) -> dict:
+    """Open-loop load: requests start on a fixed schedule whether or not earlier ones
+    have finished, and latency is measured from the scheduled start (so a stalled
+    server can't hide its stalls by slowing the client down)"""
+    latencies = {"lookup": [], "stats": []}
+    rng = np.random.default_rng(0)
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as http:
+        async def request(scheduled: float, heavy: bool, lats: np.ndarray, lngs: np.ndarray):
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            if heavy:
+                response = await http.get("/stats")
+            else:
+                locations = [{"latitude": float(lat), "longitude": float(lng)} for lat, lng in zip(lats, lngs)]
+                response = await http.post("/lookup", json={"locations": locations})
+            response.raise_for_status()
+            latencies["stats" if heavy else "lookup"].append(time.perf_counter() - scheduled)
+
+        start = time.perf_counter() + 0.5
+        total = int(rate * duration)
+        await asyncio.gather(*(
+            request(start + i / rate, rng.random() < heavy_fraction, rng.uniform(51, 52, 20), rng.uniform(-1, 0, 20))
+            for i in range(total)
+        ))
+
+    return latencies
+
+
+def wait_for_server(port: int, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/stats", timeout=60).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("benchmark server did not start")
+
+
+def report(mode: str, latencies: dict, duration: float):
+    for kind, values in latencies.items():
+        if not values:
+            continue
+        ms = np.array(values) * 1000
+        print(f"{mode:<8} {kind:<7} {len(ms):6d} req  {len(ms) / duration:8.1f} req/s   "
+              f"p50 {np.percentile(ms, 50):8.2f} ms   p99 {np.percentile(ms, 99):8.2f} ms")
+
+
+async def run_inline(fn, *args, **kwargs):
+    """The old execution model: blocking calls straight on the event loop"""
+    return fn(*args, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--rate", type=float, default=50.0, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per mode")
+    parser.add_argument("--heavy-fraction", type=float, default=0.02, help="share of requests hitting /stats")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", help="reused if it already exists (default: temporary file)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_concurrency.db")
+    if not os.path.exists(db_path):
+        print(f"Building synthetic database with {args.points:,} points...")
+        build_database(db_path, args.points)
+
+    print(f"\n{args.rate:.0f} req/s, {args.heavy_fraction:.0%} /stats, {args.duration:.0f}s per mode:")
+    for mode in ("inline", "pooled"):
+        server = multiprocessing.Process(target=serve, args=(db_path, mode, args.port), daemon=True)
+        server.start()
+        try:
+            wait_for_server(args.port)
+            report(mode, asyncio.run(load(args.port, args.rate, args.duration, args.heavy_fraction)), args.duration)
+            if mode == "pooled":
+                print(f"\nelevation pool: {httpx.get(f'http://127.0.0.1:{args.port}/stats', timeout=60).json()['executor']}")
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
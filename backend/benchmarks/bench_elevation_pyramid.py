@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark long-route profiles against the overview pyramid.
+
+Writes a synthetic tile store at DEM-like resolution (1200 cells/degree, ~90m)
+with its overview levels, then samples a long diagonal route at several
+intervals, reading either full resolution only or the level the service picks
+for that interval. Reports the distinct 4 KiB pages of the mapped file each
+profile touches (what a cold read has to fault in) and the sampling time.
+
+    python benchmarks/bench_elevation_pyramid.py --route-km 300
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from elevation_common.elevation_profile import resample_line
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.elevation_grid import (  # noqa: E402
+    ElevationGrid, ElevationTile, build_overviews, level_for_spacing, overview_levels
+)
+from app.services.elevation_tiles import TileStore, write_tile_store  # noqa: E402
+
+PAGE = 4096
+
+
+def terrain(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Rolling hills with a few kilometres of wavelength"""
+    return 200 + 80 * np.sin(lats * 40) * np.cos(lngs * 25) + 15 * np.sin(lats * 300 + lngs * 200)
+
+
+def build_store(path: str, cells_per_degree: int, tiles_per_side: int, levels: int):
+    offsets = np.arange(cells_per_degree + 1) / cells_per_degree
+    tiles = {}
+    for lat in range(51, 51 + tiles_per_side):
+        for lng in range(-3, -3 + tiles_per_side):
+            node_lats, node_lngs = np.meshgrid(lat + offsets, lng + offsets, indexing="ij")
+            tiles[(lat, lng)] = ElevationTile(terrain(node_lats, node_lngs).astype(np.float32))
+    write_tile_store(path, tiles, cells_per_degree, build_overviews(tiles, levels))
+
+
+def pages_touched(store: TileStore, level: int, lats: np.ndarray, lngs: np.ndarray) -> int:
+    """Distinct file pages holding the bilinear corners of every sample"""
+    cells = store.cells_per_degree >> level
+    size = cells + 1
+    pages = set()
+    keys = np.floor(np.stack([lats, lngs], axis=1)).astype(np.int64)
+    rows = np.clip(np.floor((lats - keys[:, 0]) * cells).astype(np.int64), 0, cells - 1)
+    cols = np.clip(np.floor((lngs - keys[:, 1]) * cells).astype(np.int64), 0, cells - 1)
+    for (lat, lng), row, col in zip(keys.tolist(), rows.tolist(), cols.tolist()):
+        offset = store._indexes[level][(lat, lng)][0]
+        for node in (row * size + col, row * size + col + 1, (row + 1) * size + col, (row + 1) * size + col + 1):
+            pages.add((offset + node * 2) // PAGE)
+    return len(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cells-per-degree", type=int, default=1200)
+    parser.add_argument("--levels", type=int, default=4)
+    parser.add_argument("--route-km", type=float, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "pyramid.tiles")
+    levels = overview_levels(args.cells_per_degree, args.levels)
+    # Degrees of latitude (and longitude) a diagonal route of route_km covers around 52°N
+    span = args.route_km / (111.2 * np.sqrt(1 + np.cos(np.radians(52)) ** 2))
+    tiles_per_side = int(np.ceil(span + 0.05))
+    print(f"Writing {tiles_per_side ** 2} tiles at {', '.join(map(str, levels))} cells/degree...")
+    build_store(path, args.cells_per_degree, tiles_per_side, len(levels) - 1)
+
+    store = TileStore(path)
+    grids = [ElevationGrid(store if n == 0 else store.level(n), cells) for n, cells in enumerate(levels)]
+    route_lats = np.linspace(51.05, 51.05 + span, 500)
+    route_lngs = np.linspace(-2.95, -2.95 + span, 500)
+
+    print(f"\n{args.route_km:.0f} km route, store {store.nbytes / 1e6:.0f} MB:")
+    for interval in (100, 300, 1000, 3000):
+        lats, lngs, _ = resample_line(route_lats, route_lngs, interval)
+        level = level_for_spacing(levels, interval)
+        full_pages = pages_touched(store, 0, lats, lngs)
+        level_pages = pages_touched(store, level, lats, lngs)
+
+        timings = {}
+        for name, n in (("full", 0), ("pyramid", level)):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                grids[n].sample(lats, lngs)
+            timings[name] = (time.perf_counter() - start) / args.repeat * 1000
+
+        print(f"  every {interval:>5} m  {lats.size:6d} samples  level {level} ({levels[level]:>4}/°)  "
+              f"pages {full_pages:6d} -> {level_pages:5d}  "
+              f"sample {timings['full']:6.2f} -> {timings['pyramid']:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
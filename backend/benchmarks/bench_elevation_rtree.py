@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark elevation_data nearest-point lookups: BETWEEN scan vs R*Tree.
+
+Builds a synthetic scraper database (random points over Great Britain, with
+the same schema, idx_location index and elevation_rtree the scraper creates)
+and times the original two-query BETWEEN lookup against the R*Tree
+k-nearest-neighbour path used by ElevationService.
+
+    python benchmarks/bench_elevation_rtree.py --points 10000000 --db /tmp/bench_elevation.db
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.elevation_index import ElevationIndex  # noqa: E402
+
+BOUNDS = (50.0, 58.0, -6.0, 2.0)  # lat_min, lat_max, lng_min, lng_max
+INSERT_BATCH = 500_000
+
+
+def build_database(db_path: str, points: int, seed: int = 0):
+    """Create a synthetic elevation database with ``points`` random rows"""
+    rng = np.random.default_rng(seed)
+    lat_min, lat_max, lng_min, lng_max = BOUNDS
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("""
+            CREATE TABLE elevation_data (
+                lat REAL, lng REAL, elevation REAL, source TEXT,
+                accuracy TEXT, timestamp INTEGER, PRIMARY KEY (lat, lng)
+            )
+        """)
+        conn.execute("CREATE INDEX idx_location ON elevation_data (lat, lng)")
+        conn.execute("""
+            CREATE VIRTUAL TABLE elevation_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)
+        """)
+
+        for start in range(0, points, INSERT_BATCH):
+            count = min(INSERT_BATCH, points - start)
+            lats = np.round(rng.uniform(lat_min, lat_max, count), 6)
+            lngs = np.round(rng.uniform(lng_min, lng_max, count), 6)
+            elevations = np.round(rng.uniform(0, 1000, count), 1)
+            conn.executemany(
+                "INSERT OR IGNORE INTO elevation_data VALUES (?, ?, ?, 'synthetic', 'medium', 0)",
+                zip(lats.tolist(), lngs.tolist(), elevations.tolist())
+            )
+            print(f"  inserted {start + count:,}/{points:,}")
+
+        conn.execute("""
+            INSERT INTO elevation_rtree SELECT rowid, lat, lat, lng, lng FROM elevation_data
+        """)
+        conn.commit()
+
+
+def between_lookup(conn: sqlite3.Connection, lat: float, lng: float):
+    """The original per-point lookup from ElevationService"""
+    result = conn.execute("""
+        SELECT elevation FROM elevation_data
+        WHERE lat BETWEEN ? AND ?
+        AND lng BETWEEN ? AND ?
+        ORDER BY ABS(lat - ?) + ABS(lng - ?) ASC
+        LIMIT 1
+    """, (lat - 0.0001, lat + 0.0001, lng - 0.0001, lng + 0.0001, lat, lng)).fetchone()
+    if result:
+        return result
+
+    return conn.execute("""
+        SELECT lat, lng, elevation FROM elevation_data
+        WHERE lat BETWEEN ? AND ?
+        AND lng BETWEEN ? AND ?
+        ORDER BY ABS(lat - ?) + ABS(lng - ?) ASC
+        LIMIT 4
+    """, (lat - 0.01, lat + 0.01, lng - 0.01, lng + 0.01, lat, lng)).fetchall()
+
+
+def report(name: str, timings: list):
+    ms = np.array(timings) * 1000
+    print(f"{name:<16} mean {ms.mean():8.3f} ms   p50 {np.percentile(ms, 50):8.3f} ms   "
+          f"p99 {np.percentile(ms, 99):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=10_000_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--db", default="bench_elevation.db", help="reused if it already exists")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Building synthetic database with {args.points:,} points...")
+        start = time.perf_counter()
+        build_database(args.db, args.points)
+        print(f"Built {args.db} in {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(1)
+    lat_min, lat_max, lng_min, lng_max = BOUNDS
+    queries = list(zip(rng.uniform(lat_min, lat_max, args.queries), rng.uniform(lng_min, lng_max, args.queries)))
+
+    between_timings = []
+    with sqlite3.connect(args.db) as conn:
+        for lat, lng in queries:
+            start = time.perf_counter()
+            between_lookup(conn, lat, lng)
+            between_timings.append(time.perf_counter() - start)
+
+    index = ElevationIndex(args.db)
+    rtree_timings = []
+    for lat, lng in queries:
+        start = time.perf_counter()
+        index.nearest(lat, lng, k=4)
+        rtree_timings.append(time.perf_counter() - start)
+
+    print(f"\n{args.queries:,} random lookups:")
+    report("BETWEEN scan", between_timings)
+    report("R*Tree kNN", rtree_timings)
+    print(f"speedup (mean)   {np.mean(between_timings) / np.mean(rtree_timings):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /lookup wire formats on large batches.
+
+The elevation service is replaced by a constant so the timings are request
+parsing, validation and response serialization only: Open-Elevation
+``locations`` objects versus columnar arrays and encoded polylines, answered
+as JSON or packed float32.
+
+    python benchmarks/bench_elevation_wire.py --points 10000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.api import elevation  # noqa: E402
+from app.services import polyline  # noqa: E402
+from app.services.elevation_datasets import ElevationDatasets  # noqa: E402
+
+
+class ConstantElevationService:
+    """Answers every point with 100m, so only the wire format is measured"""
+
+    db_path = ""
+    tile_path = None
+
+    def files(self):
+        return []
+
+    def get_elevations(self, lats, lngs):
+        return np.full(lats.size, 100.0)
+
+    def get_elevation_batch(self, coordinates):
+        return [{"latitude": lat, "longitude": lng, "elevation": 100.0} for lat, lng in coordinates]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    elevation.elevation_datasets = ElevationDatasets(ConstantElevationService())
+    app = FastAPI()
+    app.include_router(elevation.router)
+    client = TestClient(app)
+
+    rng = np.random.default_rng(0)
+    lats = np.round(51 + np.cumsum(rng.normal(0, 1e-4, args.points)), 6)
+    lngs = np.round(-1 + np.cumsum(rng.normal(0, 1e-4, args.points)), 6)
+    locations = [{"latitude": lat, "longitude": lng} for lat, lng in zip(lats.tolist(), lngs.tolist())]
+    polyline_type = f"{elevation.POLYLINE_MEDIA_TYPE}; precision=6"
+    binary = {"Accept": elevation.BINARY_MEDIA_TYPE}
+
+    cases = {
+        "locations -> json": (json.dumps({"locations": locations}), {"Content-Type": "application/json"}),
+        "locations -> binary": (json.dumps({"locations": locations}), {"Content-Type": "application/json", **binary}),
+        "columns -> json": (
+            json.dumps({"lats": lats.tolist(), "lngs": lngs.tolist()}),
+            {"Content-Type": elevation.COLUMNS_MEDIA_TYPE}
+        ),
+        "polyline6 -> json": (polyline.encode(lats, lngs, 6), {"Content-Type": polyline_type}),
+        "polyline6 -> binary": (polyline.encode(lats, lngs, 6), {"Content-Type": polyline_type, **binary}),
+    }
+
+    print(f"{args.points:,} points, median of {args.repeat}:")
+    for name, (body, headers) in cases.items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            response = client.post("/lookup", content=body, headers=headers)
+            timings.append(time.perf_counter() - start)
+            response.raise_for_status()
+        print(f"{name:<20} request {len(body) / 1024:7.0f} KiB   response {len(response.content) / 1024:6.0f} KiB   "
+              f"{np.median(timings) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark the shared geodesy module against geopy.
+
+Times ``--pairs`` point pairs (UK road-length segments, a few metres to a
+kilometre apart) measured one call at a time, the way the scrapers used to,
+and as one batched array call:
+
+- geopy geodesic vs geodesy.vincenty (WGS84 ellipsoid)
+- geopy great_circle and a scalar math haversine vs geodesy.haversine
+- geopy geodesic per vertex vs segment_lengths for one ``--vertices`` way
+
+and reports each one's speedup and largest difference from geopy's geodesic.
+geopy is only needed here (pip install geopy).
+
+    python benchmarks/bench_geodesy.py --pairs 100000 --vertices 10000
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+from elevation_common import geodesy
+
+
+def scalar_haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """The per-call haversine RouteService used before the geodesy module"""
+    lat1_rad, lat2_rad = math.radians(lat1), math.radians(lat2)
+    a = (math.sin(math.radians(lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * geodesy.EARTH_RADIUS_M * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def timed(function, repeat: int = 3):
+    """Best of ``repeat`` runs: (seconds, result)"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=100_000)
+    parser.add_argument("--vertices", type=int, default=10_000)
+    args = parser.parse_args()
+
+    try:
+        from geopy.distance import geodesic, great_circle
+    except ImportError:
+        sys.exit("bench_geodesy needs geopy (pip install geopy)")
+
+    rng = np.random.default_rng(0)
+    lat1 = rng.uniform(50.0, 58.0, args.pairs)
+    lng1 = rng.uniform(-6.0, 2.0, args.pairs)
+    lat2 = lat1 + rng.normal(0, 3e-3, args.pairs)
+    lng2 = lng1 + rng.normal(0, 5e-3, args.pairs)
+    pairs = list(zip(lat1.tolist(), lng1.tolist(), lat2.tolist(), lng2.tolist()))
+
+    geodesic_time, reference = timed(lambda: np.array([geodesic((a, b), (c, d)).meters for a, b, c, d in pairs]), 1)
+    cases = [
+        ("geopy great_circle", 1, lambda: np.array([great_circle((a, b), (c, d)).meters for a, b, c, d in pairs])),
+        ("scalar haversine", 3, lambda: np.array([scalar_haversine(*pair) for pair in pairs])),
+        ("geodesy.haversine", 3, lambda: geodesy.haversine(lat1, lng1, lat2, lng2)),
+        ("geodesy.vincenty", 3, lambda: geodesy.vincenty(lat1, lng1, lat2, lng2)),
+    ]
+
+    print(f"{args.pairs:,} point pairs, geopy geodesic {geodesic_time:.3f}s")
+    for name, repeat, function in cases:
+        seconds, distances = timed(function, repeat)
+        print(f"  {name:<20} {seconds:8.4f}s  {geodesic_time / seconds:8.1f}x  "
+              f"max diff {np.abs(distances - reference).max():.6f} m")
+
+    # One long way, as OSMRoadExtractor measures it
+    heading = np.cumsum(rng.normal(0, 0.3, args.vertices))
+    lats = 54.0 + np.cumsum(15 * np.cos(heading)) / geodesy.METRES_PER_DEGREE
+    lngs = -2.0 + np.cumsum(15 * np.sin(heading)) / (geodesy.METRES_PER_DEGREE * math.cos(math.radians(54.0)))
+    coordinates = list(zip(lats.tolist(), lngs.tolist()))
+    per_vertex, length = timed(
+        lambda: sum(geodesic(coordinates[i], coordinates[i + 1]).meters for i in range(len(coordinates) - 1)), 1
+    )
+    batched, batched_length = timed(lambda: float(geodesy.segment_lengths(lats, lngs, "vincenty").sum()))
+    print(f"{args.vertices:,}-vertex way: geopy {per_vertex:.3f}s, segment_lengths {batched:.4f}s "
+          f"({per_vertex / batched:.0f}x), length diff {abs(batched_length - length):.6f} m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Build the memory-mapped elevation tile store served by the elevation API.
+
+Reads scraped points from the grid scraper's elevation database (legacy or
+compact layout) and/or the road scraper's road_elevation_profiles samples,
+grids them and writes a versioned tile file (see app/services/elevation_tiles.py)
+with halved-resolution overview levels for zoomed-out profiles.
+
+    python build_elevation_tiles.py --elevation-db ../elevation-scraper/elevation.db \\
+        --road-db ../elevation-scraper/uk_elevation.db \\
+        --output ../elevation-scraper/elevation.tiles
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.elevation_grid import build_overviews, build_tiles, overview_levels, read_elevation_points
+from app.services.elevation_tiles import write_tile_store
+
+
+def read_road_sample_points(db_path: str) -> np.ndarray:
+    """All (lat, lng, elevation) samples stored by RoadElevationDatabase"""
+    points = []
+    with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+        for (samples_json,) in conn.execute("SELECT elevation_samples FROM road_elevation_profiles"):
+            for sample in json.loads(samples_json or "[]"):
+                if sample.get("elevation") is not None:
+                    points.append((sample["lat"], sample["lng"], sample["elevation"]))
+
+    return np.array(points, dtype=np.float64).reshape(-1, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the elevation tile store")
+    parser.add_argument("--elevation-db", action="append", default=[],
+                        help="grid scraper elevation database (repeatable)")
+    parser.add_argument("--road-db", action="append", default=[],
+                        help="database with a road_elevation_profiles table (repeatable)")
+    parser.add_argument("--output", default=settings.ELEVATION_TILE_PATH)
+    parser.add_argument("--cells-per-degree", type=int, default=settings.ELEVATION_GRID_CELLS_PER_DEGREE)
+    parser.add_argument("--search-radius", type=float, default=settings.ELEVATION_GRID_SEARCH_RADIUS)
+    parser.add_argument("--overview-levels", type=int, default=settings.ELEVATION_OVERVIEW_LEVELS,
+                        help="halved-resolution levels to add (fewer if cells-per-degree runs out of factors of 2)")
+    args = parser.parse_args()
+
+    if not args.elevation_db and not args.road_db:
+        args.elevation_db = [settings.ELEVATION_DB_PATH]
+
+    sources = [read_elevation_points(path) for path in args.elevation_db]
+    sources += [read_road_sample_points(path) for path in args.road_db]
+    points = np.concatenate(sources)
+    print(f"📊 Loaded {len(points):,} elevation points")
+
+    start = time.time()
+    tiles = build_tiles(
+        points[:, 0], points[:, 1], points[:, 2],
+        cells_per_degree=args.cells_per_degree,
+        search_radius=args.search_radius
+    )
+    levels = overview_levels(args.cells_per_degree, args.overview_levels)
+    overviews = build_overviews(tiles, len(levels) - 1)
+    write_tile_store(args.output, tiles, args.cells_per_degree, overviews)
+    print(f"✅ Wrote {len(tiles)} tiles with {len(overviews)} overview levels "
+          f"({', '.join(map(str, levels))} cells/degree) to {args.output} in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1226 @@
+import pytest
+import asyncio
+import json
+import sqlite3
+import struct
+from types import SimpleNamespace
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from elevation_common import elevation_keys, elevation_stats, geodesy
+from elevation_common.elevation_profile import profile_statistics, resample_line
+from elevation_common.geodesy import METRES_PER_DEGREE, segment_lengths
+from app.api import elevation
+from app.api.elevation import ElevationService
+from app.core.executors import InstrumentedExecutor
+from app.models.route import Route
+from app.models.waypoint import Waypoint
+from app.services.elevation_batcher import ElevationBatcher
+from app.services.elevation_cache import LRUTileCache
+from app.services.elevation_datasets import ElevationDatasets
+from app.services.elevation_grid import (
+    ElevationGrid, ElevationTile, build_overviews, build_tiles, downsample_tile, level_for_spacing, overview_levels
+)
+from app.services.elevation_idw import PointIndex
+from app.services.elevation_index import ElevationIndex
+from app.services.elevation_roads import RoadProfileIndex
+from app.services.elevation_tiles import NODATA, TileStore, TileStoreError, write_tile_store
+from app.services import polyline
+from app.services.polyline import PolylineError
+from app.services.route_service import RouteService
+
+
+def planar_elevation(lat, lng):
+    """Elevation surface that bilinear interpolation reproduces exactly"""
+    return 50.0 + 100.0 * (lat - 51.0) + 40.0 * (lng + 1.0)
+
+
+@pytest.fixture
+def elevation_db(tmp_path):
+    """Scraper-style database with an 11x11 lattice over one 1° grid cell."""
+    db_path = str(tmp_path / "elevation.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE elevation_data (
+                lat REAL, lng REAL, elevation REAL, source TEXT,
+                accuracy TEXT, timestamp INTEGER, PRIMARY KEY (lat, lng)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE scrape_progress (
+                grid_id TEXT PRIMARY KEY, lat_min REAL, lat_max REAL, lng_min REAL,
+                lng_max REAL, status TEXT, priority INTEGER, last_attempt INTEGER,
+                error_count INTEGER DEFAULT 0
+            )
+        """)
+        rows = []
+        for i in range(11):
+            for j in range(11):
+                lat = 51.0 + i * 0.1
+                lng = -1.0 + j * 0.1
+                rows.append((lat, lng, planar_elevation(lat, lng), "open_elevation", "medium", 0))
+        conn.executemany("INSERT INTO elevation_data VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("INSERT INTO scrape_progress VALUES ('51_-1', 51, 52, -1, 0, 'completed', 1, 0, 0)")
+        conn.commit()
+    return db_path
+
+
+@pytest.fixture
+def elevation_rtree_db(elevation_db):
+    """The same database with the R*Tree the scraper maintains."""
+    with sqlite3.connect(elevation_db) as conn:
+        conn.execute("""
+            CREATE VIRTUAL TABLE elevation_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)
+        """)
+        conn.execute("""
+            INSERT INTO elevation_rtree SELECT rowid, lat, lat, lng, lng FROM elevation_data
+        """)
+        conn.commit()
+    return elevation_db
+
+
+@pytest.fixture
+def elevation_compact_db(tmp_path):
+    """The same lattice in compact Morton-keyed storage."""
+    db_path = str(tmp_path / "elevation_compact.db")
+    lats, lngs = np.meshgrid(51.0 + np.arange(11) * 0.1, -1.0 + np.arange(11) * 0.1, indexing="ij")
+    keys = elevation_keys.encode(lats.ravel(), lngs.ravel())
+    elevations_dm = np.round(planar_elevation(lats.ravel(), lngs.ravel()) * elevation_keys.ELEVATION_SCALE)
+    with sqlite3.connect(db_path) as conn:
+        for statement in elevation_keys.COMPACT_SCHEMA:
+            conn.execute(statement)
+        conn.execute("""
+            CREATE TABLE scrape_progress (
+                grid_id TEXT PRIMARY KEY, lat_min REAL, lat_max REAL, lng_min REAL,
+                lng_max REAL, status TEXT, priority INTEGER, last_attempt INTEGER,
+                error_count INTEGER DEFAULT 0
+            )
+        """)
+        conn.execute("INSERT INTO elevation_sources (id, name) VALUES (1, 'open_elevation')")
+        conn.executemany(
+            "INSERT INTO elevation_points VALUES (?, ?, 1, ?, 0)",
+            [(int(key), int(dm), elevation_keys.ACCURACY_CODES["medium"]) for key, dm in zip(keys, elevations_dm)]
+        )
+        conn.execute("INSERT INTO scrape_progress VALUES ('51_-1', 51, 52, -1, 0, 'completed', 1, 0, 0)")
+        conn.commit()
+    return db_path
+
+
+def road_elevation(distance_along_road):
+    """A steep climb: a grid interpolating between coarse points would flatten it"""
+    return 60.0 + 0.08 * distance_along_road
+
+
+@pytest.fixture
+def road_db(tmp_path):
+    """Road scraper database with one east-west road sampled every 20m, plus its R*Tree."""
+    db_path = str(tmp_path / "road_elevation.db")
+    metres_per_degree_lng = METRES_PER_DEGREE * np.cos(np.radians(51.5))
+    distances = np.arange(0, 1001, 20.0)
+    samples = [
+        {"lat": 51.5, "lng": -0.5 + d / metres_per_degree_lng, "elevation": road_elevation(d), "distance_along_road": d}
+        for d in distances.tolist()
+    ]
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("""
+            CREATE TABLE road_elevation_profiles (
+                segment_id TEXT PRIMARY KEY, osm_way_id INTEGER, road_type TEXT, surface TEXT,
+                length_meters REAL, min_elevation REAL, max_elevation REAL, total_ascent REAL,
+                total_descent REAL, max_gradient REAL, avg_gradient REAL,
+                cycling_suitability_score REAL, elevation_samples TEXT
+            )
+        """)
+        conn.execute("""
+            INSERT INTO road_elevation_profiles (segment_id, osm_way_id, road_type, elevation_samples)
+            VALUES ('seg_1', 1, 'secondary', ?)
+        """, (json.dumps(samples),))
+        conn.execute("CREATE VIRTUAL TABLE road_profile_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)")
+        conn.execute("""
+            INSERT INTO road_profile_rtree
+            SELECT p.rowid, MIN(json_extract(s.value, '$.lat')), MAX(json_extract(s.value, '$.lat')),
+                MIN(json_extract(s.value, '$.lng')), MAX(json_extract(s.value, '$.lng'))
+            FROM road_elevation_profiles p, json_each(p.elevation_samples) s GROUP BY p.rowid
+        """)
+        conn.commit()
+    return db_path
+
+
+@pytest.fixture
+def elevation_service(elevation_db):
+    return ElevationService(db_path=elevation_db, tile_path=None, cells_per_degree=10)
+
+
+@pytest.fixture
+def elevation_client(elevation_service, monkeypatch):
+    """Client for an app serving only the elevation router."""
+    monkeypatch.setattr(elevation, "elevation_datasets", ElevationDatasets(elevation_service))
+    app = FastAPI()
+    app.include_router(elevation.router)
+    return TestClient(app)
+
+
+class TestElevationGrid:
+    """Test the gridded elevation engine."""
+
+    def test_build_tiles_aligned_lattice(self):
+        """Test source points on grid nodes are reproduced exactly."""
+        lats, lngs = np.meshgrid(np.linspace(51, 52, 11), np.linspace(-1, 0, 11), indexing="ij")
+        tiles = build_tiles(lats.ravel(), lngs.ravel(), planar_elevation(lats, lngs).ravel(), cells_per_degree=10)
+
+        assert (51, -1) in tiles
+        assert tiles[(51, -1)].data.shape == (11, 11)
+        np.testing.assert_allclose(tiles[(51, -1)].elevations(), planar_elevation(lats, lngs), atol=1e-3)
+
+    def test_sample_bilinear(self):
+        """Test vectorized bilinear sampling between nodes."""
+        lats, lngs = np.meshgrid(np.linspace(51, 52, 11), np.linspace(-1, 0, 11), indexing="ij")
+        grid = ElevationGrid(
+            build_tiles(lats.ravel(), lngs.ravel(), planar_elevation(lats, lngs).ravel(), cells_per_degree=10),
+            cells_per_degree=10
+        )
+
+        query_lats = np.random.default_rng(0).uniform(51, 52, 500)
+        query_lngs = np.random.default_rng(1).uniform(-1, 0, 500)
+        np.testing.assert_allclose(
+            grid.sample(query_lats, query_lngs),
+            planar_elevation(query_lats, query_lngs),
+            atol=1e-3
+        )
+
+    def test_sample_outside_coverage(self):
+        """Test points without any tile come back as NaN."""
+        grid = ElevationGrid(build_tiles([51.5], [-0.5], [120.0], cells_per_degree=10), cells_per_degree=10)
+
+        result = grid.sample(np.array([51.5, 10.0]), np.array([-0.5, 10.0]))
+        assert result[0] == pytest.approx(120.0)
+        assert np.isnan(result[1])
+
+    def test_overview_levels(self):
+        """Test levels halve while the node count stays even."""
+        assert overview_levels(100, 4) == [100, 50, 25]
+        assert overview_levels(1200, 4) == [1200, 600, 300, 150, 75]
+        assert overview_levels(1200, 1) == [1200, 600]
+
+        levels = [1200, 600, 300]
+        assert level_for_spacing(levels, 20) == 0
+        assert level_for_spacing(levels, 200) == 1
+        assert level_for_spacing(levels, 5000) == 2
+
+    def test_downsample_keeps_planes_and_fills_holes(self):
+        """Test overviews reproduce a plane and don't spread missing nodes."""
+        lats, lngs = np.meshgrid(np.linspace(51, 52, 11), np.linspace(-1, 0, 11), indexing="ij")
+        values = planar_elevation(lats, lngs).astype(np.float32)
+        values[4, 4] = np.nan
+
+        overview = downsample_tile(ElevationTile(values))
+
+        assert overview.data.shape == (6, 6)
+        np.testing.assert_allclose(overview.elevations(), planar_elevation(lats, lngs)[::2, ::2], atol=1e-3)
+
+
+class TestPointIndex:
+    """Test batch nearest-neighbour queries and IDW in metric space."""
+
+    @pytest.mark.parametrize("count", [1, 3, 2000])
+    def test_query_matches_brute_force(self, count):
+        """Test grid-bucket kNN against distances to every point."""
+        rng = np.random.default_rng(count)
+        lats = rng.uniform(51, 52, count)
+        lngs = rng.uniform(-1, 0, count)
+        index = PointIndex(lats, lngs, rng.uniform(0, 500, count))
+
+        query_lats = rng.uniform(50.5, 52.5, 300)
+        query_lngs = rng.uniform(-1.5, 0.5, 300)
+        distances, neighbours = index.query(query_lats, query_lngs, k=4, max_distance=20_000)
+
+        query_x, query_y = index.project(query_lats, query_lngs)
+        point_x, point_y = index.project(index.lats, index.lngs)
+        everything = np.sort(np.hypot(query_x[:, None] - point_x, query_y[:, None] - point_y), axis=1)
+        expected = np.full((300, 4), np.inf)
+        expected[:, :min(count, 4)] = everything[:, :4]
+        expected[expected > 20_000] = np.inf
+
+        np.testing.assert_allclose(distances, expected)
+        assert ((neighbours >= 0) == np.isfinite(expected)).all()
+
+    def test_distances_are_metric(self):
+        """Test a degree of longitude is shorter than a degree of latitude at 60°N."""
+        index = PointIndex(np.array([60.0, 61.0, 60.0]), np.array([10.0, 10.0, 11.0]), np.zeros(3))
+        distances, neighbours = index.query(np.array([60.0]), np.array([10.0]), k=3)
+
+        assert distances[0].tolist() == pytest.approx([0.0, METRES_PER_DEGREE / 2, METRES_PER_DEGREE], rel=2e-2)
+        assert index.lngs[neighbours[0, 1]] == 11.0
+
+    def test_interpolate(self):
+        """Test exact hits return the stored value and gaps come back as NaN."""
+        index = PointIndex(np.array([51.0, 51.0]), np.array([-1.0, -0.9]), np.array([100.0, 200.0]))
+        values = index.interpolate(
+            np.array([51.0, 51.0, 53.0]), np.array([-1.0, -0.95, -1.0]), k=2, max_distance=50_000
+        )
+
+        assert values[0] == pytest.approx(100.0)
+        assert values[1] == pytest.approx(150.0)
+        assert np.isnan(values[2])
+
+
+class TestGeodesy:
+    """Test the vectorized geodesy functions."""
+
+    def test_vincenty_reference(self):
+        """Test Vincenty's Flinders Peak to Buninyong example on WGS84."""
+        distance = geodesy.vincenty(-37.95103342, 144.42486789, -37.65282114, 143.92649554)
+        assert distance == pytest.approx(54972.271, abs=1e-3)
+
+    def test_distances_batched(self):
+        """Test batched distances agree with each other and are zero for coincident points."""
+        rng = np.random.default_rng(0)
+        lats = rng.uniform(50, 58, 1000)
+        lngs = rng.uniform(-6, 2, 1000)
+
+        spherical = geodesy.haversine(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+        ellipsoidal = geodesy.vincenty(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+        np.testing.assert_allclose(spherical, ellipsoidal, rtol=6e-3)
+        np.testing.assert_array_equal(geodesy.segment_lengths(lats, lngs, "vincenty"), ellipsoidal)
+        assert geodesy.vincenty(51.5, -0.1, 51.5, -0.1) == 0.0
+
+        cumulative = geodesy.cumulative_length(lats, lngs)
+        assert cumulative[0] == 0.0
+        np.testing.assert_allclose(np.diff(cumulative), spherical)
+
+        with pytest.raises(ValueError):
+            geodesy.segment_lengths(lats, lngs, "flat")
+
+    def test_bearing(self):
+        """Test bearings of the cardinal directions."""
+        bearings = geodesy.bearing(51.0, 0.0, [52.0, 51.0, 50.0, 51.0], [0.0, 0.1, 0.0, -0.1])
+        np.testing.assert_allclose(bearings, [0.0, 90.0, 180.0, 270.0], atol=0.1)
+
+    def test_local_projection(self):
+        """Test projected distances match haversine nearby and unproject inverts project."""
+        projection = geodesy.LocalProjection(51.5)
+        x, y = projection.project([51.5, 51.501], [-0.1, -0.098])
+
+        assert np.hypot(np.diff(x), np.diff(y))[0] == pytest.approx(
+            float(geodesy.haversine(51.5, -0.1, 51.501, -0.098)), rel=1e-4
+        )
+        np.testing.assert_allclose(projection.unproject(x, y), [[51.5, 51.501], [-0.1, -0.098]])
+
+
+class TestElevationProfile:
+    """Test route resampling and profile statistics."""
+
+    def test_resample_fixed_interval(self):
+        """Test samples are evenly spaced in metres and end on the last vertex."""
+        lats = np.array([51.0, 51.0, 51.01])
+        lngs = np.array([-1.0, -0.99, -0.99])
+        sample_lats, sample_lngs, distances = resample_line(lats, lngs, 100)
+
+        total = segment_lengths(lats, lngs).sum()
+        np.testing.assert_allclose(distances[:-1], np.arange(0, total, 100))
+        assert distances[-1] == pytest.approx(total)
+        assert (sample_lats[-1], sample_lngs[-1]) == (51.01, -0.99)
+
+        # Samples stay on the polyline: along the first leg, then up the second
+        first_leg = distances <= segment_lengths(lats, lngs)[0]
+        np.testing.assert_allclose(sample_lats[first_leg], 51.0)
+        np.testing.assert_allclose(sample_lngs[~first_leg], -0.99)
+
+    def test_resample_distance_method(self):
+        """Test sample distances use the requested method, ending at that method's length."""
+        lats = np.array([51.0, 51.0, 51.01])
+        lngs = np.array([-1.0, -0.99, -0.99])
+        _, _, distances = resample_line(lats, lngs, 100, method="vincenty")
+
+        total = segment_lengths(lats, lngs, "vincenty").sum()
+        assert distances[-1] == pytest.approx(total)
+        np.testing.assert_allclose(np.diff(distances[:-1]), 100)
+
+    def test_statistics_match_scraper(self):
+        """Test the vectorized kernel agrees with a per-sample reference loop."""
+        distances = np.arange(0, 300, 20.0)
+        elevations = np.random.default_rng(0).uniform(0, 50, distances.size)
+        stats = profile_statistics(distances, elevations)
+
+        for i in range(distances.size - 1):
+            gradient = (elevations[i + 1] - elevations[i]) / (distances[i + 1] - distances[i]) * 100
+            local = [
+                abs((elevations[j + 1] - elevations[j]) / (distances[j + 1] - distances[j]) * 100)
+                for j in range(i, min(i + 5, distances.size - 1))
+            ]
+            assert stats.gradients[i] == pytest.approx(gradient)
+            assert stats.local_max_gradients[i] == pytest.approx(max(local))
+        assert np.isnan(stats.gradients[-1])
+
+        rises = np.diff(elevations)
+        assert stats.total_ascent == pytest.approx(rises[rises > 0].sum())
+        assert stats.total_descent == pytest.approx(-rises[rises < 0].sum())
+        assert stats.max_gradient == pytest.approx(np.nanmax(stats.gradients))
+
+    def test_route_elevation_data(self):
+        """Test route summaries come from the kernel and stay JSON-safe."""
+        data = RouteService(None)._calculate_elevation_data([0.0, 100.0, 100.0, 300.0], [10.0, 15.0, 14.0, 4.0])
+
+        assert data["total_ascent"] == 5.0
+        assert data["total_descent"] == 11.0
+        assert (data["min_elevation"], data["max_elevation"]) == (4.0, 15.0)
+        assert data["max_gradient"] == 5.0
+        assert [point.get("gradient") for point in data["points"]] == [5.0, None, -5.0, None]
+        json.dumps(data, allow_nan=False)
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *criteria):
+        return self
+
+    def order_by(self, *columns):
+        return self
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+
+class FakeRouteSession:
+    """Just enough of a Session for RouteService.calculate_route_metrics, on one route."""
+
+    def __init__(self, route, waypoints):
+        self.rows = {Route: [route], Waypoint: waypoints}
+        self.commits = 0
+
+    def query(self, model):
+        return FakeQuery(self.rows[model])
+
+    def commit(self):
+        self.commits += 1
+
+    def refresh(self, instance):
+        pass
+
+
+@pytest.fixture
+def route_waypoints(monkeypatch):
+    """Waypoints heading north about 111 m apart; their point is a (lat, lng) pair."""
+    # The service's own point extraction is still a placeholder
+    monkeypatch.setattr(RouteService, "_extract_coordinates", lambda self, point: point)
+
+    def waypoints(*elevations):
+        return [
+            SimpleNamespace(point=(51.0 + 0.001 * i, -1.0), elevation=elevation, order=i)
+            for i, elevation in enumerate(elevations)
+        ]
+    return waypoints
+
+
+class TestRouteElevation:
+    def test_metrics_store_elevation_data(self, route_waypoints):
+        """Test ascent, descent and maximum gradient are stored on the route."""
+        route = SimpleNamespace(id="route", elevation_data=None)
+        waypoints = route_waypoints(100.0, 110.0, 105.0, 125.0)
+        session = FakeRouteSession(route, waypoints)
+
+        assert asyncio.run(RouteService(session).calculate_route_metrics("route")) is route
+        distances = geodesy.cumulative_length([wp.point[0] for wp in waypoints], [wp.point[1] for wp in waypoints])
+        data = route.elevation_data
+        assert data["total_ascent"] == 30.0
+        assert data["total_descent"] == 5.0
+        assert (data["min_elevation"], data["max_elevation"]) == (100.0, 125.0)
+        assert data["max_gradient"] == round(20.0 / (distances[3] - distances[2]) * 100, 2)
+        assert [point["distance"] for point in data["points"]] == np.round(distances, 1).tolist()
+        assert route.distance == pytest.approx(distances[-1])
+        assert session.commits == 1
+        json.dumps(data, allow_nan=False)
+
+    def test_waypoints_without_elevation(self, route_waypoints):
+        """Test a route with any waypoint lacking an elevation gets no elevation data."""
+        route = SimpleNamespace(id="route", elevation_data=None)
+        session = FakeRouteSession(route, route_waypoints(100.0, None, 125.0))
+
+        asyncio.run(RouteService(session).calculate_route_metrics("route"))
+        assert route.elevation_data is None
+        assert route.distance > 0
+        assert session.commits == 1
+
+
+class TestPolyline:
+    """Test the encoded polyline codec."""
+
+    def test_reference_example(self):
+        """Test the worked example from the format's documentation."""
+        lats, lngs = polyline.decode("_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+
+        np.testing.assert_allclose(lats, [38.5, 40.7, 43.252])
+        np.testing.assert_allclose(lngs, [-120.2, -120.95, -126.453])
+        assert polyline.encode(lats, lngs) == "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+    @pytest.mark.parametrize("precision", [5, 6])
+    def test_round_trip(self, precision):
+        """Test encoding then decoding is exact to the precision."""
+        rng = np.random.default_rng(0)
+        lats = 51 + np.cumsum(rng.normal(0, 1e-3, 500))
+        lngs = -1 + np.cumsum(rng.normal(0, 1e-3, 500))
+
+        decoded = polyline.decode(polyline.encode(lats, lngs, precision), precision)
+
+        np.testing.assert_allclose(decoded[0], lats, atol=0.51 * 10.0 ** -precision)
+        np.testing.assert_allclose(decoded[1], lngs, atol=0.51 * 10.0 ** -precision)
+
+    @pytest.mark.parametrize("encoded", ["_p~iF~ps|U_", "_p~iF", "abc def"])
+    def test_malformed(self, encoded):
+        """Test truncated or invalid polylines are rejected."""
+        with pytest.raises(PolylineError):
+            polyline.decode(encoded)
+
+class TestTileStore:
+    """Test the memory-mapped tile store."""
+
+    def test_round_trip(self, tmp_path):
+        """Test tiles survive quantization to int16 within 5cm."""
+        values = np.linspace(-20, 950, 121, dtype=np.float32).reshape(11, 11)
+        values[3, 4] = np.nan
+        path = str(tmp_path / "elevation.tiles")
+        write_tile_store(path, {(51, -1): ElevationTile(values), (52, -1): ElevationTile(values + 10)}, 10)
+
+        store = TileStore(path)
+        assert store.cells_per_degree == 10
+        assert set(store) == {(51, -1), (52, -1)}
+        assert (53, -1) not in store
+
+        tile = store[(51, -1)]
+        assert tile.data.dtype == np.int16
+        assert tile.data[3, 4] == NODATA
+        decoded = tile.elevations()
+        assert np.isnan(decoded[3, 4])
+        np.testing.assert_allclose(decoded, values, atol=0.05)
+
+    def test_tiles_are_views_of_the_mapping(self, tmp_path):
+        """Test tiles are zero-copy views rather than decoded copies."""
+        path = str(tmp_path / "elevation.tiles")
+        write_tile_store(path, {(51, -1): ElevationTile(np.zeros((11, 11), dtype=np.float32))}, 10)
+
+        tile = TileStore(path)[(51, -1)]
+        assert not tile.data.flags.owndata
+        assert not tile.data.flags.writeable
+
+    def test_rejects_unknown_files(self, tmp_path):
+        """Test files that are not tile stores are refused."""
+        path = tmp_path / "elevation.tiles"
+        path.write_bytes(b"SQLite format 3\0" + bytes(100))
+
+        with pytest.raises(TileStoreError):
+            TileStore(str(path))
+
+    def test_overviews_round_trip(self, tmp_path):
+        """Test overview levels are stored and read back at their own resolution."""
+        lats, lngs = np.meshgrid(np.linspace(51, 52, 9), np.linspace(-1, 0, 9), indexing="ij")
+        tiles = {(51, -1): ElevationTile(planar_elevation(lats, lngs).astype(np.float32))}
+        path = str(tmp_path / "elevation.tiles")
+        write_tile_store(path, tiles, 8, build_overviews(tiles, 2))
+
+        store = TileStore(path)
+        assert store.levels == 3
+        assert set(store) == {(51, -1)}
+        for level, cells in enumerate([8, 4, 2]):
+            overview = store.level(level)
+            assert overview.cells_per_degree == cells
+            tile = overview[(51, -1)]
+            assert tile.data.shape == (cells + 1, cells + 1)
+            step = 8 // cells
+            np.testing.assert_allclose(tile.elevations(), planar_elevation(lats, lngs)[::step, ::step], atol=0.05)
+
+    def test_reads_version_1_files(self, tmp_path):
+        """Test stores written before overviews existed still open."""
+        path = tmp_path / "elevation.tiles"
+        write_tile_store(str(path), {(51, -1): ElevationTile(np.full((11, 11), 7.0, dtype=np.float32))}, 10)
+        data = bytearray(path.read_bytes())
+        data[8:12] = struct.pack("<HH", 1, 0)  # version 1, reserved field
+        path.write_bytes(bytes(data))
+
+        store = TileStore(str(path))
+        assert store.version == 1
+        assert store.levels == 1
+        np.testing.assert_allclose(store[(51, -1)].elevations(), 7.0, atol=0.05)
+
+    def test_service_reads_tile_store(self, elevation_db, tmp_path):
+        """Test the service prefers a tile store over the database."""
+        lats, lngs = np.meshgrid(np.linspace(51, 52, 11), np.linspace(-1, 0, 11), indexing="ij")
+        tiles = build_tiles(lats.ravel(), lngs.ravel(), planar_elevation(lats, lngs).ravel(), cells_per_degree=10)
+        tile_path = str(tmp_path / "elevation.tiles")
+        write_tile_store(tile_path, tiles, 10)
+
+        for cache_bytes in (0, 1 << 20):
+            service = ElevationService(db_path=str(tmp_path / "missing.db"), tile_path=tile_path, cache_bytes=cache_bytes)
+            result = service.get_elevation_batch([(51.43, -0.91)])[0]
+
+            assert result["elevation"] == pytest.approx(planar_elevation(51.43, -0.91), abs=0.1)
+            assert isinstance(service.grid.tiles, TileStore) == (cache_bytes == 0)
+
+
+class TestLRUTileCache:
+    """Test the bounded tile cache."""
+
+    @staticmethod
+    def make_cache(max_tiles):
+        loads = []
+
+        def loader(key):
+            loads.append(key)
+            return None if key[0] < 0 else ElevationTile(np.zeros((11, 11), dtype=np.float32))
+
+        tile_bytes = 11 * 11 * 4
+        return LRUTileCache(loader, max_tiles * tile_bytes), loads
+
+    def test_hits_and_misses(self):
+        """Test repeated lookups are served from memory."""
+        cache, loads = self.make_cache(4)
+
+        assert cache.get((51, -1)) is cache.get((51, -1))
+        assert loads == [(51, -1)]
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_evicts_least_recently_used(self):
+        """Test the byte budget evicts the least recently used tile."""
+        cache, loads = self.make_cache(2)
+
+        cache.get((51, -1))
+        cache.get((52, -1))
+        cache.get((51, -1))
+        cache.get((53, -1))  # evicts (52, -1)
+        cache.get((51, -1))
+        cache.get((52, -1))
+
+        assert loads == [(51, -1), (52, -1), (53, -1), (52, -1)]
+        stats = cache.stats()
+        assert stats["evictions"] == 2
+        assert stats["entries"] == 2
+        assert stats["bytes"] <= stats["max_bytes"]
+
+    def test_caches_missing_tiles(self):
+        """Test tiles without data are remembered as missing."""
+        cache, loads = self.make_cache(2)
+
+        assert cache.get((-5, 0)) is None
+        assert cache.get((-5, 0)) is None
+        assert loads == [(-5, 0)]
+
+
+class TestElevationKeys:
+    """Test Morton coordinate keys."""
+
+    def test_round_trip(self):
+        """Test keys decode to within half a microdegree."""
+        rng = np.random.default_rng(0)
+        lats = rng.uniform(-90, 90, 1000)
+        lngs = rng.uniform(-180, 180, 1000)
+
+        decoded_lats, decoded_lngs = elevation_keys.decode(elevation_keys.encode(lats, lngs))
+        np.testing.assert_allclose(decoded_lats, lats, atol=5e-7)
+        np.testing.assert_allclose(decoded_lngs, lngs, atol=5e-7)
+
+    def test_equal_coordinates_share_a_key(self):
+        """Test float noise below a microdegree maps to the same key."""
+        keys = elevation_keys.encode([51.1, 51.0 + 0.1], [-0.3, -1.0 + 0.7])
+        assert keys[0] == keys[1]
+
+    def test_key_ranges_cover_box(self):
+        """Test every point inside a box falls in one of its key ranges."""
+        rng = np.random.default_rng(1)
+        for _ in range(50):
+            lat, lng, radius = rng.uniform(-80, 80), rng.uniform(-170, 170), rng.uniform(1e-4, 0.5)
+            ranges = elevation_keys.key_ranges(lat - radius, lat + radius, lng - radius, lng + radius)
+            keys = elevation_keys.encode(
+                rng.uniform(lat - radius, lat + radius, 200),
+                rng.uniform(lng - radius, lng + radius, 200)
+            )
+
+            covered = np.zeros(len(keys), dtype=bool)
+            for start, end in ranges:
+                covered |= (keys >= start) & (keys <= end)
+            assert covered.all()
+            assert len(ranges) <= 32
+
+
+class TestElevationIndex:
+    """Test spatial queries against the elevation database."""
+
+    @pytest.mark.parametrize("db_fixture", ["elevation_db", "elevation_rtree_db"])
+    def test_nearest_matches_brute_force(self, db_fixture, request):
+        """Test k-nearest-neighbour results with and without the R*Tree."""
+        index = ElevationIndex(request.getfixturevalue(db_fixture))
+        with sqlite3.connect(index.db_path) as conn:
+            everything = np.array(conn.execute("SELECT lat, lng, elevation FROM elevation_data").fetchall())
+
+        for lat, lng in [(51.43, -0.91), (51.57, -0.53), (52.1, -1.05)]:
+            distances = geodesy.haversine(lat, lng, everything[:, 0], everything[:, 1])
+            expected = everything[np.argsort(distances)[:4]]
+            np.testing.assert_allclose(index.nearest(lat, lng, k=4, max_radius=1.0), expected)
+
+        assert index.storage() == ("rtree" if db_fixture == "elevation_rtree_db" else "scan")
+
+    def test_nearest_respects_max_radius(self, elevation_rtree_db):
+        """Test points further than max_radius are never returned."""
+        index = ElevationIndex(elevation_rtree_db)
+
+        assert len(index.nearest(53.0, -0.5, k=4, max_radius=0.5)) == 0
+        # 0.25° of latitude is 27.8 km: the five nearest nodes of the 52° row, 0.1° of longitude (6.8 km) apart
+        assert len(index.nearest(52.2, -0.5, k=8, max_radius=0.25)) == 5
+
+    def test_window(self, elevation_rtree_db):
+        """Test bounding box queries through the R*Tree."""
+        points = ElevationIndex(elevation_rtree_db).window(51.0, 51.25, -1.0, -0.75)
+        assert len(points) == 9
+
+    def test_compact_storage_matches_legacy(self, elevation_rtree_db, elevation_compact_db):
+        """Test compact storage answers the same queries as elevation_data."""
+        legacy = ElevationIndex(elevation_rtree_db)
+        compact = ElevationIndex(elevation_compact_db)
+        assert compact.storage() == "compact"
+
+        for lat, lng in [(51.42, -0.93), (51.57, -0.54), (52.1, -1.06)]:
+            np.testing.assert_allclose(
+                compact.nearest(lat, lng, k=4, max_radius=1.0),
+                legacy.nearest(lat, lng, k=4, max_radius=1.0),
+                atol=0.05
+            )
+        assert len(compact.window(51.0, 51.25, -1.0, -0.75)) == 9
+        assert len(compact.all_points()) == 121
+
+        count, min_lat, max_lat, min_lng, max_lng = compact.coverage()
+        assert count == 121
+        assert (min_lat, max_lat, min_lng, max_lng) == pytest.approx((51.0, 52.0, -1.0, 0.0))
+
+
+class TestElevationStats:
+    """Test the incrementally maintained database statistics."""
+
+    @staticmethod
+    def upsert_legacy(conn, rows):
+        keys = [(lat, lng) for lat, lng, _, _ in rows]
+        elevation_stats.counted_upsert(
+            conn, False, keys, [r[0] for r in rows], [r[1] for r in rows],
+            lambda: conn.executemany("""
+                INSERT INTO elevation_data VALUES (?, ?, ?, ?, 'high', 0)
+                ON CONFLICT (lat, lng) DO UPDATE SET
+                    elevation = excluded.elevation, source = excluded.source, accuracy = excluded.accuracy
+            """, rows)
+        )
+
+    def test_existing_data_is_counted_once(self, elevation_db):
+        """Test creating the tables computes totals for data already stored."""
+        with sqlite3.connect(elevation_db) as conn:
+            elevation_stats.create_stats(conn, compact=False)
+            stats = elevation_stats.read_stats(conn)
+
+        assert stats["points"] == 121
+        assert stats["sources"] == {"open_elevation": 121}
+        assert stats["accuracy"] == {"medium": 121}
+        assert stats["grid_status"] == {"completed": 1}
+        assert stats["bounds"] == pytest.approx((51.0, 52.0, -1.0, 0.0))
+
+    def test_upserts_update_counts(self, elevation_db):
+        """Test new points add to the totals and overwritten ones move between sources."""
+        with sqlite3.connect(elevation_db) as conn:
+            elevation_stats.create_stats(conn, compact=False)
+            # One existing lattice point, one new point, and the new point twice more
+            self.upsert_legacy(conn, [(51.0, -1.0, 10.0, "srtm"), (53.5, 0.5, 20.0, "srtm")])
+            self.upsert_legacy(conn, [(53.5, 0.5, 21.0, "srtm"), (53.5, 0.5, 22.0, "srtm")])
+            stats = elevation_stats.read_stats(conn)
+
+            assert stats["points"] == 122
+            assert stats["sources"] == {"open_elevation": 120, "srtm": 2}
+            assert stats["accuracy"] == {"medium": 120, "high": 2}
+            assert stats["bounds"] == pytest.approx((51.0, 53.5, -1.0, 0.5))
+
+            elevation_stats.rebuild_stats(conn, compact=False)
+            assert elevation_stats.read_stats(conn) == stats
+
+    def test_grid_status_follows_scrape_progress(self, elevation_db):
+        """Test the triggers keep grid cell counts per status."""
+        with sqlite3.connect(elevation_db) as conn:
+            elevation_stats.create_stats(conn, compact=False)
+            conn.execute("INSERT INTO scrape_progress VALUES ('52_-1', 52, 53, -1, 0, 'pending', 1, 0, 0)")
+            conn.execute("INSERT INTO scrape_progress VALUES ('53_-1', 53, 54, -1, 0, 'pending', 1, 0, 0)")
+            conn.execute("UPDATE scrape_progress SET status = 'completed' WHERE grid_id = '52_-1'")
+            conn.execute("DELETE FROM scrape_progress WHERE grid_id = '51_-1'")
+
+            assert elevation_stats.read_stats(conn)["grid_status"] == {"completed": 1, "pending": 1}
+
+    def test_compact_storage(self, elevation_compact_db):
+        """Test totals of compact storage, decoding its keys for the bounds."""
+        with sqlite3.connect(elevation_compact_db) as conn:
+            elevation_stats.create_stats(conn, compact=True)
+            stats = elevation_stats.read_stats(conn)
+
+        assert stats["points"] == 121
+        assert stats["accuracy"] == {"medium": 121}
+        assert ElevationIndex(elevation_compact_db).coverage() == pytest.approx((121, 51.0, 52.0, -1.0, 0.0))
+
+class TestRoadProfileIndex:
+    """Test snapping points to road profiles."""
+
+    @staticmethod
+    def make_index():
+        # An L-shaped road (north, then east) and a separate road further east
+        metres = 1 / METRES_PER_DEGREE
+        north = np.arange(0, 201, 20.0)
+        east = np.arange(20, 201, 20.0)
+        lats = np.concatenate([51 + north * metres, np.full(east.size, 51 + 200 * metres), 51 + north * metres])
+        lngs = np.concatenate([np.zeros(north.size), east * metres / np.cos(np.radians(51)),
+                               np.full(north.size, 500 * metres / np.cos(np.radians(51)))])
+        distances = np.concatenate([north, 200 + east, north])
+        roads = np.repeat([1, 2], [north.size + east.size, north.size])
+        return RoadProfileIndex(roads, lats, lngs, road_elevation(distances)), metres
+
+    def test_interpolates_along_road(self):
+        index, metres = self.make_index()
+        lat_offset = 51 + np.array([30.0, 195.0]) * metres
+        lng_offset = np.array([5.0, -4.0]) * metres / np.cos(np.radians(51))
+        elevations, distances = index.snap(lat_offset, lng_offset, max_distance=15)
+
+        np.testing.assert_allclose(elevations, road_elevation(np.array([30.0, 195.0])), atol=1e-6)
+        np.testing.assert_allclose(distances, [5.0, 4.0], atol=0.01)
+
+    def test_snaps_to_nearest_road_only_within_range(self):
+        index, metres = self.make_index()
+        scale = metres / np.cos(np.radians(51))
+        elevations, distances = index.snap(
+            51 + np.array([100.0, 100.0, 100.0]) * metres, np.array([490.0, 250.0, 10.0]) * scale, max_distance=15
+        )
+
+        assert elevations[0] == pytest.approx(road_elevation(100.0))  # the separate road, not the corner
+        assert np.isnan(elevations[1]) and distances[1] == np.inf
+        assert elevations[2] == pytest.approx(road_elevation(100.0))
+
+    def test_corner_picks_closest_stretch(self):
+        index, metres = self.make_index()
+        scale = metres / np.cos(np.radians(51))
+        # Just inside the corner, closer to the eastbound stretch than the northbound one
+        elevations, _ = index.snap(np.array([51 + 198 * metres]), np.array([10.0 * scale]), max_distance=15)
+        assert elevations[0] == pytest.approx(road_elevation(210.0), abs=1e-6)
+
+
+class TestElevationService:
+    """Test batch elevation lookups."""
+
+    def test_batch_matches_source_data(self, elevation_service):
+        """Test batch lookups interpolate the stored lattice."""
+        coordinates = [(51.43, -0.91), (51.05, -0.25), (51.9, -0.99)]
+        results = elevation_service.get_elevation_batch(coordinates)
+
+        assert len(results) == 3
+        for (lat, lng), result in zip(coordinates, results):
+            assert result["latitude"] == lat
+            assert result["longitude"] == lng
+            assert result["elevation"] == pytest.approx(planar_elevation(lat, lng), abs=1e-3)
+
+    def test_batch_falls_back_to_estimate(self, elevation_service):
+        """Test coordinates outside the data use the regional estimate."""
+        results = elevation_service.get_elevation_batch([(40.0, -110.0)])
+        assert results[0]["elevation"] == 1500
+
+    def test_batch_uses_nearest_points_beyond_grid(self, elevation_rtree_db):
+        """Test points just outside grid coverage interpolate the nearest stored points."""
+        service = ElevationService(
+            db_path=elevation_rtree_db, tile_path=None, cells_per_degree=10, knn_max_radius=0.22
+        )
+        result = service.get_elevation_batch([(52.2, -0.5)])[0]
+
+        assert result["elevation"] == pytest.approx(planar_elevation(52.0, -0.5), abs=1e-6)
+
+    def test_batch_from_compact_storage(self, elevation_compact_db):
+        """Test batch lookups read compact Morton-keyed databases."""
+        service = ElevationService(
+            db_path=elevation_compact_db, tile_path=None, cells_per_degree=10, knn_max_radius=0.22
+        )
+        results = service.get_elevation_batch([(51.43, -0.91), (52.2, -0.5)])
+
+        assert results[0]["elevation"] == pytest.approx(planar_elevation(51.43, -0.91), abs=0.05)
+        assert results[1]["elevation"] == pytest.approx(planar_elevation(52.0, -0.5), abs=0.05)
+
+    @pytest.mark.parametrize("tile_store", [False, True])
+    def test_sparse_samples_use_overviews(self, elevation_db, tmp_path, tile_store):
+        """Test widely spaced points are read from a coarser level."""
+        tile_path = None
+        if tile_store:
+            lats, lngs = np.meshgrid(np.linspace(51, 52, 11), np.linspace(-1, 0, 11), indexing="ij")
+            tiles = build_tiles(lats.ravel(), lngs.ravel(), planar_elevation(lats, lngs).ravel(), cells_per_degree=10)
+            tile_path = str(tmp_path / "elevation.tiles")
+            write_tile_store(tile_path, tiles, 10, build_overviews(tiles, 1))
+        service = ElevationService(db_path=elevation_db, tile_path=tile_path, cells_per_degree=10)
+        lats, lngs = np.array([51.43, 51.8]), np.array([-0.91, -0.2])
+
+        assert [grid.cells_per_degree for grid in service.grids] == [10, 5]
+        elevations = service.get_elevations(lats, lngs, spacing=30_000)
+
+        np.testing.assert_allclose(elevations, planar_elevation(lats, lngs), atol=0.1)
+        assert service.cache_stats()["entries"] == (1 if tile_store else 2)
+
+    @pytest.mark.parametrize("rtree", [True, False])
+    def test_snap_to_roads(self, elevation_db, road_db, rtree):
+        if not rtree:
+            with sqlite3.connect(road_db) as conn:
+                conn.execute("DROP TABLE road_profile_rtree")
+        service = ElevationService(db_path=elevation_db, tile_path=None, cells_per_degree=10, road_db_path=road_db)
+        metres_per_degree_lng = METRES_PER_DEGREE * np.cos(np.radians(51.5))
+        lats = np.array([51.5 + 3 / METRES_PER_DEGREE, 51.6])
+        lngs = np.array([-0.5 + 410 / metres_per_degree_lng, -0.5])
+
+        elevations = service.get_elevations(lats, lngs, snap_to_roads=True)
+        assert elevations[0] == pytest.approx(road_elevation(410.0), abs=1e-6)
+        assert elevations[1] == pytest.approx(planar_elevation(51.6, -0.5), abs=1e-6)  # off-road: the grid
+        assert service.get_elevations(lats, lngs)[0] == pytest.approx(planar_elevation(lats[0], lngs[0]), abs=1e-6)
+
+    def test_empty_batch(self, elevation_service):
+        """Test an empty batch returns no results."""
+        assert elevation_service.get_elevation_batch([]) == []
+
+
+class TestElevationDatasets:
+    """Test hot-swapping dataset generations."""
+
+    @staticmethod
+    def write_tiles(path, offset):
+        lats, lngs = np.meshgrid(np.linspace(51, 52, 11), np.linspace(-1, 0, 11), indexing="ij")
+        elevations = planar_elevation(lats, lngs).ravel() + offset
+        write_tile_store(str(path), build_tiles(lats.ravel(), lngs.ravel(), elevations, cells_per_degree=10), 10)
+
+    def test_reload_swaps_after_requests_drain(self, elevation_db, tmp_path):
+        tile_path = tmp_path / "elevation.tiles"
+        self.write_tiles(tile_path, 0)
+        datasets = ElevationDatasets(ElevationService(db_path=elevation_db, tile_path=str(tile_path)))
+        expected = planar_elevation(51.43, -0.91)
+
+        with datasets.acquire() as old:
+            old.get_elevation_batch([(51.43, -0.91)])
+            self.write_tiles(tile_path, 100)
+            result = datasets.reload()
+
+            # The running request keeps the old generation and its mapping
+            assert result["generation"] == 2 and result["previous_generation"] == 1
+            assert old.get_elevation_batch([(51.43, -0.91)])[0]["elevation"] == pytest.approx(expected, abs=0.1)
+            assert old.tile_store is not None
+            assert datasets.stats()["draining"][0]["generation"] == 1
+
+        assert old.tile_store is None
+        assert datasets.stats()["draining"] == []
+        with datasets.acquire() as new:
+            assert new.get_elevation_batch([(51.43, -0.91)])[0]["elevation"] == pytest.approx(expected + 100, abs=0.1)
+            # Warmed with the tile the old generation was serving
+            assert new.tile_cache.keys() == [(0, 51, -1)]
+
+    def test_reload_new_database_drops_old_tiles(self, elevation_db, tmp_path):
+        """Test switching databases serves the new one's tile store, never the old database's tiles."""
+        old_dir, new_dir = tmp_path / "old", tmp_path / "new"
+        old_dir.mkdir()
+        new_dir.mkdir()
+        self.write_tiles(old_dir / "elevation.tiles", 100)
+        datasets = ElevationDatasets(
+            ElevationService(db_path=elevation_db, tile_path=str(old_dir / "elevation.tiles"), cells_per_degree=10)
+        )
+        new_db = new_dir / "uk_elevation.db"
+        new_db.write_bytes(open(elevation_db, "rb").read())
+
+        # No tiles beside the new database: its grid is built from the database itself
+        result = datasets.reload(db_path=str(new_db))
+        assert result["tile_path"] == str(new_dir / "uk_elevation.tiles")
+        with datasets.acquire() as service:
+            elevation = service.get_elevation_batch([(51.43, -0.91)])[0]["elevation"]
+            assert elevation == pytest.approx(planar_elevation(51.43, -0.91), abs=1e-3)
+            assert service.tile_store is None
+
+        # Once built, the new database's tile store is used and kept by later reloads
+        self.write_tiles(new_dir / "uk_elevation.tiles", 200)
+        assert datasets.reload()["tile_path"] == str(new_dir / "uk_elevation.tiles")
+        with datasets.acquire() as service:
+            elevation = service.get_elevation_batch([(51.43, -0.91)])[0]["elevation"]
+            assert elevation == pytest.approx(planar_elevation(51.43, -0.91) + 200, abs=0.1)
+
+        assert datasets.reload(db_path=elevation_db, tile_path="")["tile_path"] is None
+
+    def test_poll_waits_for_changes_to_settle(self, elevation_db):
+        datasets = ElevationDatasets(ElevationService(db_path=elevation_db, tile_path=None, cells_per_degree=10))
+        assert not datasets.poll()
+
+        with sqlite3.connect(elevation_db) as conn:
+            conn.execute("UPDATE elevation_data SET elevation = elevation + 1")
+        assert not datasets.poll()  # changed, wait a poll for writes to stop
+        assert datasets.poll()
+        assert datasets.stats()["generation"] == 2
+        assert not datasets.poll()
+
+    def test_failed_reload_keeps_serving(self, elevation_db, tmp_path):
+        tile_path = tmp_path / "elevation.tiles"
+        service = ElevationService(db_path=elevation_db, tile_path=str(tile_path), cells_per_degree=10)
+        datasets = ElevationDatasets(service)
+
+        tile_path.write_bytes(b"not a tile store")
+        assert not datasets.poll()
+        assert not datasets.poll()
+        assert datasets.current is service
+        assert "TileStoreError" in datasets.stats()["last_error"]
+        assert not datasets.poll()  # not retried until the files change again
+
+    def test_close_releases_tile_source(self, elevation_service):
+        """Test closing a generation closes the connections of the tiles built from its database."""
+        elevation_service.get_elevation_batch([(51.43, -0.91)])
+        index = elevation_service.tile_source.index
+        assert index._connections
+
+        elevation_service.close()
+        assert index._connections == []
+        assert elevation_service.tile_source is None
+
+    def test_watch_follows_app_lifecycle(self, elevation_client, monkeypatch):
+        """Test the file watch starts with the app, not on import, and stops on shutdown."""
+        monkeypatch.setattr(elevation.settings, "ELEVATION_RELOAD_POLL_SECONDS", 60)
+        assert not elevation.elevation_datasets.stats()["watching"]
+
+        with elevation_client:
+            assert elevation.elevation_datasets.stats()["watching"]
+        assert not elevation.elevation_datasets.stats()["watching"]
+
+
+class TestElevationBatcher:
+    """Test coalescing of concurrent lookups."""
+
+    @staticmethod
+    def make_batcher(**kwargs):
+        calls = []
+
+        def resolve(lats, lngs):
+            calls.append(lats.size)
+            return planar_elevation(lats, lngs)
+
+        return ElevationBatcher(resolve, InstrumentedExecutor("test", 1), **kwargs), calls
+
+    def test_concurrent_lookups_share_a_batch(self):
+        """Test overlapping requests are deduplicated and fanned back out."""
+        batcher, calls = self.make_batcher(window=0.05)
+        requests = [
+            (np.array([51.1, 51.2, 51.3]), np.array([-0.5, -0.6, -0.7])),
+            (np.array([51.2, 51.3, 51.4]), np.array([-0.6, -0.7, -0.8])),
+            (np.array([51.2000000001]), np.array([-0.6]))
+        ]
+
+        async def main():
+            return await asyncio.gather(*(batcher.lookup(lats, lngs) for lats, lngs in requests))
+
+        results = asyncio.run(main())
+
+        assert calls == [4]
+        for (lats, lngs), elevations in zip(requests, results):
+            np.testing.assert_allclose(elevations, planar_elevation(lats, lngs), atol=1e-3)
+
+        stats = batcher.stats()
+        assert stats["batches"] == 1
+        assert stats["points"] == 7
+        assert stats["unique_points"] == 4
+        assert stats["requests_per_batch"] == {"2-3": 1}
+
+    def test_max_points_flushes_early(self):
+        """Test a full batch is resolved without waiting out the window."""
+        batcher, calls = self.make_batcher(window=10, max_points=2)
+
+        async def main():
+            return await asyncio.wait_for(batcher.lookup(np.array([51.1, 51.2]), np.array([-0.5, -0.5])), 1)
+
+        assert len(asyncio.run(main())) == 2
+        assert calls == [2]
+
+    def test_errors_reach_every_request(self):
+        """Test a failed batch fails each request in it."""
+        def fail(lats, lngs):
+            raise ValueError("boom")
+
+        batcher = ElevationBatcher(fail, InstrumentedExecutor("test", 1), window=0.01)
+
+        async def main():
+            return await asyncio.gather(
+                batcher.lookup(np.array([51.1]), np.array([-0.5])),
+                batcher.lookup(np.array([51.2]), np.array([-0.5])),
+                return_exceptions=True
+            )
+
+        assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
+
+class TestElevationAPI:
+    """Test the elevation endpoints."""
+
+    def test_lookup(self, elevation_client):
+        """Test the Open-Elevation compatible lookup format."""
+        response = elevation_client.post("/lookup", json={
+            "locations": [{"latitude": 51.43, "longitude": -0.91}]
+        })
+
+        assert response.status_code == 200
+        result = response.json()["results"][0]
+        assert result["latitude"] == 51.43
+        assert result["longitude"] == -0.91
+        assert result["elevation"] == pytest.approx(planar_elevation(51.43, -0.91), abs=1e-3)
+
+    def test_lookup_columns(self, elevation_client):
+        """Test columnar requests get columnar JSON back."""
+        response = elevation_client.post(
+            "/lookup",
+            content=json.dumps({"lats": [51.43, 51.2], "lngs": [-0.91, -0.5]}),
+            headers={"Content-Type": elevation.COLUMNS_MEDIA_TYPE}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["elevations"] == pytest.approx(
+            [planar_elevation(51.43, -0.91), planar_elevation(51.2, -0.5)], abs=1e-3
+        )
+
+    @pytest.mark.parametrize("precision", [5, 6])
+    def test_lookup_polyline_binary(self, elevation_client, precision):
+        """Test a polyline request answered as packed float32."""
+        lats, lngs = [51.43, 51.2, 51.3], [-0.91, -0.5, -0.7]
+        response = elevation_client.post(
+            "/lookup",
+            content=polyline.encode(lats, lngs, precision),
+            headers={
+                "Content-Type": f"{elevation.POLYLINE_MEDIA_TYPE}; precision={precision}",
+                "Accept": "application/octet-stream"
+            }
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/octet-stream"
+        assert response.headers["x-elevation-count"] == "3"
+        elevations = np.frombuffer(response.content, dtype="<f4")
+        np.testing.assert_allclose(elevations, planar_elevation(np.array(lats), np.array(lngs)), atol=1e-2)
+
+    def test_lookup_locations_binary(self, elevation_client):
+        """Test the Open-Elevation format can ask for a binary response."""
+        response = elevation_client.post(
+            "/lookup",
+            json={"locations": [{"latitude": 51.43, "longitude": -0.91}]},
+            headers={"Accept": "application/octet-stream"}
+        )
+
+        assert response.status_code == 200
+        elevations = np.frombuffer(response.content, dtype="<f4")
+        assert elevations[0] == pytest.approx(planar_elevation(51.43, -0.91), abs=1e-2)
+
+    @pytest.mark.parametrize("content, content_type, status", [
+        ("_p~iF~ps|U_", "application/vnd.baroudeek.polyline", 400),
+        ("_p~iF~ps|U", "application/vnd.baroudeek.polyline; precision=7", 400),
+        ('{"lats": [51.4], "lngs": []}', "application/vnd.baroudeek.columns+json", 400),
+        ('{"lats": [51.4]}', "application/vnd.baroudeek.columns+json", 400),
+        ('{"lats": [NaN], "lngs": [-0.5]}', "application/vnd.baroudeek.columns+json", 400),
+        ('{"lats": [51.4], "lngs": [-Infinity]}', "application/vnd.baroudeek.columns+json", 400),
+        ('{"lats": [1e400], "lngs": [-0.5]}', "application/vnd.baroudeek.columns+json", 400),
+        ('{"lats": [90.5], "lngs": [-0.5]}', "application/vnd.baroudeek.columns+json", 400),
+        ('{"lats": [51.4], "lngs": [-180.1]}', "application/vnd.baroudeek.columns+json", 400),
+        ('{"lats": [[51.4]], "lngs": [[-0.5]]}', "application/vnd.baroudeek.columns+json", 400),
+        ("_oov}D_oov}D", "application/vnd.baroudeek.polyline; precision=6", 400),
+        ('{"points": []}', "application/json", 422)
+    ])
+    def test_lookup_rejects_malformed(self, elevation_client, content, content_type, status):
+        """Test malformed compact and legacy bodies are client errors."""
+        response = elevation_client.post("/lookup", content=content, headers={"Content-Type": content_type})
+        assert response.status_code == status
+
+    def test_lookup_with_spacing(self, elevation_client):
+        """Test lookups can ask for an overview level."""
+        response = elevation_client.post("/lookup?spacing=50000", json={
+            "locations": [{"latitude": 51.43, "longitude": -0.91}]
+        })
+
+        assert response.status_code == 200
+        assert response.json()["results"][0]["elevation"] == pytest.approx(planar_elevation(51.43, -0.91), abs=0.1)
+
+    def test_profile(self, elevation_client):
+        """Test a route profile is resampled and summarised server-side."""
+        response = elevation_client.post("/profile", json={
+            "coordinates": [[51.1, -0.5], [51.15, -0.5], [51.2, -0.5]],
+            "interval": 500
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["distance"] == pytest.approx(11_119, rel=1e-3)
+        assert len(data["samples"]) == 24
+        assert data["ascent"] == pytest.approx(10.0, abs=0.1)
+        assert data["descent"] == 0
+        assert data["min_elevation"] == pytest.approx(planar_elevation(51.1, -0.5), abs=0.1)
+        assert data["max_elevation"] == pytest.approx(planar_elevation(51.2, -0.5), abs=0.1)
+        assert data["samples"][0]["gradient"] == pytest.approx(10 / 11_119 * 100, abs=0.01)
+        assert data["samples"][-1]["gradient"] is None
+
+    def test_lookup_snap_to_roads(self, elevation_client, elevation_service, road_db):
+        """Test on-road points are read from the road profiles."""
+        elevation_service.road_db_path = road_db
+        lng = -0.5 + 500 / (METRES_PER_DEGREE * np.cos(np.radians(51.5)))
+        response = elevation_client.post(
+            "/lookup?snap_to_roads=true",
+            content=json.dumps({"lats": [51.5], "lngs": [lng]}),
+            headers={"Content-Type": elevation.COLUMNS_MEDIA_TYPE}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["elevations"][0] == pytest.approx(road_elevation(500.0), abs=1e-6)
+
+    def test_profile_rejects_oversized_requests(self, elevation_client):
+        """Test routes that would need too many samples are refused."""
+        response = elevation_client.post("/profile", json={
+            "coordinates": [[51.0, -1.0], [52.0, 0.0]],
+            "interval": 1
+        })
+        assert response.status_code == 400
+
+        response = elevation_client.post("/profile", json={"coordinates": [[51.0, -1.0]]})
+        assert response.status_code == 400
+
+    def test_stats(self, elevation_client):
+        """Test database statistics."""
+        response = elevation_client.get("/stats")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_elevation_points"] == 121
+        assert data["scraping_progress"] == {"completed": 1}
+        assert "tile_cache" in data
+        assert "requests_per_batch" in data["batcher"]
+        assert data["points_by_source"] is None
+
+    def test_stats_from_running_totals(self, elevation_client, elevation_db):
+        """Test /stats reads maintained totals instead of scanning."""
+        with sqlite3.connect(elevation_db) as conn:
+            elevation_stats.create_stats(conn, compact=False)
+            conn.execute("DELETE FROM elevation_data")  # totals are not recomputed from the rows
+
+        data = elevation_client.get("/stats").json()
+        assert data["total_elevation_points"] == 121
+        assert data["points_by_source"] == {"open_elevation": 121}
+        assert data["scraping_progress"] == {"completed": 1}
+
+    def test_admin_reload(self, elevation_client, monkeypatch):
+        """Test the reload endpoint requires the admin token."""
+        monkeypatch.setattr(elevation.settings, "ELEVATION_ADMIN_TOKEN", "")
+        assert elevation_client.post("/admin/reload").status_code == 403
+
+        monkeypatch.setattr(elevation.settings, "ELEVATION_ADMIN_TOKEN", "secret")
+        assert elevation_client.post("/admin/reload", headers={"X-Admin-Token": "wrong"}).status_code == 401
+        response = elevation_client.post("/admin/reload", headers={"X-Admin-Token": "secret"})
+
+        assert response.status_code == 200
+        assert response.json()["generation"] == 2
+        assert elevation_client.get("/stats").json()["dataset"]["generation"] == 2
+
+    def test_stats_report_cache_usage(self, elevation_client, elevation_service):
+        """Test cache counters reflect lookups."""
+        elevation_service.get_elevation_batch([(51.43, -0.91)])
+        elevation_service.get_elevation_batch([(51.44, -0.92)])
+
+        cache = elevation_client.get("/stats").json()["tile_cache"]
+        assert cache["misses"] == 1
+        assert cache["hits"] == 1
+        assert cache["entries"] == 1
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.core.executors import InstrumentedExecutor
+
+class TestInstrumentedExecutor:
+    """Test the thread pools that keep blocking work off the event loop."""
+
+    def test_runs_off_the_event_loop(self):
+        """Test work runs on a pool thread and its result is returned."""
+        executor = InstrumentedExecutor("test", 2)
+
+        async def main():
+            return await executor.run(lambda x, y=0: (threading.current_thread().name, x + y), 1, y=2)
+
+        thread_name, result = asyncio.run(main())
+        assert thread_name.startswith("test")
+        assert result == 3
+        assert executor.stats()["completed"] == 1
+
+    def test_exceptions_propagate(self):
+        """Test errors raised on the pool reach the awaiting handler."""
+        executor = InstrumentedExecutor("test", 1)
+
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            asyncio.run(executor.run(fail))
+
+        stats = executor.stats()
+        assert stats["completed"] == 1
+        assert stats["active"] == 0
+
+    def test_queue_depth(self):
+        """Test tasks beyond the pool size are counted as queued."""
+        executor = InstrumentedExecutor("test", 1)
+        release = threading.Event()
+
+        async def main():
+            tasks = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            during = executor.stats()
+            release.set()
+            await asyncio.gather(*tasks)
+            return during
+
+        during = asyncio.run(main())
+        assert during["active"] == 1
+        assert during["queued"] == 2
+
+        stats = executor.stats()
+        assert stats["queued"] == 0
+        assert stats["max_queued"] >= 2
+        assert stats["completed"] == 3
+        assert stats["wait_ms_p99"] > 0
+
+    def test_loop_stays_responsive(self):
+        """Test the event loop keeps serving while the pool is busy."""
+        executor = InstrumentedExecutor("test", 1)
+
+        async def main():
+            slow = asyncio.ensure_future(executor.run(time.sleep, 0.2))
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - start
+            await slow
+            return elapsed
+
+        assert asyncio.run(main()) < 0.1
+
+class TestHealthEndpoint:
+    """Test pool metrics are exposed."""
+
+    def test_health_reports_executors(self, client):
+        """Test the health check includes every pool's metrics."""
+        response = client.get("/health")
+
+        assert response.status_code == 200
+        executors = response.json()["executors"]
+        assert set(executors) == {"db", "elevation"}
+        assert executors["db"]["max_workers"] > 0
@@ -0,0 +1,7 @@
+"""
+Elevation code shared by the backend and the scrapers.
+
+Both sides read and write the same elevation database, so the modules they
+both use live here and are installed into each side's environment. Nothing
+in the package depends on more than NumPy and the standard library.
+"""
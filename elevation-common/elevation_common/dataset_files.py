@@ -0,0 +1,30 @@
+"""
+Change detection for elevation dataset files.
+
+The API reloads its dataset generation when the files it serves change, and
+the scrapers drop their cached lookups when another process wrote to the
+database they read. Both compare a fingerprint of the files rather than their
+contents, so checking is a stat call per file.
+"""
+
+import os
+from typing import Optional, Sequence, Tuple
+
+Fingerprint = Tuple[Optional[Tuple[int, int, int]], ...]
+
+
+def dataset_fingerprint(paths: Sequence[str]) -> Fingerprint:
+    """(inode, size, mtime) of every file a generation reads, None where missing
+
+    Each file's SQLite WAL is included: writers in WAL mode leave the main
+    file untouched until a checkpoint.
+    """
+    fingerprint = []
+    for path in paths:
+        for name in (path, f"{path}-wal"):
+            try:
+                stat = os.stat(name)
+            except OSError:
+                stat = None
+            fingerprint.append(None if stat is None else (stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
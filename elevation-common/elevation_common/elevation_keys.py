@@ -0,0 +1,145 @@
+"""
+Quantized integer coordinate keys for compact elevation storage.
+
+Coordinates are quantized to integer microdegrees (offset to be non-negative)
+and bit-interleaved into a single 64-bit Morton / Z-order key, so equality is
+exact and nearby points sort next to each other on disk. Bounding boxes are
+turned into a short list of key ranges for range scans.
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+MICRODEGREES = 1_000_000
+COORD_BITS = 29  # 360e6 microdegrees of longitude < 2 ** 29
+_MAX_COORD = (1 << COORD_BITS) - 1
+
+# Small integer enums for the compact elevation_points table
+ACCURACY_CODES: Dict[str, int] = {"high": 1, "medium": 2, "low": 3}
+ACCURACY_NAMES: Dict[int, str] = {code: name for name, code in ACCURACY_CODES.items()}
+
+# Elevations are stored as integer decimetres
+ELEVATION_SCALE = 10
+
+COMPACT_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS elevation_points (
+        zkey INTEGER PRIMARY KEY,   -- Morton-interleaved microdegree lat/lng
+        elevation_dm INTEGER,
+        source_id INTEGER,          -- elevation_sources.id
+        accuracy INTEGER,           -- ACCURACY_CODES
+        timestamp INTEGER
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS elevation_sources (
+        id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL
+    )
+    """,
+]
+
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """Insert a zero bit between each of the low 32 bits"""
+    x = values.astype(np.uint64)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x3333333333333333)
+    x = (x | (x << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return x
+
+
+def _compact_bits(values: np.ndarray) -> np.ndarray:
+    """Inverse of _spread_bits"""
+    x = values.astype(np.uint64) & np.uint64(0x5555555555555555)
+    x = (x | (x >> np.uint64(1))) & np.uint64(0x3333333333333333)
+    x = (x | (x >> np.uint64(2))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    x = (x | (x >> np.uint64(4))) & np.uint64(0x00FF00FF00FF00FF)
+    x = (x | (x >> np.uint64(8))) & np.uint64(0x0000FFFF0000FFFF)
+    x = (x | (x >> np.uint64(16))) & np.uint64(0x00000000FFFFFFFF)
+    return x
+
+
+def quantize(lats, lngs) -> Tuple[np.ndarray, np.ndarray]:
+    """Integer microdegree grid coordinates (row, col), clipped to the valid range"""
+    rows = np.round((np.asarray(lats, dtype=np.float64) + 90.0) * MICRODEGREES)
+    cols = np.round((np.asarray(lngs, dtype=np.float64) + 180.0) * MICRODEGREES)
+    return (
+        np.clip(rows, 0, _MAX_COORD).astype(np.int64),
+        np.clip(cols, 0, _MAX_COORD).astype(np.int64)
+    )
+
+
+def encode(lats, lngs) -> np.ndarray:
+    """Morton keys (int64) for arrays of coordinates"""
+    rows, cols = quantize(lats, lngs)
+    return (_spread_bits(cols) | (_spread_bits(rows) << np.uint64(1))).astype(np.int64)
+
+
+def decode(keys) -> Tuple[np.ndarray, np.ndarray]:
+    """Coordinates (lat, lng) of Morton keys, to microdegree precision"""
+    keys = np.asarray(keys, dtype=np.int64).astype(np.uint64)
+    rows = _compact_bits(keys >> np.uint64(1)).astype(np.float64)
+    cols = _compact_bits(keys).astype(np.float64)
+    return rows / MICRODEGREES - 90.0, cols / MICRODEGREES - 180.0
+
+
+def key_ranges(
+    lat_min: float,
+    lat_max: float,
+    lng_min: float,
+    lng_max: float,
+    max_ranges: int = 32
+) -> List[Tuple[int, int]]:
+    """Inclusive Morton key ranges that together cover a bounding box
+
+    The box is decomposed quadtree-style into aligned Z-order cells. Subdivision
+    stops once another level would exceed ``max_ranges``, so ranges may cover a
+    little more than the box and callers must re-check coordinates.
+    """
+    (row_lo, row_hi), (col_lo, col_hi) = quantize([lat_min, lat_max], [lng_min, lng_max])
+    row_lo, row_hi, col_lo, col_hi = int(row_lo), int(row_hi), int(col_lo), int(col_hi)
+
+    # (row, col, level): aligned square of side 2 ** level starting at (row, col),
+    # starting from the smallest one that contains the whole box
+    level = ((row_lo ^ row_hi) | (col_lo ^ col_hi)).bit_length()
+    cells = [(row_lo >> level << level, col_lo >> level << level, level)]
+    covered = []
+    while cells:
+        partial = []
+        for row, col, level in cells:
+            side = 1 << level
+            if row > row_hi or row + side - 1 < row_lo or col > col_hi or col + side - 1 < col_lo:
+                continue
+            if row >= row_lo and row + side - 1 <= row_hi and col >= col_lo and col + side - 1 <= col_hi:
+                covered.append((row, col, level))
+            else:
+                partial.append((row, col, level))
+
+        if not partial or len(covered) + 4 * len(partial) > max_ranges or partial[0][2] == 0:
+            covered.extend(partial)
+            break
+
+        cells = []
+        for row, col, level in partial:
+            half = 1 << (level - 1)
+            for d_row in (0, half):
+                for d_col in (0, half):
+                    cells.append((row + d_row, col + d_col, level - 1))
+
+    rows, cols, levels = np.array(covered, dtype=np.int64).reshape(-1, 3).T
+    starts = (_spread_bits(cols) | (_spread_bits(rows) << np.uint64(1))).tolist()
+    ranges = [(start, start + (1 << (2 * level)) - 1) for start, level in zip(starts, levels.tolist())]
+
+    # Merge ranges that touch in key order
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
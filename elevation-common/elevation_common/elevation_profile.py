@@ -0,0 +1,107 @@
+"""
+Route elevation profiles.
+
+A route polyline is resampled at a fixed interval in metres and the sampled
+elevations are turned into gradients and climb statistics, all as NumPy array
+operations. profile_statistics is the one profile kernel: the road scraper's
+stored profiles, RouteService's waypoint summaries and the profile endpoint
+all call it. The gradient of a sample is the percentage grade to the next
+sample, its local max gradient is the steepest absolute grade over the next
+five segments, and ascent/descent sum every rise and fall between
+consecutive samples.
+"""
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from elevation_common.geodesy import cumulative_length
+
+# Segments looked ahead for each sample's local max gradient (100m at 20m spacing)
+LOOKAHEAD_SEGMENTS = 5
+
+
+def resample_line(
+    lats: np.ndarray,
+    lngs: np.ndarray,
+    interval: float,
+    method: str = "haversine"
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Points every ``interval`` metres along a polyline, plus its end point
+
+    Returns (lats, lngs, distances) where distances are metres from the start,
+    measured with the geodesy ``method`` ("haversine" or "vincenty").
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if lats.size < 2:
+        return lats[:1].copy(), lngs[:1].copy(), np.zeros(min(lats.size, 1))
+
+    cumulative = cumulative_length(lats, lngs, method)
+    total = cumulative[-1]
+    distances = np.arange(0.0, total, interval)
+    if distances.size == 0 or distances[-1] < total:
+        distances = np.append(distances, total)
+
+    # Segment each sample falls in, and how far along it
+    segment = np.clip(np.searchsorted(cumulative, distances, side="right") - 1, 0, lats.size - 2)
+    length = cumulative[segment + 1] - cumulative[segment]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fraction = np.where(length > 0, (distances - cumulative[segment]) / length, 0.0)
+    fraction = np.clip(fraction, 0.0, 1.0)
+
+    return (
+        lats[segment] + fraction * (lats[segment + 1] - lats[segment]),
+        lngs[segment] + fraction * (lngs[segment + 1] - lngs[segment]),
+        distances
+    )
+
+
+@dataclass
+class ProfileStatistics:
+    """Per-sample gradients (%, NaN where undefined) and whole-profile totals"""
+    gradients: np.ndarray
+    local_max_gradients: np.ndarray
+    min_elevation: float
+    max_elevation: float
+    total_ascent: float
+    total_descent: float
+    max_gradient: float
+    avg_gradient: float
+
+
+def profile_statistics(distances: np.ndarray, elevations: np.ndarray) -> ProfileStatistics:
+    """Gradients and climb statistics of elevations sampled at increasing distances"""
+    distances = np.asarray(distances, dtype=np.float64)
+    elevations = np.asarray(elevations, dtype=np.float64)
+
+    rise = np.diff(elevations)
+    run = np.diff(distances)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        segment_gradients = np.where(run > 0, rise / run * 100, np.nan)
+
+    # Gradient of each sample is that of the segment to the next sample
+    gradients = np.append(segment_gradients, np.nan)
+
+    # Steepest absolute gradient over the next LOOKAHEAD_SEGMENTS segments
+    local_max = np.full(elevations.size, np.nan)
+    if segment_gradients.size:
+        steepness = np.abs(segment_gradients)
+        padded = np.concatenate([steepness, np.full(LOOKAHEAD_SEGMENTS - 1, np.nan)])
+        windows = np.lib.stride_tricks.sliding_window_view(padded, LOOKAHEAD_SEGMENTS)
+        with np.errstate(invalid="ignore"):
+            lookahead = np.fmax.reduce(windows, axis=1)
+        local_max[:-1] = np.where(np.isnan(segment_gradients), np.nan, lookahead)
+
+    defined = gradients[~np.isnan(gradients)]
+    return ProfileStatistics(
+        gradients=gradients,
+        local_max_gradients=local_max,
+        min_elevation=float(elevations.min()),
+        max_elevation=float(elevations.max()),
+        total_ascent=float(rise[rise > 0].sum()),
+        total_descent=float(-rise[rise < 0].sum()),
+        max_gradient=float(defined.max()) if defined.size else 0.0,
+        avg_gradient=float(defined.mean()) if defined.size else 0.0
+    )
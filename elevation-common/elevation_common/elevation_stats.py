@@ -0,0 +1,231 @@
+"""
+Incrementally maintained statistics of an elevation database.
+
+Counting points, their bounding box and the scrape progress with COUNT(*),
+MIN/MAX and GROUP BY scans every row, which takes minutes at billions of
+points. Instead the writer keeps running totals:
+
+- elevation_stats: (kind, name) -> count for the point total ('points'),
+  points per source ('source') and accuracy ('accuracy'), and scrape grid
+  cells per status ('grid_status')
+- elevation_bounds: one row with the bounding box of every point written
+
+ElevationDatabase updates the point counters in the same transaction as each
+batch upsert (see counted_upsert); grid status counts are kept by triggers on
+scrape_progress, so every writer of that table stays consistent. Points are
+never deleted, so the bounds only grow.
+"""
+
+import json
+import sqlite3
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from elevation_common import elevation_keys
+
+STATS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS elevation_stats (
+        kind TEXT NOT NULL,         -- 'points', 'source', 'accuracy' or 'grid_status'
+        name TEXT NOT NULL,         -- '' for the 'points' total
+        count INTEGER NOT NULL,
+        PRIMARY KEY (kind, name)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS elevation_bounds (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        lat_min REAL, lat_max REAL, lng_min REAL, lng_max REAL
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS scrape_progress_stats_insert AFTER INSERT ON scrape_progress
+    BEGIN
+        INSERT INTO elevation_stats (kind, name, count) VALUES ('grid_status', COALESCE(NEW.status, ''), 1)
+        ON CONFLICT (kind, name) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS scrape_progress_stats_update AFTER UPDATE OF status ON scrape_progress
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE elevation_stats SET count = count - 1
+        WHERE kind = 'grid_status' AND name = COALESCE(OLD.status, '');
+        INSERT INTO elevation_stats (kind, name, count) VALUES ('grid_status', COALESCE(NEW.status, ''), 1)
+        ON CONFLICT (kind, name) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS scrape_progress_stats_delete AFTER DELETE ON scrape_progress
+    BEGIN
+        UPDATE elevation_stats SET count = count - 1
+        WHERE kind = 'grid_status' AND name = COALESCE(OLD.status, '');
+    END
+    """,
+]
+
+# Stored rows a batch's keys refer to, by source and accuracy. Compact keys
+# are exact integers, so they travel as one JSON array; legacy REAL keys go
+# through a temporary table to keep float equality exact.
+_COMPACT_BATCH_COUNTS = """
+    SELECT s.name, p.accuracy, COUNT(*)
+    FROM json_each(?) b
+    JOIN elevation_points p ON p.zkey = b.value
+    LEFT JOIN elevation_sources s ON s.id = p.source_id
+    GROUP BY p.source_id, p.accuracy
+"""
+
+_LEGACY_BATCH_COUNTS = """
+    SELECT d.source, d.accuracy, COUNT(*)
+    FROM batch_points b
+    JOIN elevation_data d ON d.lat = b.lat AND d.lng = b.lng
+    GROUP BY d.source, d.accuracy
+"""
+
+GroupCounts = Dict[Tuple[str, str], int]  # (source, accuracy) -> points
+
+
+def has_stats(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'elevation_stats'").fetchone() is not None
+
+
+def create_stats(conn: sqlite3.Connection, compact: bool):
+    """Create the statistics tables, computing them once for existing data"""
+    existed = has_stats(conn)
+    for statement in STATS_SCHEMA:
+        conn.execute(statement)
+    if not existed:
+        rebuild_stats(conn, compact)
+
+
+def rebuild_stats(conn: sqlite3.Connection, compact: bool):
+    """Recompute every statistic with full scans (migrations and repairs only)"""
+    conn.execute("DELETE FROM elevation_stats")
+    conn.execute("DELETE FROM elevation_bounds")
+
+    if compact:
+        groups = _group_counts(conn.execute("""
+            SELECT s.name, p.accuracy, COUNT(*)
+            FROM elevation_points p LEFT JOIN elevation_sources s ON s.id = p.source_id
+            GROUP BY p.source_id, p.accuracy
+        """).fetchall(), compact=True)
+        bounds = _compact_bounds(conn)
+    else:
+        groups = _group_counts(conn.execute("""
+            SELECT source, accuracy, COUNT(*) FROM elevation_data GROUP BY source, accuracy
+        """).fetchall())
+        bounds = conn.execute("SELECT MIN(lat), MAX(lat), MIN(lng), MAX(lng) FROM elevation_data").fetchone()
+
+    _apply_counts(conn, {}, groups)
+    if bounds and bounds[0] is not None:
+        _extend_bounds(conn, *bounds)
+    conn.executemany("""
+        INSERT INTO elevation_stats (kind, name, count) VALUES ('grid_status', ?, ?)
+    """, conn.execute("SELECT COALESCE(status, ''), COUNT(*) FROM scrape_progress GROUP BY status").fetchall())
+
+
+def counted_upsert(
+    conn: sqlite3.Connection,
+    compact: bool,
+    keys: Sequence,
+    lats: Sequence[float],
+    lngs: Sequence[float],
+    upsert: Callable[[], None]
+):
+    """Run ``upsert`` for a batch of points and update the statistics to match
+
+    ``keys`` are the rows' primary keys: Morton keys for compact storage,
+    (lat, lng) tuples for legacy. The stored rows they refer to are counted by
+    source and accuracy before and after the upsert, so overwritten points
+    move between sources instead of being counted twice.
+    """
+    if compact:
+        batch = (json.dumps(np.unique(np.asarray(keys, dtype=np.int64)).tolist()),)
+        query = _COMPACT_BATCH_COUNTS
+    else:
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS batch_points (lat REAL, lng REAL, PRIMARY KEY (lat, lng)) WITHOUT ROWID
+        """)
+        conn.execute("DELETE FROM batch_points")
+        conn.executemany("INSERT OR IGNORE INTO batch_points (lat, lng) VALUES (?, ?)", sorted(set(keys)))
+        batch = ()
+        query = _LEGACY_BATCH_COUNTS
+
+    before = _group_counts(conn.execute(query, batch).fetchall(), compact)
+    upsert()
+    after = _group_counts(conn.execute(query, batch).fetchall(), compact)
+
+    _apply_counts(conn, before, after)
+    if len(lats):
+        _extend_bounds(conn, float(np.min(lats)), float(np.max(lats)), float(np.min(lngs)), float(np.max(lngs)))
+
+
+def read_stats(conn: sqlite3.Connection) -> Optional[Dict]:
+    """Every maintained statistic, None if the database predates them"""
+    if not has_stats(conn):
+        return None
+
+    stats = {"points": 0, "sources": {}, "accuracy": {}, "grid_status": {}}
+    sections = {"source": "sources", "accuracy": "accuracy", "grid_status": "grid_status"}
+    for kind, name, count in conn.execute("SELECT kind, name, count FROM elevation_stats WHERE count != 0"):
+        if kind == "points":
+            stats["points"] = count
+        else:
+            stats[sections[kind]][name] = count
+
+    bounds = conn.execute("SELECT lat_min, lat_max, lng_min, lng_max FROM elevation_bounds").fetchone()
+    stats["bounds"] = tuple(bounds) if bounds and stats["points"] else (None, None, None, None)
+    return stats
+
+
+def _group_counts(rows: List[tuple], compact: bool = False) -> GroupCounts:
+    counts: GroupCounts = {}
+    for source, accuracy, count in rows:
+        if compact:
+            accuracy = elevation_keys.ACCURACY_NAMES.get(accuracy)
+        key = (source or "", accuracy or "")
+        counts[key] = counts.get(key, 0) + count
+    return counts
+
+
+def _apply_counts(conn: sqlite3.Connection, before: GroupCounts, after: GroupCounts):
+    delta = Counter()
+    for sign, counts in ((-1, before), (1, after)):
+        for (source, accuracy), count in counts.items():
+            delta[("points", "")] += sign * count
+            delta[("source", source)] += sign * count
+            delta[("accuracy", accuracy)] += sign * count
+
+    conn.executemany("""
+        INSERT INTO elevation_stats (kind, name, count) VALUES (?, ?, ?)
+        ON CONFLICT (kind, name) DO UPDATE SET count = count + excluded.count
+    """, [(kind, name, count) for (kind, name), count in delta.items() if count])
+
+
+def _extend_bounds(conn: sqlite3.Connection, lat_min: float, lat_max: float, lng_min: float, lng_max: float):
+    conn.execute("""
+        INSERT INTO elevation_bounds (id, lat_min, lat_max, lng_min, lng_max) VALUES (0, ?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            lat_min = MIN(lat_min, excluded.lat_min),
+            lat_max = MAX(lat_max, excluded.lat_max),
+            lng_min = MIN(lng_min, excluded.lng_min),
+            lng_max = MAX(lng_max, excluded.lng_max)
+    """, (lat_min, lat_max, lng_min, lng_max))
+
+
+def _compact_bounds(conn: sqlite3.Connection, chunk: int = 500_000) -> Optional[Tuple[float, float, float, float]]:
+    bounds = None
+    cursor = conn.execute("SELECT zkey FROM elevation_points")
+    while True:
+        keys = cursor.fetchmany(chunk)
+        if not keys:
+            return bounds
+        lats, lngs = elevation_keys.decode(np.array(keys, dtype=np.int64).ravel())
+        chunk_bounds = (lats.min(), lats.max(), lngs.min(), lngs.max())
+        bounds = chunk_bounds if bounds is None else (
+            min(bounds[0], chunk_bounds[0]), max(bounds[1], chunk_bounds[1]),
+            min(bounds[2], chunk_bounds[2]), max(bounds[3], chunk_bounds[3])
+        )
+        bounds = tuple(float(b) for b in bounds)
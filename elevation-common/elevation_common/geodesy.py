@@ -0,0 +1,133 @@
+"""
+Vectorized geodesy on NumPy arrays of degrees.
+
+Every distance the backend and the scrapers measure goes through here, a
+whole polyline or batch of pairs per call:
+
+- haversine: great-circle metres on the mean-radius sphere; within 0.6% of
+  the ellipsoid, which is what sampling and routing need.
+- vincenty: metres on the WGS84 ellipsoid (Vincenty's inverse formula),
+  to within a millimetre of geopy's geodesic, for stored road lengths.
+- segment_lengths / cumulative_length: per-vertex lengths of polylines.
+- bearing: initial great-circle bearing.
+- LocalProjection: equirectangular metres about a reference latitude, for
+  planar work (bucketing, nearest neighbours) over a region.
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180.0
+
+WGS84_A = 6_378_137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Vincenty converges in a handful of iterations except for nearly antipodal
+# points, which fall back to the sphere
+_VINCENTY_ITERATIONS = 100
+_VINCENTY_TOLERANCE = 1e-12
+
+
+def _arrays(*values) -> Tuple[np.ndarray, ...]:
+    return np.broadcast_arrays(*(np.asarray(value, dtype=np.float64) for value in values))
+
+
+def haversine(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Great-circle distance in metres between paired points"""
+    lat1, lng1, lat2, lng2 = (np.radians(value) for value in _arrays(lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """WGS84 ellipsoidal distance in metres between paired points"""
+    lat1, lng1, lat2, lng2 = _arrays(lat1, lng1, lat2, lng2)
+    f = WGS84_F
+    L = np.radians(lng2 - lng1)
+    u1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    lam = L
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(_VINCENTY_ITERATIONS):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma > 0, cos_u1 * cos_u2 * sin_lam / sin_sigma, 0.0)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Lines along the equator have cos2_alpha == 0
+            cos_2sm = np.where(cos2_alpha > 0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha, 0.0)
+            c = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            previous = lam
+            lam = L + (1 - c) * f * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sm + c * cos_sigma * (2 * cos_2sm ** 2 - 1))
+            )
+            converged = np.abs(lam - previous) <= _VINCENTY_TOLERANCE
+            if converged.all():
+                break
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = big_b * sin_sigma * (cos_2sm + big_b / 4 * (
+        cos_sigma * (2 * cos_2sm ** 2 - 1) -
+        big_b / 6 * cos_2sm * (4 * sin_sigma ** 2 - 3) * (4 * cos_2sm ** 2 - 3)
+    ))
+    distances = WGS84_B * big_a * (sigma - delta_sigma)
+    return np.where(converged, distances, haversine(lat1, lng1, lat2, lng2))
+
+
+_DISTANCES = {"haversine": haversine, "vincenty": vincenty}
+
+
+def segment_lengths(lats, lngs, method: str = "haversine") -> np.ndarray:
+    """Length in metres of every segment of a polyline"""
+    if method not in _DISTANCES:
+        raise ValueError(f"Unknown distance method {method!r}, expected one of {sorted(_DISTANCES)}")
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    return _DISTANCES[method](lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+
+
+def cumulative_length(lats, lngs, method: str = "haversine") -> np.ndarray:
+    """Metres along a polyline at each of its vertices, starting from 0"""
+    return np.concatenate([[0.0], np.cumsum(segment_lengths(lats, lngs, method))])
+
+
+def bearing(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Initial great-circle bearing in degrees clockwise from north, in [0, 360)"""
+    lat1, lng1, lat2, lng2 = (np.radians(value) for value in _arrays(lat1, lng1, lat2, lng2))
+    dlng = lng2 - lng1
+    y = np.sin(dlng) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlng)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+class LocalProjection:
+    """Equirectangular projection to metres, true to scale along ``ref_lat``"""
+
+    def __init__(self, ref_lat: float):
+        self.ref_lat = ref_lat
+        self.x_scale = METRES_PER_DEGREE * math.cos(math.radians(ref_lat))
+
+    def project(self, lats, lngs) -> Tuple[np.ndarray, np.ndarray]:
+        """Planar (x, y) in metres"""
+        return (
+            np.asarray(lngs, dtype=np.float64) * self.x_scale,
+            np.asarray(lats, dtype=np.float64) * METRES_PER_DEGREE
+        )
+
+    def unproject(self, x, y) -> Tuple[np.ndarray, np.ndarray]:
+        """(lats, lngs) in degrees of planar coordinates"""
+        return (
+            np.asarray(y, dtype=np.float64) / METRES_PER_DEGREE,
+            np.asarray(x, dtype=np.float64) / self.x_scale
+        )
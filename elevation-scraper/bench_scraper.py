@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark grid scraping throughput against the fake elevation server.
+
+Starts FakeElevationServer in-process, queues ``--cells`` grid cells in a
+scratch database and scrapes them twice: the old way (one cell at a time,
+first API only) and with ScrapeScheduler running ``--workers`` cells at a
+time over both APIs. Reports cells and requests per second, and how many
+requests the server rejected for exceeding its rate limit.
+
+    python bench_scraper.py --cells 40 --rate 10 --latency 0.2 --workers 8
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from aiohttp import web
+
+from elevation_scraper import ElevationDatabase, ElevationScraper, ScrapeScheduler
+from fake_elevation_server import FakeElevationServer
+
+
+def queue_cells(db: ElevationDatabase, cells: int):
+    db.writer.execute(lambda conn: conn.executemany("""
+        INSERT INTO scrape_progress
+        (grid_id, lat_min, lat_max, lng_min, lng_max, status, priority, last_attempt, error_count)
+        VALUES (?, ?, ?, ?, ?, 'pending', 1, NULL, 0)
+    """, [(f"51_{i}", 51.0, 51.1, i * 0.1, (i + 1) * 0.1) for i in range(cells)]))
+
+
+async def scrape(args, workers: int, api_count: int) -> dict:
+    server = FakeElevationServer(args.rate, args.latency)
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    db = ElevationDatabase(os.path.join(tempfile.mkdtemp(), "elevation.db"))
+    queue_cells(db, args.cells)
+    apis = server.apis(f"http://127.0.0.1:{port}", args.rate)[:api_count]
+
+    start = time.perf_counter()
+    async with ElevationScraper(db, apis=apis) as scraper:
+        scheduler = ScrapeScheduler(db, scraper, workers=workers)
+        await scheduler.run(until_empty=True)
+    db.close()
+    elapsed = time.perf_counter() - start
+    await runner.cleanup()
+
+    return {
+        "completed": scheduler.completed,
+        "failed": scheduler.failed,
+        "seconds": elapsed,
+        "requests": sum(server.requests.values()),
+        "throttled": sum(server.throttled.values())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cells", type=int, default=40)
+    parser.add_argument("--rate", type=float, default=10.0, help="Requests per second allowed per API")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.cells} cells, 2 APIs at {args.rate:g} req/s each, {args.latency * 1000:.0f} ms latency")
+    for name, workers, api_count in (("sequential, 1 API", 1, 1), (f"{args.workers} workers, 2 APIs", args.workers, 2)):
+        result = asyncio.run(scrape(args, workers, api_count))
+        print(f"  {name:<20} {result['seconds']:6.1f}s  {result['completed'] / result['seconds']:6.2f} cells/s  "
+              f"{result['requests'] / result['seconds']:6.2f} req/s  "
+              f"failed {result['failed']}  throttled {result['throttled']}")
+
+
+if __name__ == "__main__":
+    main()
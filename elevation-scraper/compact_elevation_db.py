@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Convert an elevation database to compact Morton-keyed storage.
+
+Copies elevation_data (REAL lat/lng primary key, TEXT source/accuracy) into
+elevation_points (one 64-bit Z-order key of integer microdegrees, decimetre
+elevations, integer source/accuracy codes, WITHOUT ROWID) together with
+scrape_progress, then vacuums the new file and reports the size change.
+
+    python compact_elevation_db.py elevation.db elevation_compact.db
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+from elevation_scraper import ElevationDatabase, ElevationPoint
+
+BATCH_SIZE = 100_000
+
+
+def compact_database(source_path: str, target_path: str) -> int:
+    """Copy every point and scrape_progress row into a new compact database"""
+    target = ElevationDatabase(target_path, compact=True)
+    copied = 0
+
+    with sqlite3.connect(f"file:{source_path}?mode=ro", uri=True) as source:
+        cursor = source.execute("""
+            SELECT lat, lng, elevation, source, accuracy, timestamp FROM elevation_data
+        """)
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            target.add_elevation_points([ElevationPoint(*row) for row in rows])
+            copied += len(rows)
+            print(f"  copied {copied:,} points")
+
+        progress = source.execute("""
+            SELECT grid_id, lat_min, lat_max, lng_min, lng_max, status, priority, last_attempt, error_count
+            FROM scrape_progress
+        """).fetchall()
+
+    # The target's writer is closed, so this is the only connection writing;
+    # VACUUM can't run inside the writer's transactions anyway
+    target.close()
+    with sqlite3.connect(target.db_path) as conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO scrape_progress
+            (grid_id, lat_min, lat_max, lng_min, lng_max, status, priority, last_attempt, error_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, progress)
+        conn.commit()
+        conn.execute("VACUUM")
+
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an elevation database to compact storage")
+    parser.add_argument("source", help="existing elevation.db with an elevation_data table")
+    parser.add_argument("target", help="new compact database to create")
+    args = parser.parse_args()
+
+    if os.path.exists(args.target):
+        parser.error(f"{args.target} already exists")
+
+    start = time.time()
+    copied = compact_database(args.source, args.target)
+
+    source_size = os.path.getsize(args.source)
+    target_size = os.path.getsize(args.target)
+    print(f"✅ Copied {copied:,} points in {time.time() - start:.1f}s")
+    print(f"📦 {source_size / 1e6:.1f} MB → {target_size / 1e6:.1f} MB "
+          f"({100 * (1 - target_size / max(source_size, 1)):.0f}% smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Bulk import of local DEM files into the elevation database.
+
+Streams SRTM ``.hgt`` tiles and GeoTIFF DEMs (EPSG:4326) into the same tables
+ElevationDatabase writes, so ElevationService picks the points up unchanged.
+Files are split into row chunks that worker processes decode in parallel;
+the main process is the only writer. Scrape grid cells that an imported
+file covers completely are marked completed so the API scraper skips them.
+
+    python dem_importer.py elevation.db srtm/ --workers 8
+    python dem_importer.py elevation.db N51W001.hgt --stride 3 --bbox 51.2 51.8 -1.0 0.0
+
+SRTM tiles are 1201x1201 (3 arc-second) or 3601x3601 (1 arc-second) big-endian
+int16 samples named after their south-west corner. ``--stride`` keeps every
+nth row and column: 1 arc-second SRTM is ~13M points per 1° tile. GeoTIFF
+support needs ``tifffile``; uncompressed files are memory-mapped and streamed
+by rows, compressed ones are decoded whole by one worker. Rebuild the tile
+store (backend/build_elevation_tiles.py) after importing.
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from elevation_scraper import ElevationDatabase
+
+logger = logging.getLogger(__name__)
+
+# Rows decoded per chunk (after striding)
+CHUNK_ROWS = 256
+
+SRTM_VOID = -32768
+
+HGT_NAME = re.compile(r"^([NS])(\d{2})([EW])(\d{3})\.hgt$", re.IGNORECASE)
+
+# GeoTIFF tags and GeoKey values
+GDAL_NODATA_TAG = 42113
+MODEL_TYPE_GEOGRAPHIC = 2
+RASTER_PIXEL_IS_AREA = 1
+WGS84 = 4326
+
+Bounds = Tuple[float, float, float, float]  # lat_min, lat_max, lng_min, lng_max
+
+
+class DemError(ValueError):
+    """Raised for DEM files the importer can't read"""
+
+
+@dataclass
+class DemRaster:
+    """A DEM file and the coordinates of its samples
+
+    Row r, column c is the sample at (north - r * lat_step, west + c * lng_step).
+    """
+    path: str
+    kind: str  # 'hgt' or 'tiff'
+    rows: int
+    cols: int
+    north: float
+    west: float
+    lat_step: float
+    lng_step: float
+    nodata: Optional[float]
+    streamable: bool  # rows can be read without decoding the whole file
+
+    @property
+    def bounds(self) -> Bounds:
+        return (
+            self.north - (self.rows - 1) * self.lat_step, self.north,
+            self.west, self.west + (self.cols - 1) * self.lng_step
+        )
+
+
+def open_hgt(path: str) -> DemRaster:
+    """SRTM tile named after its south-west corner, e.g. N51W001.hgt"""
+    match = HGT_NAME.match(os.path.basename(path))
+    if not match:
+        raise DemError(f"{path}: expected an SRTM name like N51W001.hgt")
+    size = int(round((os.path.getsize(path) // 2) ** 0.5))
+    if size * size * 2 != os.path.getsize(path):
+        raise DemError(f"{path}: not a square grid of int16 samples")
+
+    south = int(match.group(2)) * (1 if match.group(1).upper() == "N" else -1)
+    west = int(match.group(4)) * (1 if match.group(3).upper() == "E" else -1)
+    step = 1.0 / (size - 1)
+    return DemRaster(path, "hgt", size, size, south + 1.0, float(west), step, step, SRTM_VOID, True)
+
+
+def open_geotiff(path: str) -> DemRaster:
+    """Single-band GeoTIFF in geographic WGS84 coordinates"""
+    try:
+        import tifffile
+    except ImportError:
+        raise DemError("GeoTIFF import needs tifffile (pip install tifffile)")
+
+    with tifffile.TiffFile(path) as tif:
+        page = tif.pages[0]
+        geo = page.geotiff_tags if page.is_geotiff else None
+        if not geo or "ModelPixelScale" not in geo or "ModelTiepoint" not in geo:
+            raise DemError(f"{path}: no GeoTIFF georeferencing")
+        if geo.get("GTModelTypeGeoKey") != MODEL_TYPE_GEOGRAPHIC or geo.get("GeographicTypeGeoKey", WGS84) != WGS84:
+            raise DemError(f"{path}: not in EPSG:4326, reproject it first (gdalwarp -t_srs EPSG:4326)")
+        if len(page.shape) != 2:
+            raise DemError(f"{path}: expected a single-band raster, got shape {page.shape}")
+
+        scale_x, scale_y = geo["ModelPixelScale"][:2]
+        tie_col, tie_row, _, tie_x, tie_y = geo["ModelTiepoint"][:5]
+        west = tie_x - tie_col * scale_x
+        north = tie_y + tie_row * scale_y
+        if geo.get("GTRasterTypeGeoKey", RASTER_PIXEL_IS_AREA) == RASTER_PIXEL_IS_AREA:
+            # Tiepoints locate pixel corners; samples belong at pixel centres
+            west += scale_x / 2
+            north -= scale_y / 2
+
+        nodata_tag = page.tags.get(GDAL_NODATA_TAG)
+        nodata = float(nodata_tag.value.strip("\x00 ")) if nodata_tag else None
+        rows, cols = page.shape
+        return DemRaster(path, "tiff", rows, cols, north, west, scale_y, scale_x, nodata, page.is_memmappable)
+
+
+def open_dem(path: str) -> DemRaster:
+    if path.lower().endswith(".hgt"):
+        return open_hgt(path)
+    if path.lower().endswith((".tif", ".tiff")):
+        return open_geotiff(path)
+    raise DemError(f"{path}: unsupported DEM format (expected .hgt, .tif or .tiff)")
+
+
+def find_dems(paths: List[str]) -> List[str]:
+    """DEM files named on the command line, searching any directories"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(
+                str(p) for p in sorted(Path(path).rglob("*"))
+                if p.suffix.lower() in (".hgt", ".tif", ".tiff")
+            )
+        else:
+            found.append(path)
+    return found
+
+
+def _read_rows(raster: DemRaster, start: int, stop: int) -> np.ndarray:
+    if raster.kind == "hgt":
+        return np.memmap(raster.path, dtype=">i2", mode="r", shape=(raster.rows, raster.cols))[start:stop]
+    import tifffile
+    data = tifffile.memmap(raster.path, mode="r") if raster.streamable else tifffile.imread(raster.path)
+    return data[start:stop]
+
+
+def decode_chunk(
+    raster: DemRaster,
+    row_start: int,
+    row_stop: int,
+    stride: int = 1,
+    bbox: Optional[Bounds] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(lats, lngs, elevations) of the valid samples in rows [row_start, row_stop)
+
+    Only every ``stride``-th row and column of the whole raster is kept, and
+    coordinates are rounded to microdegrees so tile edges shared by adjacent
+    files land on the same stored point.
+    """
+    first = -(-row_start // stride) * stride
+    rows = np.arange(first, row_stop, stride)
+    cols = np.arange(0, raster.cols, stride)
+    if rows.size == 0:
+        return np.empty(0), np.empty(0), np.empty(0)
+
+    data = _read_rows(raster, first, row_stop)[::stride, ::stride].astype(np.float64)
+    lats = np.round(raster.north - rows * raster.lat_step, 6)
+    lngs = np.round(raster.west + cols * raster.lng_step, 6)
+
+    valid = np.isfinite(data)
+    if raster.nodata is not None:
+        valid &= data != raster.nodata
+    if bbox is not None:
+        lat_min, lat_max, lng_min, lng_max = bbox
+        valid &= ((lats >= lat_min) & (lats <= lat_max))[:, None]
+        valid &= ((lngs >= lng_min) & (lngs <= lng_max))[None, :]
+
+    row_idx, col_idx = np.nonzero(valid)
+    return lats[row_idx], lngs[col_idx], data[row_idx, col_idx]
+
+
+def _decode_task(task) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return decode_chunk(*task)
+
+
+def plan_chunks(rasters: List[DemRaster], stride: int, bbox: Optional[Bounds]) -> List[tuple]:
+    """decode_chunk arguments covering every raster that overlaps ``bbox``"""
+    tasks = []
+    for raster in rasters:
+        if bbox is not None and not _overlaps(raster.bounds, bbox):
+            continue
+        step = CHUNK_ROWS * stride if raster.streamable else raster.rows
+        tasks.extend(
+            (raster, start, min(start + step, raster.rows), stride, bbox)
+            for start in range(0, raster.rows, step)
+        )
+    return tasks
+
+
+def _overlaps(a: Bounds, b: Bounds) -> bool:
+    return a[0] <= b[1] and b[0] <= a[1] and a[2] <= b[3] and b[2] <= a[3]
+
+
+def _decoded(tasks: List[tuple], workers: int) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Decoded chunks in order, at most two per worker in flight so memory stays bounded"""
+    if workers <= 1:
+        yield from map(_decode_task, tasks)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for task in tasks:
+            pending.append(pool.submit(_decode_task, task))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def mark_covered_grids(db: ElevationDatabase, bounds: Bounds) -> int:
+    """Mark scrape grid cells lying wholly inside ``bounds`` as completed"""
+    lat_min, lat_max, lng_min, lng_max = bounds
+    # Through the writer, after the points it still has queued
+    return db.writer.execute(lambda conn: conn.execute("""
+        UPDATE scrape_progress
+        SET status = 'completed', last_attempt = ?
+        WHERE status != 'completed'
+        AND lat_min >= ? AND lat_max <= ? AND lng_min >= ? AND lng_max <= ?
+    """, (int(time.time()), lat_min, lat_max, lng_min, lng_max)).rowcount)
+
+
+def import_dems(
+    db: ElevationDatabase,
+    paths: List[str],
+    workers: int = os.cpu_count() or 1,
+    stride: int = 1,
+    bbox: Optional[Bounds] = None,
+    source: Optional[str] = None,
+    accuracy: str = "high"
+) -> int:
+    """Import DEM files into ``db``, returning the number of points written"""
+    rasters = [open_dem(path) for path in paths]
+    timestamp = int(time.time())
+    imported = 0
+
+    tasks = plan_chunks(rasters, stride, bbox)
+    for (raster, *_), (lats, lngs, elevations) in zip(tasks, _decoded(tasks, workers)):
+        if lats.size:
+            db.add_elevation_arrays(
+                lats, lngs, elevations,
+                source=source or ("srtm" if raster.kind == "hgt" else "geotiff"),
+                accuracy=accuracy,
+                timestamp=timestamp
+            )
+            imported += lats.size
+
+    for raster in rasters:
+        covered = raster.bounds
+        if bbox is not None:
+            covered = (max(covered[0], bbox[0]), min(covered[1], bbox[1]),
+                       max(covered[2], bbox[2]), min(covered[3], bbox[3]))
+        marked = mark_covered_grids(db, covered)
+        logger.info(f"{raster.path}: marked {marked} grid cells completed")
+
+    return imported
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Import SRTM .hgt and GeoTIFF DEMs into an elevation database")
+    parser.add_argument("db", help="elevation database (created if missing)")
+    parser.add_argument("paths", nargs="+", help=".hgt/.tif files or directories containing them")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="decoding processes")
+    parser.add_argument("--stride", type=int, default=1, help="keep every nth row and column")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("LAT_MIN", "LAT_MAX", "LNG_MIN", "LNG_MAX"))
+    parser.add_argument("--source", help="source name stored with the points (default: srtm/geotiff)")
+    parser.add_argument("--accuracy", default="high", choices=["high", "medium", "low"])
+    parser.add_argument("--compact", action="store_true", help="create new databases with compact storage")
+    args = parser.parse_args()
+
+    db = ElevationDatabase(args.db, compact=True if args.compact else None)
+    paths = find_dems(args.paths)
+    start = time.time()
+    imported = import_dems(
+        db, paths, workers=args.workers, stride=max(args.stride, 1),
+        bbox=tuple(args.bbox) if args.bbox else None, source=args.source, accuracy=args.accuracy
+    )
+    db.close()
+    elapsed = time.time() - start
+    print(f"Imported {imported:,} points from {len(paths)} files in {elapsed:.1f}s "
+          f"({imported / max(elapsed, 1e-9):,.0f} points/s)")
+
+
+if __name__ == "__main__":
+    main()
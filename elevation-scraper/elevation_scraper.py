@@ -6,6 +6,7 @@ Builds a comprehensive elevation database by intelligently scraping free elevati
 Designed to run continuously in the background, prioritizing populated areas and cycling routes.
 """
 
+import argparse
 import asyncio
 import aiohttp
 import sqlite3
@@ -13,10 +14,22 @@ import json
 import time
 import logging
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from itertools import repeat
+from typing import Collection, Dict, Iterator, List, Tuple, Optional
 from pathlib import Path
 import gzip
 import math
+import os
+import socket
+import threading
+
+import numpy as np
+
+# Shared with the backend through the elevation-common package
+from elevation_common import elevation_keys, elevation_stats
+from elevation_common.dataset_files import dataset_fingerprint
+from known_points import KnownPoints
+from sqlite_writer import SQLiteWriter, read_connection
 
 # Configure logging
 logging.basicConfig(
@@ -29,6 +42,71 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Upserts rather than REPLACE, so existing legacy rows keep the rowid the R*Tree points at
+LEGACY_UPSERT = """
+    INSERT INTO elevation_data 
+    (lat, lng, elevation, source, accuracy, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (lat, lng) DO UPDATE SET
+        elevation = excluded.elevation,
+        source = excluded.source,
+        accuracy = excluded.accuracy,
+        timestamp = excluded.timestamp
+"""
+
+COMPACT_UPSERT = """
+    INSERT INTO elevation_points (zkey, elevation_dm, source_id, accuracy, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (zkey) DO UPDATE SET
+        elevation_dm = excluded.elevation_dm,
+        source_id = excluded.source_id,
+        accuracy = excluded.accuracy,
+        timestamp = excluded.timestamp
+"""
+
+# scrape_progress work queue: a claimed cell is leased to one worker until
+# lease_expires; the worker extends the lease while it scrapes, and a lease
+# that runs out (worker crashed, machine gone) puts the cell back in the queue
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 60  # doubled after every failed attempt
+RETRY_BACKOFF_MAX = 3600
+
+# Adaptive scraping samples each cell on a 5x5 lattice and splits it into
+# quadrants while bilinear interpolation from every other sample misses the
+# rest by more than the tolerance
+ADAPTIVE_POINTS_PER_SIDE = 4
+ADAPTIVE_TOLERANCE_M = 10.0
+ADAPTIVE_MAX_DEPTH = 5  # 1° / 2^5: cells ~3.5 km across, samples ~870 m apart
+
+# Columns added to scrape_progress databases created before leases and subdivisions existed
+PROGRESS_COLUMNS = (
+    ("worker_id", "TEXT"),
+    ("lease_expires", "INTEGER"),
+    ("retry_after", "INTEGER"),
+    ("depth", "INTEGER DEFAULT 0")
+)
+
+# API endpoints (free tiers)
+DEFAULT_APIS = [
+    {
+        'name': 'open_elevation',
+        'url': 'https://api.open-elevation.com/api/v1/lookup',
+        'method': 'POST',
+        'rate_limit': 1,  # requests per second
+        'batch_size': 100,
+        'accuracy': 'medium'
+    },
+    {
+        'name': 'opentopodata',
+        'url': 'https://api.opentopodata.org/v1/srtm30m',
+        'method': 'GET',
+        'rate_limit': 1,
+        'batch_size': 100,
+        'accuracy': 'medium'
+    }
+]
+
 @dataclass
 class ElevationPoint:
     lat: float
@@ -45,137 +123,604 @@ class GridCell:
     lng_min: float
     lng_max: float
     priority: int  # 1=highest (cities), 5=lowest (oceans)
+    grid_id: Optional[str] = None
+    depth: int = 0
+    
+    def quadrants(self) -> List['GridCell']:
+        """The four cells one level down, with ids ``<grid_id>/0`` to ``/3``"""
+        lat_mid = (self.lat_min + self.lat_max) / 2
+        lng_mid = (self.lng_min + self.lng_max) / 2
+        return [
+            GridCell(lat_min, lat_max, lng_min, lng_max, self.priority, f"{self.grid_id}/{i}", self.depth + 1)
+            for i, (lat_min, lat_max, lng_min, lng_max) in enumerate([
+                (self.lat_min, lat_mid, self.lng_min, lng_mid),
+                (self.lat_min, lat_mid, lng_mid, self.lng_max),
+                (lat_mid, self.lat_max, self.lng_min, lng_mid),
+                (lat_mid, self.lat_max, lng_mid, self.lng_max)
+            ])
+        ]
+    
+    def lattice(self, points_per_side: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(points_per_side + 1)² sample coordinates, rounded to microdegrees"""
+        lats = np.round(np.linspace(self.lat_min, self.lat_max, points_per_side + 1), 6)
+        lngs = np.round(np.linspace(self.lng_min, self.lng_max, points_per_side + 1), 6)
+        return np.meshgrid(lats, lngs, indexing='ij')
+
+
+def refinement_error(elevations: np.ndarray) -> float:
+    """How far bilinear interpolation from every other sample misses the rest, in metres
+    
+    ``elevations`` is a (2n + 1)² lattice; NaN (no data) samples are ignored.
+    This is the error of sampling at half the density, so it measures the
+    curvature the lattice resolves, not just its slope.
+    """
+    coarse = elevations[::2, ::2]
+    predicted = np.empty_like(elevations)
+    predicted[::2, ::2] = coarse
+    predicted[1::2, ::2] = (coarse[:-1] + coarse[1:]) / 2
+    predicted[::2, 1::2] = (coarse[:, :-1] + coarse[:, 1:]) / 2
+    predicted[1::2, 1::2] = (coarse[:-1, :-1] + coarse[1:, :-1] + coarse[:-1, 1:] + coarse[1:, 1:]) / 4
+    residuals = np.abs(elevations - predicted)
+    residuals = residuals[~np.isnan(residuals)]
+    return float(residuals.max()) if residuals.size else 0.0
 
 class ElevationDatabase:
-    """Manages the local elevation database"""
+    """Manages the local elevation database
+
+    ``compact`` stores points in the Morton-keyed elevation_points table
+    (integer microdegree keys, decimetre elevations, integer source/accuracy)
+    instead of elevation_data. ``None`` keeps whichever layout the database
+    already uses, defaulting to elevation_data for new files.
+
+    Writes are queued on one SQLiteWriter and committed in batches; reads use
+    a separate read-only connection and see queued writes once flushed.
+    ``close()`` flushes whatever is still queued and saves the known-point
+    filter.
+    """
     
-    def __init__(self, db_path: str = "elevation.db"):
+    def __init__(self, db_path: str = "elevation.db", compact: Optional[bool] = None):
         self.db_path = db_path
+        # Taken before the writer opens a WAL, to compare with the one saved with the filter on close
+        self._opened_fingerprint = dataset_fingerprint([db_path])
+        self.compact = self._detect_compact() if compact is None else compact
+        self.writer = SQLiteWriter(db_path)
+        self._reader: Optional[sqlite3.Connection] = None
+        self._known: Optional[KnownPoints] = None
+        # Lookups run on worker threads, off the scrapers' event loops
+        self._lookup_lock = threading.Lock()
         self.setup_database()
     
+    def _detect_compact(self) -> bool:
+        """Whether an existing database already uses compact storage"""
+        if not Path(self.db_path).exists():
+            return False
+        conn = read_connection(self.db_path)
+        try:
+            return conn.execute("""
+                SELECT 1 FROM sqlite_master WHERE name = 'elevation_points'
+            """).fetchone() is not None
+        finally:
+            conn.close()
+    
+    def _read(self) -> sqlite3.Connection:
+        """Read-only connection, after flushing queued writes so reads see them"""
+        self.writer.flush()
+        if self._reader is None:
+            self._reader = read_connection(self.db_path)
+        return self._reader
+    
+    def flush(self):
+        self.writer.flush()
+    
+    def close(self):
+        """Commit queued writes, close the connections and save the known-point filter"""
+        self.writer.close()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._known is not None:
+            self._known.save(dataset_fingerprint([self.db_path]))
+    
+    def known_points(self) -> KnownPoints:
+        """Filter of the stored coordinates, loaded or built on first use and rebuilt once full"""
+        if self._known is None or self._known.filter.full:
+            conn = self._read()
+            stats = elevation_stats.read_stats(conn)
+            if stats is None:
+                table = "elevation_points" if self.compact else "elevation_data"
+                count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            else:
+                count = stats["points"]
+            known = KnownPoints(self.db_path, self._opened_fingerprint if self._known is None else ())
+            known.load(self._stored_keys(), count)
+            self._known = known
+        return self._known
+    
+    def _stored_keys(self) -> Iterator[np.ndarray]:
+        """Morton keys of every point with an elevation, in chunks"""
+        if self.compact:
+            cursor = self._read().execute("SELECT zkey FROM elevation_points WHERE elevation_dm IS NOT NULL")
+        else:
+            cursor = self._read().execute("SELECT lat, lng FROM elevation_data WHERE elevation IS NOT NULL")
+        while True:
+            rows = cursor.fetchmany(500_000)
+            if not rows:
+                return
+            data = np.array(rows, dtype=np.float64 if not self.compact else np.int64)
+            yield data[:, 0] if self.compact else elevation_keys.encode(data[:, 0], data[:, 1])
+    
+    def known_elevations(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        """Stored elevations at exactly these (microdegree) coordinates, NaN where unknown
+        
+        Only coordinates the known-point filter may contain are looked up.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        elevations = np.full(lats.shape, np.nan)
+        with self._lookup_lock:
+            known = self.known_points()
+            maybe = known.might_contain(lats, lngs)
+            if maybe.any():
+                elevations[maybe] = self._stored_elevations(lats[maybe], lngs[maybe])
+                known.known += int((~np.isnan(elevations[maybe])).sum())
+        return elevations
+    
+    def _stored_elevations(self, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+        conn = self._read()
+        elevations = np.full(lats.size, np.nan)
+        if self.compact:
+            keys = elevation_keys.encode(lats, lngs)
+            found = dict(conn.execute("""
+                SELECT zkey, elevation_dm FROM elevation_points
+                WHERE zkey IN (SELECT value FROM json_each(?))
+                AND elevation_dm IS NOT NULL
+            """, (json.dumps(keys.tolist()),)).fetchall())
+            for i, key in enumerate(keys.tolist()):
+                if key in found:
+                    elevations[i] = found[key] / elevation_keys.ELEVATION_SCALE
+            return elevations
+        
+        # Legacy rows keep the coordinates the APIs echoed: match them to the microdegree
+        half = 0.5 / elevation_keys.MICRODEGREES
+        for i, (lat, lng) in enumerate(zip(lats.tolist(), lngs.tolist())):
+            row = conn.execute("""
+                SELECT elevation FROM elevation_data
+                WHERE lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?
+                AND elevation IS NOT NULL
+                LIMIT 1
+            """, (lat - half, lat + half, lng - half, lng + half)).fetchone()
+            if row is not None:
+                elevations[i] = row[0]
+        return elevations
+    
     def setup_database(self):
         """Create database tables if they don't exist"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS elevation_data (
-                    lat REAL,
-                    lng REAL,
-                    elevation REAL,
-                    source TEXT,
-                    accuracy TEXT,
-                    timestamp INTEGER,
-                    PRIMARY KEY (lat, lng)
-                )
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_location 
-                ON elevation_data (lat, lng)
-            """)
-            
+        self.writer.execute(self._create_tables)
+        logger.info("Database initialized")
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        if self.compact:
+            for statement in elevation_keys.COMPACT_SCHEMA:
+                conn.execute(statement)
+        else:
+            self._setup_legacy_tables(conn)
+        
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_progress (
+                grid_id TEXT PRIMARY KEY,
+                lat_min REAL,
+                lat_max REAL,
+                lng_min REAL,
+                lng_max REAL,
+                status TEXT,  -- 'pending', 'in_progress', 'completed', 'failed'
+                priority INTEGER,
+                last_attempt INTEGER,
+                error_count INTEGER DEFAULT 0,
+                worker_id TEXT,  -- holder of an 'in_progress' cell's lease
+                lease_expires INTEGER,
+                retry_after INTEGER,  -- earliest retry of a cell that failed
+                depth INTEGER DEFAULT 0  -- quadtree subdivisions below the 1° grid
+            )
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(scrape_progress)")}
+        for name, column_type in PROGRESS_COLUMNS:
+            if name not in columns:
+                conn.execute(f"ALTER TABLE scrape_progress ADD COLUMN {name} {column_type}")
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_scrape_queue
+            ON scrape_progress (status, priority)
+        """)
+        
+        # Running totals behind the API's /stats (computed once for existing databases)
+        elevation_stats.create_stats(conn, self.compact)
+    
+    def _setup_legacy_tables(self, conn: sqlite3.Connection):
+        """elevation_data keyed by REAL (lat, lng), with its R*Tree"""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS elevation_data (
+                lat REAL,
+                lng REAL,
+                elevation REAL,
+                source TEXT,
+                accuracy TEXT,
+                timestamp INTEGER,
+                PRIMARY KEY (lat, lng)
+            )
+        """)
+        
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_location 
+            ON elevation_data (lat, lng)
+        """)
+        
+        # R*Tree over elevation_data rowids for 2D window / nearest-neighbour queries
+        has_rtree = conn.execute("""
+            SELECT 1 FROM sqlite_master WHERE name = 'elevation_rtree'
+        """).fetchone()
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS elevation_rtree USING rtree(
+                id, min_lat, max_lat, min_lng, max_lng
+            )
+        """)
+        if not has_rtree:
             conn.execute("""
-                CREATE TABLE IF NOT EXISTS scrape_progress (
-                    grid_id TEXT PRIMARY KEY,
-                    lat_min REAL,
-                    lat_max REAL,
-                    lng_min REAL,
-                    lng_max REAL,
-                    status TEXT,  -- 'pending', 'in_progress', 'completed', 'failed'
-                    priority INTEGER,
-                    last_attempt INTEGER,
-                    error_count INTEGER DEFAULT 0
-                )
+                INSERT INTO elevation_rtree (id, min_lat, max_lat, min_lng, max_lng)
+                SELECT rowid, lat, lat, lng, lng FROM elevation_data
             """)
-            
-            conn.commit()
-            logger.info("Database initialized")
     
     def add_elevation_points(self, points: List[ElevationPoint]):
-        """Batch insert elevation points"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.executemany("""
-                INSERT OR REPLACE INTO elevation_data 
-                (lat, lng, elevation, source, accuracy, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, [
+        """Batch insert elevation points (queued, committed with the next flush)"""
+        if points:
+            self.writer.submit(lambda conn: self._write_points(conn, points), rows=len(points))
+            self._add_known([p.lat for p in points], [p.lng for p in points])
+    
+    def _write_points(self, conn: sqlite3.Connection, points: List[ElevationPoint]):
+        if self.compact:
+            self._add_compact_points(conn, points)
+            return
+        
+        keys = [(p.lat, p.lng) for p in points]
+        
+        def upsert():
+            conn.executemany(LEGACY_UPSERT, [
                 (p.lat, p.lng, p.elevation, p.source, p.accuracy, p.timestamp)
                 for p in points
             ])
-            conn.commit()
+            conn.executemany("""
+                INSERT OR IGNORE INTO elevation_rtree (id, min_lat, max_lat, min_lng, max_lng)
+                SELECT rowid, lat, lat, lng, lng FROM elevation_data
+                WHERE lat = ? AND lng = ?
+            """, keys)
+        
+        elevation_stats.counted_upsert(
+            conn, False, keys, [p.lat for p in points], [p.lng for p in points], upsert
+        )
+    
+    def add_elevation_arrays(
+        self,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        elevations: np.ndarray,
+        source: str,
+        accuracy: str,
+        timestamp: Optional[int] = None
+    ):
+        """Batch insert points given as arrays, all from one source (bulk imports; queued)"""
+        timestamp = int(time.time()) if timestamp is None else timestamp
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        elevations = np.asarray(elevations, dtype=np.float64)
+        
+        def write(conn: sqlite3.Connection):
+            if self.compact:
+                source_id = self._source_ids(conn, {source})[source]
+                accuracy_code = elevation_keys.ACCURACY_CODES.get(accuracy)
+                keys = elevation_keys.encode(lats, lngs).tolist()
+                
+                def upsert():
+                    conn.executemany(COMPACT_UPSERT, zip(
+                        keys,
+                        np.round(elevations * elevation_keys.ELEVATION_SCALE).astype(np.int64).tolist(),
+                        repeat(source_id),
+                        repeat(accuracy_code),
+                        repeat(timestamp)
+                    ))
+                
+                elevation_stats.counted_upsert(conn, True, keys, lats, lngs, upsert)
+            else:
+                def upsert():
+                    # New rows get rowids above the current maximum, so only those need R*Tree entries
+                    last_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM elevation_data").fetchone()[0]
+                    conn.executemany(LEGACY_UPSERT, zip(
+                        lats.tolist(), lngs.tolist(), elevations.tolist(),
+                        repeat(source), repeat(accuracy), repeat(timestamp)
+                    ))
+                    conn.execute("""
+                        INSERT OR IGNORE INTO elevation_rtree (id, min_lat, max_lat, min_lng, max_lng)
+                        SELECT rowid, lat, lat, lng, lng FROM elevation_data WHERE rowid > ?
+                    """, (last_rowid,))
+                
+                elevation_stats.counted_upsert(conn, False, zip(lats.tolist(), lngs.tolist()), lats, lngs, upsert)
+        
+        self.writer.submit(write, rows=lats.size)
+        self._add_known(lats, lngs)
+    
+    def _add_known(self, lats, lngs):
+        """Add new points to the known-point filter, waiting out a rebuild in progress"""
+        with self._lookup_lock:
+            if self._known is not None:
+                self._known.add(lats, lngs)
+    
+    def _add_compact_points(self, conn: sqlite3.Connection, points: List[ElevationPoint]):
+        """Upsert points into elevation_points by Morton key"""
+        if not points:
+            return
+        source_ids = self._source_ids(conn, {p.source for p in points})
+        lats = [p.lat for p in points]
+        lngs = [p.lng for p in points]
+        keys = elevation_keys.encode(lats, lngs).tolist()
+        
+        def upsert():
+            conn.executemany(COMPACT_UPSERT, [
+                (
+                    key,
+                    None if p.elevation is None else round(p.elevation * elevation_keys.ELEVATION_SCALE),
+                    source_ids[p.source],
+                    elevation_keys.ACCURACY_CODES.get(p.accuracy),
+                    p.timestamp
+                )
+                for key, p in zip(keys, points)
+            ])
+        
+        elevation_stats.counted_upsert(conn, True, keys, lats, lngs, upsert)
+    
+    @staticmethod
+    def _source_ids(conn: sqlite3.Connection, names) -> dict:
+        """elevation_sources ids for source names, adding any new ones"""
+        conn.executemany("INSERT OR IGNORE INTO elevation_sources (name) VALUES (?)", [(n,) for n in names])
+        placeholders = ", ".join("?" * len(names))
+        return dict(conn.execute(
+            f"SELECT name, id FROM elevation_sources WHERE name IN ({placeholders})", list(names)
+        ).fetchall())
     
     def get_elevation(self, lat: float, lng: float, radius: float = 0.001) -> Optional[float]:
         """Get elevation for a point, with optional radius search"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT elevation FROM elevation_data 
-                WHERE lat BETWEEN ? AND ? 
-                AND lng BETWEEN ? AND ?
-                ORDER BY ABS(lat - ?) + ABS(lng - ?) ASC
-                LIMIT 1
-            """, (
-                lat - radius, lat + radius,
-                lng - radius, lng + radius,
-                lat, lng
-            ))
-            
-            result = cursor.fetchone()
-            return result[0] if result else None
+        conn = self._read()
+        if self.compact:
+            return self._get_compact_elevation(conn, lat, lng, radius)
+        
+        cursor = conn.execute("""
+            SELECT d.elevation FROM elevation_rtree r
+            JOIN elevation_data d ON d.rowid = r.id
+            WHERE r.max_lat >= ? AND r.min_lat <= ?
+            AND r.max_lng >= ? AND r.min_lng <= ?
+            ORDER BY ABS(d.lat - ?) + ABS(d.lng - ?) ASC
+            LIMIT 1
+        """, (
+            lat - radius, lat + radius,
+            lng - radius, lng + radius,
+            lat, lng
+        ))
+        
+        result = cursor.fetchone()
+        return result[0] if result else None
     
-    def mark_grid_completed(self, grid_id: str):
-        """Mark a grid cell as completed"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                UPDATE scrape_progress 
-                SET status = 'completed', last_attempt = ?
-                WHERE grid_id = ?
-            """, (int(time.time()), grid_id))
-            conn.commit()
-    
-    def get_next_grid(self) -> Optional[GridCell]:
-        """Get the next highest priority grid cell to scrape"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT grid_id, lat_min, lat_max, lng_min, lng_max, priority
-                FROM scrape_progress 
-                WHERE status = 'pending' 
-                AND (last_attempt IS NULL OR last_attempt < ?)
-                AND error_count < 5
+    def _get_compact_elevation(self, conn: sqlite3.Connection, lat: float, lng: float, radius: float) -> Optional[float]:
+        """Nearest stored elevation within radius, from Morton key range scans"""
+        rows = []
+        for start, end in elevation_keys.key_ranges(lat - radius, lat + radius, lng - radius, lng + radius):
+            rows.extend(conn.execute("""
+                SELECT zkey, elevation_dm FROM elevation_points
+                WHERE zkey BETWEEN ? AND ?
+                AND elevation_dm IS NOT NULL
+            """, (start, end)).fetchall())
+        if not rows:
+            return None
+        
+        data = np.array(rows, dtype=np.int64)
+        lats, lngs = elevation_keys.decode(data[:, 0])
+        distances = np.abs(lats - lat) + np.abs(lngs - lng)
+        inside = (np.abs(lats - lat) <= radius) & (np.abs(lngs - lng) <= radius)
+        if not inside.any():
+            return None
+        
+        nearest = np.flatnonzero(inside)[np.argmin(distances[inside])]
+        return float(data[nearest, 1]) / elevation_keys.ELEVATION_SCALE
+    
+    def claim_grids(self, worker_id: str, limit: int = 1, lease_seconds: int = LEASE_SECONDS) -> List[GridCell]:
+        """Lease up to ``limit`` of the highest priority cells to ``worker_id``
+        
+        A cell can be claimed when it is pending and past its retry backoff,
+        or when its lease has expired. Selecting and leasing happen in one
+        write transaction, so concurrent workers, in this or other processes,
+        never claim the same cell.
+        """
+        def claim(conn: sqlite3.Connection) -> List[GridCell]:
+            now = int(time.time())
+            self._requeue_expired(conn, now)
+            rows = conn.execute("""
+                SELECT grid_id, lat_min, lat_max, lng_min, lng_max, priority, COALESCE(depth, 0)
+                FROM scrape_progress
+                WHERE status = 'pending'
+                AND (retry_after IS NULL OR retry_after <= ?)
+                AND error_count < ?
                 ORDER BY priority ASC, last_attempt ASC
-                LIMIT 1
-            """, (int(time.time()) - 3600,))  # Retry failed after 1 hour
-            
-            result = cursor.fetchone()
-            if result:
-                return GridCell(
-                    lat_min=result[1],
-                    lat_max=result[2], 
-                    lng_min=result[3],
-                    lng_max=result[4],
-                    priority=result[5]
+                LIMIT ?
+            """, (now, MAX_ATTEMPTS, limit)).fetchall()
+            conn.executemany("""
+                UPDATE scrape_progress
+                SET status = 'in_progress', worker_id = ?, lease_expires = ?, last_attempt = ?
+                WHERE grid_id = ?
+            """, [(worker_id, now + lease_seconds, now, row[0]) for row in rows])
+            return [
+                GridCell(
+                    lat_min=row[1],
+                    lat_max=row[2],
+                    lng_min=row[3],
+                    lng_max=row[4],
+                    priority=row[5],
+                    grid_id=row[0],
+                    depth=row[6]
                 )
-            return None
+                for row in rows
+            ]
+        
+        return self.writer.execute(claim)
+    
+    @staticmethod
+    def _requeue_expired(conn: sqlite3.Connection, now: int):
+        """Count an expired lease as a failed attempt and make its cell claimable again"""
+        conn.execute("""
+            UPDATE scrape_progress
+            SET status = CASE WHEN error_count + 1 >= ? THEN 'failed' ELSE 'pending' END,
+                error_count = error_count + 1,
+                worker_id = NULL, lease_expires = NULL, retry_after = NULL
+            WHERE status = 'in_progress' AND (lease_expires IS NULL OR lease_expires < ?)
+        """, (MAX_ATTEMPTS, now))
+    
+    def heartbeat(self, worker_id: str, grid_ids: Collection[str], lease_seconds: int = LEASE_SECONDS) -> List[str]:
+        """Extend ``worker_id``'s leases on ``grid_ids``; returns the cells it still holds"""
+        grid_ids = list(grid_ids)
+        if not grid_ids:
+            return []
+        
+        def extend(conn: sqlite3.Connection) -> List[str]:
+            placeholders = ", ".join("?" * len(grid_ids))
+            conn.execute(f"""
+                UPDATE scrape_progress SET lease_expires = ?
+                WHERE status = 'in_progress' AND worker_id = ? AND grid_id IN ({placeholders})
+            """, (int(time.time()) + lease_seconds, worker_id, *grid_ids))
+            return [row[0] for row in conn.execute(f"""
+                SELECT grid_id FROM scrape_progress
+                WHERE status = 'in_progress' AND worker_id = ? AND grid_id IN ({placeholders})
+            """, (worker_id, *grid_ids))]
+        
+        return self.writer.execute(extend)
+    
+    def release_grids(self, worker_id: str) -> int:
+        """Return ``worker_id``'s leased cells to the queue without counting an attempt (clean shutdown)"""
+        return self.writer.execute(lambda conn: conn.execute("""
+            UPDATE scrape_progress
+            SET status = 'pending', worker_id = NULL, lease_expires = NULL
+            WHERE status = 'in_progress' AND worker_id = ?
+        """, (worker_id,)).rowcount)
+    
+    def mark_grid_completed(self, grid_id: str, worker_id: Optional[str] = None):
+        """Mark a grid cell as completed, releasing its lease
+        
+        With ``worker_id``, nothing changes unless that worker still holds the
+        lease, as in mark_grid_failed.
+        """
+        now = int(time.time())
+        self.writer.submit(lambda conn: conn.execute("""
+            UPDATE scrape_progress 
+            SET status = 'completed', last_attempt = ?, worker_id = NULL, lease_expires = NULL
+            WHERE grid_id = ? AND (? IS NULL OR worker_id = ?)
+        """, (now, grid_id, worker_id, worker_id)))
+    
+    def mark_grid_failed(self, grid_id: str, worker_id: Optional[str] = None):
+        """Count a failed attempt and release the lease
+        
+        The cell is retried after an exponential backoff, and marked failed
+        after MAX_ATTEMPTS attempts. With ``worker_id``, nothing changes unless
+        that worker still holds the lease (another may have taken it over).
+        """
+        now = int(time.time())
+        self.writer.submit(lambda conn: conn.execute("""
+            UPDATE scrape_progress 
+            SET status = CASE WHEN error_count + 1 >= ? THEN 'failed' ELSE 'pending' END,
+                retry_after = ? + MIN(? << error_count, ?),
+                error_count = error_count + 1,
+                last_attempt = ?, worker_id = NULL, lease_expires = NULL
+            WHERE grid_id = ? AND (? IS NULL OR worker_id = ?)
+        """, (
+            MAX_ATTEMPTS, now, RETRY_BACKOFF_SECONDS, RETRY_BACKOFF_MAX,
+            now, grid_id, worker_id, worker_id
+        )))
+    
+    def add_subdivisions(self, grids: List[GridCell]):
+        """Queue cells produced by subdividing a scraped cell"""
+        self.writer.submit(lambda conn: conn.executemany("""
+            INSERT OR IGNORE INTO scrape_progress
+            (grid_id, lat_min, lat_max, lng_min, lng_max, status, priority, last_attempt, error_count, depth)
+            VALUES (?, ?, ?, ?, ?, 'pending', ?, NULL, 0, ?)
+        """, [
+            (grid.grid_id, grid.lat_min, grid.lat_max, grid.lng_min, grid.lng_max, grid.priority, grid.depth)
+            for grid in grids
+        ]), rows=len(grids))
+    
+    def get_next_grid(self, worker_id: Optional[str] = None) -> Optional[GridCell]:
+        """Claim the next highest priority grid cell to scrape"""
+        grids = self.claim_grids(worker_id or default_worker_id())
+        return grids[0] if grids else None
+
+def default_worker_id() -> str:
+    """Identifies this process in scrape_progress leases"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class TokenBucket:
+    """Requests-per-second budget of one API, shared by every worker
+    
+    Holds up to ``burst`` tokens and refills at ``rate`` per second. ``reserve``
+    takes a token even when none is left and returns how long the caller must
+    wait for it, so queued requests go out evenly spaced, in order.
+    """
+    
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self) -> float:
+        """Seconds until a token is free, counting reservations already made"""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+    
+    def reserve(self) -> float:
+        """Take a token; returns the seconds to wait before using it"""
+        wait = self.delay()
+        self.tokens -= 1
+        return wait
+    
+    def pause(self, seconds: float):
+        """Hold back new requests for ``seconds``, e.g. after a 429 with Retry-After"""
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
 
 class ElevationScraper:
     """Scrapes elevation data from multiple sources"""
     
-    def __init__(self, db: ElevationDatabase):
+    def __init__(
+        self,
+        db: ElevationDatabase,
+        apis: Optional[List[dict]] = None,
+        adaptive: bool = False,
+        tolerance: float = ADAPTIVE_TOLERANCE_M,
+        max_depth: int = ADAPTIVE_MAX_DEPTH
+    ):
         self.db = db
         self.session = None
-        
-        # API endpoints (free tiers)
-        self.apis = [
-            {
-                'name': 'open_elevation',
-                'url': 'https://api.open-elevation.com/api/v1/lookup',
-                'method': 'POST',
-                'rate_limit': 1,  # requests per second
-                'batch_size': 100,
-                'accuracy': 'medium'
-            }
-        ]
+        self.apis = DEFAULT_APIS if apis is None else apis
+        # Adaptive mode: coarse lattices, subdivided where the terrain needs it
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.max_depth = max_depth
+        self.points_requested = 0
+        self.points_skipped = 0  # already in the database
+        self.requests_saved = 0
+        self.subdivided = 0
+        # Each API has its own quota, so concurrent workers can use all of them at once
+        self.buckets = {api['name']: TokenBucket(api['rate_limit']) for api in self.apis}
         
         self.request_count = 0
-        self.last_request_time = 0
+        self.requests_by_api: Dict[str, int] = {api['name']: 0 for api in self.apis}
+        self.throttled_count = 0
         
     async def __aenter__(self):
         self.session = aiohttp.ClientSession()
@@ -184,94 +729,240 @@ class ElevationScraper:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
+        if self.points_skipped:
+            logger.info(f"Skipped {self.points_skipped:,} known points, saving {self.requests_saved:,} requests")
     
     async def scrape_grid_cell(self, grid: GridCell) -> bool:
-        """Scrape elevation data for a grid cell"""
+        """Scrape elevation data for a grid cell
+        
+        Lattice points the database already holds are read back rather than
+        requested again. In adaptive mode the cell gets a coarse lattice, and
+        is split into quadrants (queued in scrape_progress) when its
+        refinement error is above the tolerance; a quadrant's lattice
+        contains every other sample of its parent's.
+        """
         try:
-            # Generate sampling points (adaptive density based on priority)
-            points_per_side = 10 if grid.priority <= 2 else 5
-            lat_step = (grid.lat_max - grid.lat_min) / points_per_side
-            lng_step = (grid.lng_max - grid.lng_min) / points_per_side
+            # Generate sampling points (fixed density based on priority unless adaptive)
+            if self.adaptive:
+                points_per_side = ADAPTIVE_POINTS_PER_SIDE
+            else:
+                points_per_side = 10 if grid.priority <= 2 else 5
+            lats, lngs = grid.lattice(points_per_side)
+            
+            # The lookup can take a query per point: run it off the event loop
+            elevations = await asyncio.to_thread(self.db.known_elevations, lats.ravel(), lngs.ravel())
+            elevations = elevations.reshape(lats.shape)
+            coordinates = [
+                (float(lats[index]), float(lngs[index]))
+                for index in np.ndindex(lats.shape) if np.isnan(elevations[index])
+            ]
+            self.points_requested += len(coordinates)
+            self.points_skipped += lats.size - len(coordinates)
+            batch_size = max(api['batch_size'] for api in self.apis)
+            self.requests_saved += math.ceil(lats.size / batch_size) - math.ceil(len(coordinates) / batch_size)
             
-            coordinates = []
-            for i in range(points_per_side + 1):
-                for j in range(points_per_side + 1):
-                    lat = grid.lat_min + (i * lat_step)
-                    lng = grid.lng_min + (j * lng_step)
-                    coordinates.append((lat, lng))
+            # Spread the batches over every API, each within its own rate limit
+            tasks = []
+            pending = coordinates
+            while pending:
+                api = self._next_api()
+                batch, pending = pending[:api['batch_size']], pending[api['batch_size']:]
+                tasks.append(asyncio.ensure_future(self._scrape_batch(batch, api, self._reserve(api))))
+            results = await asyncio.gather(*tasks, return_exceptions=True)
             
-            # Scrape in batches
             elevation_points = []
-            for api in self.apis:
-                try:
-                    points = await self._scrape_with_api(coordinates, api)
-                    elevation_points.extend(points)
-                    break  # Success with this API
-                except Exception as e:
-                    logger.warning(f"API {api['name']} failed for grid: {e}")
-                    continue
+            failed = 0
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"Batch failed on every API for grid {grid.lat_min:.3f},{grid.lng_min:.3f}: {result}")
+                    failed += 1
+                else:
+                    elevation_points.extend(result)
             
             if elevation_points:
                 self.db.add_elevation_points(elevation_points)
                 logger.info(f"Scraped {len(elevation_points)} points for grid {grid.lat_min:.3f},{grid.lng_min:.3f}")
-                return True
-            else:
-                logger.error(f"No elevation data obtained for grid {grid.lat_min:.3f},{grid.lng_min:.3f}")
+            if failed or (coordinates and not elevation_points):
+                logger.error(f"Incomplete elevation data for grid {grid.lat_min:.3f},{grid.lng_min:.3f}")
                 return False
+            
+            if self.adaptive and grid.depth < self.max_depth:
+                self._refine(grid, lats, lngs, elevations, elevation_points)
+            return True
                 
         except Exception as e:
             logger.error(f"Error scraping grid: {e}")
             return False
     
+    def _refine(
+        self,
+        grid: GridCell,
+        lats: np.ndarray,
+        lngs: np.ndarray,
+        elevations: np.ndarray,
+        points: List[ElevationPoint]
+    ):
+        """Queue the cell's quadrants if its lattice misses the tolerance"""
+        positions = {(lat, lng): index for index, lat, lng in zip(np.ndindex(lats.shape), lats.flat, lngs.flat)}
+        for point in points:
+            index = positions.get((round(point.lat, 6), round(point.lng, 6)))
+            if index is not None:
+                elevations[index] = point.elevation
+        
+        error = refinement_error(elevations)
+        if error > self.tolerance:
+            self.db.add_subdivisions(grid.quadrants())
+            self.subdivided += 1
+            logger.info(f"Subdividing grid {grid.grid_id}: refinement error {error:.1f} m")
+    
+    def _next_api(self, exclude: Collection[str] = ()) -> Optional[dict]:
+        """The API whose rate limit lets a request out soonest"""
+        candidates = [api for api in self.apis if api['name'] not in exclude]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda api: self.buckets[api['name']].delay())
+    
+    def _reserve(self, api: dict) -> float:
+        self.requests_by_api[api['name']] += 1
+        return self.buckets[api['name']].reserve()
+    
+    async def _scrape_batch(self, batch: List[Tuple[float, float]], api: dict, wait: float) -> List[ElevationPoint]:
+        """Fetch one batch once its rate-limit slot comes up, falling back to the other APIs on failure"""
+        tried = set()
+        while True:
+            await asyncio.sleep(wait)
+            try:
+                return await self._scrape_with_api(batch, api)
+            except Exception as e:
+                logger.warning(f"API {api['name']} failed for batch: {e}")
+                tried.add(api['name'])
+                api = self._next_api(exclude=tried)
+                if api is None:
+                    raise
+                wait = self._reserve(api)
+    
     async def _scrape_with_api(self, coordinates: List[Tuple[float, float]], api: dict) -> List[ElevationPoint]:
-        """Scrape elevation data using a specific API"""
-        points = []
-        batch_size = api['batch_size']
+        """Scrape elevation data for one batch using a specific API"""
+        self.request_count += 1
+        if api['method'] == 'POST':
+            request = self.session.post(
+                api['url'],
+                json={'locations': [{'latitude': lat, 'longitude': lng} for lat, lng in coordinates]},
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        else:
+            request = self.session.get(
+                api['url'],
+                params={'locations': '|'.join(f"{lat},{lng}" for lat, lng in coordinates)},
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
         
-        for i in range(0, len(coordinates), batch_size):
-            batch = coordinates[i:i + batch_size]
-            
-            # Rate limiting
-            await self._rate_limit(api['rate_limit'])
-            
-            if api['name'] == 'open_elevation':
-                locations = [{'latitude': lat, 'longitude': lng} for lat, lng in batch]
-                
-                async with self.session.post(
-                    api['url'],
-                    json={'locations': locations},
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        for result in data.get('results', []):
-                            if result.get('elevation') is not None:
-                                points.append(ElevationPoint(
-                                    lat=result['latitude'],
-                                    lng=result['longitude'],
-                                    elevation=result['elevation'],
-                                    source=api['name'],
-                                    accuracy=api['accuracy'],
-                                    timestamp=int(time.time())
-                                ))
-                    else:
-                        raise Exception(f"HTTP {response.status}")
+        async with request as response:
+            if response.status == 429:
+                # Over quota despite the bucket (shared key, clock drift): back off this API
+                self.throttled_count += 1
+                self.buckets[api['name']].pause(float(response.headers.get('Retry-After', 1)))
+                raise Exception("HTTP 429")
+            if response.status != 200:
+                raise Exception(f"HTTP {response.status}")
+            data = await response.json()
+        
+        points = []
+        for result in data.get('results', []):
+            if result.get('elevation') is None:
+                continue
+            # Open-Elevation echoes latitude/longitude, OpenTopoData a location object
+            location = result.get('location') or {'lat': result['latitude'], 'lng': result['longitude']}
+            points.append(ElevationPoint(
+                lat=location['lat'],
+                lng=location['lng'],
+                elevation=result['elevation'],
+                source=api['name'],
+                accuracy=api['accuracy'],
+                timestamp=int(time.time())
+            ))
         
         return points
+
+class ScrapeScheduler:
+    """Scrapes ``workers`` grid cells at a time
     
-    async def _rate_limit(self, requests_per_second: float):
-        """Implement rate limiting"""
-        min_interval = 1.0 / requests_per_second
-        current_time = time.time()
-        
-        if current_time - self.last_request_time < min_interval:
-            sleep_time = min_interval - (current_time - self.last_request_time)
-            await asyncio.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
-        self.request_count += 1
+    Every worker leases the next claimable cell from scrape_progress, so any
+    number of schedulers, in other processes or on other machines sharing
+    the database, can work through the same queue. A heartbeat extends the
+    leases of the cells being scraped; if this process dies they expire and
+    the cells are claimed again elsewhere. The scraper's token buckets keep
+    the combined request rate of all workers within each API's limit.
+    
+    Lease transactions can wait on SQLite's busy timeout, so they run on
+    worker threads rather than stalling the requests in flight.
+    """
+    
+    def __init__(
+        self,
+        db: ElevationDatabase,
+        scraper: ElevationScraper,
+        workers: int = 4,
+        worker_id: Optional[str] = None,
+        lease_seconds: int = LEASE_SECONDS
+    ):
+        self.db = db
+        self.scraper = scraper
+        self.workers = workers
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.leased: set = set()
+        self.completed = 0
+        self.failed = 0
+        self.lost_leases = 0
+    
+    async def run(self, until_empty: bool = False, idle_sleep: float = 60):
+        """Run the workers; with ``until_empty`` return once no cell is left to claim"""
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await asyncio.gather(*(self._worker(until_empty, idle_sleep) for _ in range(self.workers)))
+        finally:
+            heartbeat.cancel()
+            released = await asyncio.to_thread(self.db.release_grids, self.worker_id)
+            if released:
+                logger.info(f"Released {released} leased grid cells")
+    
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            leased = set(self.leased)
+            held = set(await asyncio.to_thread(self.db.heartbeat, self.worker_id, leased, self.lease_seconds))
+            # Cells finished while the heartbeat ran were released, not lost
+            for grid_id in (leased - held) & self.leased:
+                # Expired and claimed by someone else; finishing it anyway only duplicates work
+                self.lost_leases += 1
+                logger.warning(f"Lost the lease on grid {grid_id}")
+    
+    async def _worker(self, until_empty: bool, idle_sleep: float):
+        while True:
+            grids = await asyncio.to_thread(self.db.claim_grids, self.worker_id, 1, self.lease_seconds)
+            if not grids:
+                if until_empty:
+                    return
+                logger.info("No pending grid cells. Sleeping...")
+                await asyncio.sleep(idle_sleep)
+                continue
+            
+            grid = grids[0]
+            self.leased.add(grid.grid_id)
+            try:
+                success = await self.scraper.scrape_grid_cell(grid)
+            finally:
+                self.leased.discard(grid.grid_id)
+            
+            if success:
+                self.db.mark_grid_completed(grid.grid_id, self.worker_id)
+                self.completed += 1
+                logger.info(f"Completed grid {grid.grid_id}")
+            else:
+                self.db.mark_grid_failed(grid.grid_id, self.worker_id)
+                self.failed += 1
+                logger.warning(f"Failed to scrape grid {grid.grid_id}")
 
 class GridGenerator:
     """Generates prioritized grid cells for scraping"""
@@ -317,58 +1008,42 @@ class GridGenerator:
                     'pending', priority, None, 0
                 ))
         
-        # Batch insert grid cells
-        with sqlite3.connect(db.db_path) as conn:
-            conn.executemany("""
-                INSERT OR IGNORE INTO scrape_progress 
-                (grid_id, lat_min, lat_max, lng_min, lng_max, status, priority, last_attempt, error_count)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, grid_cells)
-            conn.commit()
+        # Batch insert grid cells, through the database's writer like every other write
+        db.writer.execute(lambda conn: conn.executemany("""
+            INSERT OR IGNORE INTO scrape_progress 
+            (grid_id, lat_min, lat_max, lng_min, lng_max, status, priority, last_attempt, error_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, grid_cells))
         
         logger.info(f"Generated {len(grid_cells)} grid cells")
 
 async def main():
     """Main scraper loop"""
+    parser = argparse.ArgumentParser(description="Scrape elevation data for pending grid cells")
+    parser.add_argument("--db", default="elevation.db", help="Elevation database")
+    parser.add_argument("--workers", type=int, default=4, help="Grid cells scraped concurrently")
+    parser.add_argument("--worker-id", help="Name in scrape_progress leases (default: host:pid)")
+    parser.add_argument("--adaptive", action="store_true", help="Coarse lattices, subdivided where the terrain varies")
+    parser.add_argument("--tolerance", type=float, default=ADAPTIVE_TOLERANCE_M, help="Adaptive refinement error (m)")
+    parser.add_argument("--max-depth", type=int, default=ADAPTIVE_MAX_DEPTH, help="Adaptive subdivisions below 1°")
+    args = parser.parse_args()
+    
     logger.info("Starting Baroudique Elevation Scraper")
     
     # Initialize database
-    db = ElevationDatabase()
+    db = ElevationDatabase(args.db)
     
     # Generate grid (run once)
     # GridGenerator.generate_world_grid(db)
     
     # Start scraping
-    async with ElevationScraper(db) as scraper:
-        while True:
-            try:
-                # Get next grid cell
-                grid = db.get_next_grid()
-                
-                if grid is None:
-                    logger.info("No pending grid cells. Sleeping...")
-                    await asyncio.sleep(60)
-                    continue
-                
-                # Scrape the grid
-                success = await scraper.scrape_grid_cell(grid)
-                
-                if success:
-                    grid_id = f"{grid.lat_min}_{grid.lng_min}"
-                    db.mark_grid_completed(grid_id)
-                    logger.info(f"Completed grid {grid_id}")
-                else:
-                    logger.warning(f"Failed to scrape grid {grid.lat_min},{grid.lng_min}")
-                
-                # Small delay between grids
-                await asyncio.sleep(1)
-                
-            except KeyboardInterrupt:
-                logger.info("Scraper stopped by user")
-                break
-            except Exception as e:
-                logger.error(f"Unexpected error: {e}")
-                await asyncio.sleep(5)
+    async with ElevationScraper(db, adaptive=args.adaptive, tolerance=args.tolerance, max_depth=args.max_depth) as scraper:
+        try:
+            await ScrapeScheduler(db, scraper, workers=args.workers, worker_id=args.worker_id).run()
+        except KeyboardInterrupt:
+            logger.info("Scraper stopped by user")
+        finally:
+            db.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the public elevation APIs, for benchmarking the scraper.
+
+Serves Open-Elevation's ``POST /api/v1/lookup`` and OpenTopoData's
+``GET /v1/<dataset>?locations=lat,lng|...`` with synthetic terrain. Each API
+enforces its own requests-per-second limit like the real free tiers,
+answering 429 with Retry-After when a client goes over it, and every
+request takes ``latency`` seconds to answer.
+
+    python fake_elevation_server.py --port 8090 --rate 5 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import math
+from typing import Dict
+
+from aiohttp import web
+
+from elevation_scraper import TokenBucket
+
+
+def terrain(lat: float, lng: float) -> float:
+    """Smooth synthetic elevation in metres"""
+    return round(200 + 150 * math.sin(lat * 3) * math.cos(lng * 2) + 20 * math.sin(lat * 40 + lng * 30), 1)
+
+
+class FakeElevationServer:
+    """aiohttp application emulating rate-limited elevation APIs"""
+
+    def __init__(self, rate: float = 1.0, latency: float = 0.2, max_locations: int = 100):
+        self.latency = latency
+        self.max_locations = max_locations
+        # A little burst allowance so requests paced exactly at the limit aren't rejected for jitter
+        self.buckets = {name: TokenBucket(rate, burst=2) for name in ("open_elevation", "opentopodata")}
+        self.requests: Dict[str, int] = {name: 0 for name in self.buckets}
+        self.throttled: Dict[str, int] = {name: 0 for name in self.buckets}
+        self.app = web.Application()
+        self.app.router.add_post("/api/v1/lookup", self.open_elevation)
+        self.app.router.add_get("/v1/{dataset}", self.opentopodata)
+
+    def _throttle(self, name: str):
+        bucket = self.buckets[name]
+        wait = bucket.delay()
+        if wait > 0:
+            self.throttled[name] += 1
+            raise web.HTTPTooManyRequests(headers={"Retry-After": f"{wait:.3f}"})
+        bucket.reserve()
+        self.requests[name] += 1
+
+    async def open_elevation(self, request: web.Request) -> web.Response:
+        self._throttle("open_elevation")
+        locations = (await request.json())["locations"][:self.max_locations]
+        await asyncio.sleep(self.latency)
+        return web.json_response({"results": [
+            {
+                "latitude": location["latitude"],
+                "longitude": location["longitude"],
+                "elevation": terrain(location["latitude"], location["longitude"])
+            }
+            for location in locations
+        ]})
+
+    async def opentopodata(self, request: web.Request) -> web.Response:
+        self._throttle("opentopodata")
+        pairs = [item.split(",") for item in request.query.get("locations", "").split("|") if item]
+        await asyncio.sleep(self.latency)
+        return web.json_response({"status": "OK", "results": [
+            {
+                "dataset": request.match_info["dataset"],
+                "location": {"lat": float(lat), "lng": float(lng)},
+                "elevation": terrain(float(lat), float(lng))
+            }
+            for lat, lng in pairs[:self.max_locations]
+        ]})
+
+    def apis(self, base_url: str, rate: float) -> list:
+        """Scraper API entries pointing at this server"""
+        return [
+            {
+                'name': 'open_elevation', 'url': f"{base_url}/api/v1/lookup", 'method': 'POST',
+                'rate_limit': rate, 'batch_size': self.max_locations, 'accuracy': 'medium'
+            },
+            {
+                'name': 'opentopodata', 'url': f"{base_url}/v1/srtm30m", 'method': 'GET',
+                'rate_limit': rate, 'batch_size': self.max_locations, 'accuracy': 'medium'
+            }
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second allowed per API")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds every request takes")
+    args = parser.parse_args()
+
+    server = FakeElevationServer(args.rate, args.latency)
+    web.run_app(server.app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
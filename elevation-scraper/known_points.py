@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Bloom filter of the coordinates an elevation database already holds.
+
+Re-runs and overlapping regions ask the APIs for points the database has.
+Before batching requests the scrapers pass their coordinates through a
+KnownPoints filter, keyed like compact storage (microdegree Morton keys):
+points it has never seen are requested straight away, and only the few the
+filter reports as possibly known are looked up in the database. A false
+positive costs one lookup, never a missing point.
+
+The filter is built from the database at startup and saved next to it as
+``<db>.bloom`` on close, together with the database files' fingerprint; it
+is reused only while that fingerprint still matches, so writes by other
+processes in between force a rebuild.
+"""
+
+import logging
+import math
+import os
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from elevation_common import elevation_keys
+from elevation_common.dataset_files import Fingerprint, dataset_fingerprint
+
+logger = logging.getLogger(__name__)
+
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_SECOND_SEED = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(keys: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser: spreads Morton keys (neighbours differ in low bits) over 64 bits"""
+    x = keys.astype(np.uint64)
+    x = (x ^ (x >> np.uint64(30))) * _MIX_1
+    x = (x ^ (x >> np.uint64(27))) * _MIX_2
+    return x ^ (x >> np.uint64(31))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over int64 keys, sized for ``capacity`` keys at ``error_rate``"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.size = max(64, (bits + 63) // 64 * 64)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = np.zeros(self.size // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        # Double hashing: position i is h1 + i * h2, for every hash at once
+        with np.errstate(over="ignore"):
+            h1 = _mix(keys)
+            h2 = _mix(keys.astype(np.uint64) ^ _SECOND_SEED) | np.uint64(1)
+            steps = np.arange(self.hashes, dtype=np.uint64)
+            return (h1[:, None] + steps * h2[:, None]) % np.uint64(self.size)
+
+    def add(self, keys: np.ndarray):
+        keys = np.asarray(keys, dtype=np.int64)
+        if keys.size == 0:
+            return
+        positions = self._positions(keys).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+        self.count += keys.size
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """False where a key is certainly absent; True where it may be present"""
+        keys = np.asarray(keys, dtype=np.int64)
+        if keys.size == 0:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(keys)
+        set_bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return set_bits.all(axis=1)
+
+    @property
+    def full(self) -> bool:
+        return self.count > self.capacity
+
+
+class KnownPoints:
+    """The filter for one elevation database, kept current by its writes"""
+
+    def __init__(self, db_path: str, fingerprint: Fingerprint, error_rate: float = 0.01):
+        self.db_path = db_path
+        self.path = f"{db_path}.bloom"
+        self.fingerprint = fingerprint
+        self.error_rate = error_rate
+        self.filter: Optional[BloomFilter] = None
+        self.checked = 0
+        self.maybe_known = 0
+        self.known = 0
+
+    def load(self, keys: Iterable[np.ndarray], count: int):
+        """Use the saved filter if the database hasn't changed since, else build one from ``keys``"""
+        if self._load_saved():
+            return
+        # Room to grow before the filter has to be rebuilt
+        self.filter = BloomFilter(max(2 * count, 1_000_000), self.error_rate)
+        for chunk in keys:
+            self.filter.add(chunk)
+        logger.info(f"Built known-point filter for {self.db_path}: {self.filter.count:,} points")
+
+    def _load_saved(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as saved:
+                if tuple(map(_fingerprint_entry, saved["fingerprint"])) != self.fingerprint:
+                    return False
+                bloom = BloomFilter(int(saved["capacity"]), float(saved["error_rate"]))
+                bloom.bits = saved["bits"]
+                bloom.count = int(saved["count"])
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Ignoring {self.path}: {e}")
+            return False
+        self.filter = bloom
+        logger.info(f"Loaded known-point filter for {self.db_path}: {bloom.count:,} points")
+        return True
+
+    def add(self, lats, lngs):
+        if self.filter is not None:
+            self.filter.add(elevation_keys.encode(lats, lngs))
+
+    def might_contain(self, lats, lngs) -> np.ndarray:
+        """Boolean mask of the coordinates that may already be stored"""
+        keys = elevation_keys.encode(lats, lngs)
+        maybe = self.filter.contains(keys)
+        self.checked += keys.size
+        self.maybe_known += int(maybe.sum())
+        return maybe
+
+    def save(self, fingerprint: Fingerprint):
+        """Write the filter next to the database, valid for the database files' ``fingerprint``"""
+        if self.filter is None:
+            return
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            bits=self.filter.bits,
+            count=self.filter.count,
+            capacity=self.filter.capacity,
+            error_rate=self.filter.error_rate,
+            fingerprint=np.array([(-1, -1, -1) if entry is None else entry for entry in fingerprint], dtype=np.int64)
+        )
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> Dict:
+        return {
+            "points": 0 if self.filter is None else self.filter.count,
+            "checked": self.checked,
+            "maybe_known": self.maybe_known,
+            "known": self.known,
+            "false_positives": self.maybe_known - self.known
+        }
+
+
+def _fingerprint_entry(row: np.ndarray):
+    return None if row[0] == -1 else tuple(int(value) for value in row)
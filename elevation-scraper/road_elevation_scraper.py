@@ -13,15 +13,32 @@ import json
 import math
 import time
 import logging
+from contextlib import closing
 from dataclasses import dataclass, asdict
-from typing import List, Tuple, Optional, Dict
-import geopy.distance
-from shapely.geometry import LineString, Point
+from typing import TYPE_CHECKING, List, Tuple, Optional, Dict
+import numpy as np
 import overpy
 
+# Geodesy, along-line resampling and profile statistics are shared with the backend's route profiles
+from elevation_common.elevation_profile import profile_statistics, resample_line
+from elevation_common.geodesy import segment_lengths
+from sqlite_writer import SQLiteWriter, read_connection
+
+if TYPE_CHECKING:
+    from elevation_scraper import ElevationDatabase
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Road lengths and sample distances are both measured on the WGS84 ellipsoid,
+# so the last sample sits exactly at the stored length
+DISTANCE_METHOD = "vincenty"
+
+# Roads sampled together: their points are pooled into full API batches, then the profiles saved
+ROADS_PER_PACK = 200
+
+MICRODEGREES = 1_000_000  # node cache coordinates, as in compact elevation storage
+
 @dataclass
 class RoadSegment:
     osm_way_id: int
@@ -31,6 +48,7 @@ class RoadSegment:
     name: Optional[str] = None
     country: Optional[str] = None
     length_meters: float = 0.0
+    node_ids: Optional[List[int]] = None  # OSM node of each coordinate
 
 @dataclass
 class ElevationSample:
@@ -135,7 +153,8 @@ class OSMRoadExtractor:
                     surface=surface,
                     name=name,
                     country=country_code,
-                    length_meters=length
+                    length_meters=length,
+                    node_ids=[node.id for node in way.nodes]
                 )
                 
                 roads.append(road)
@@ -148,25 +167,39 @@ class OSMRoadExtractor:
             return []
     
     def _calculate_road_length(self, coordinates: List[Tuple[float, float]]) -> float:
-        """Calculate total length of road in meters"""
-        total_length = 0.0
-        
-        for i in range(len(coordinates) - 1):
-            point1 = coordinates[i]
-            point2 = coordinates[i + 1]
-            distance = geopy.distance.geodesic(point1, point2).meters
-            total_length += distance
-        
-        return total_length
+        """Calculate total length of road in meters, on the WGS84 ellipsoid"""
+        lats, lngs = zip(*coordinates)
+        return float(segment_lengths(lats, lngs, method=DISTANCE_METHOD).sum())
 
 class RoadElevationScraper:
     """Scrapes elevation data specifically for road networks"""
     
-    def __init__(self, elevation_api_url: str = 'https://api.open-elevation.com/api/v1/lookup'):
+    def __init__(
+        self,
+        elevation_api_url: str = 'https://api.open-elevation.com/api/v1/lookup',
+        points: Optional['ElevationDatabase'] = None,
+        batch_size: int = 100,
+        nodes: Optional['RoadElevationDatabase'] = None,
+        store_samples: bool = False
+    ):
         self.elevation_api = elevation_api_url
         self.session = None
         self.request_count = 0
         self.rate_limit_delay = 1.0  # seconds between requests
+        self.batch_size = batch_size  # points per request
+        # Point store consulted before requesting samples. Fetched samples go
+        # into it only with store_samples: dense road samples would swamp the
+        # grid's elevation_data table
+        self.points = points
+        self.store_samples = store_samples
+        # Node elevation cache, so ways sharing junction nodes fetch them once
+        self.nodes = nodes
+        self.points_skipped = 0
+        self.requests_saved = 0
+        self.points_sampled = 0
+        self.points_requested = 0
+        self.node_hits = 0
+        self.duplicates = 0
         
     async def __aenter__(self):
         self.session = aiohttp.ClientSession()
@@ -175,6 +208,8 @@ class RoadElevationScraper:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
+        if self.points_skipped:
+            logger.info(f"Skipped {self.points_skipped:,} known points, saving {self.requests_saved:,} requests")
     
     async def sample_road_elevation(self, road: RoadSegment, 
                                   sample_interval: int = 20) -> RoadElevationProfile:
@@ -185,72 +220,81 @@ class RoadElevationScraper:
             road: Road segment to sample
             sample_interval: Distance between samples in meters
         """
-        logger.info(f"Sampling elevation for road {road.osm_way_id} ({road.length_meters:.0f}m)")
-        
-        # Generate sampling points along the road
         sample_points = self._generate_sample_points(road, sample_interval)
+        elevation_data = await self._get_elevation_batch(sample_points, self._sample_node_ids(road, sample_points))
+        if None in elevation_data:
+            raise ValueError(f"No elevation for {elevation_data.count(None)} samples of road {road.osm_way_id}")
+        return self._build_profile(road, sample_points, elevation_data)
+    
+    async def sample_roads(self, roads: List[RoadSegment], 
+                           sample_interval: int = 20) -> Tuple[List[RoadElevationProfile], List[RoadSegment]]:
+        """
+        Sample elevation along many roads, packing their points into full requests
         
-        # Get elevation for all sample points
-        elevation_data = await self._get_elevation_batch(sample_points)
+        A 40 m residential stub has 3 samples; requested on its own it would
+        spend a whole rate-limited request on them. The samples of every road
+        are pooled into ``batch_size`` requests and the results scattered
+        back to their roads. Roads whose profile can't be built are logged
+        and left out.
         
-        # Create elevation samples with gradients
-        elevation_samples = []
-        for i, (point, elevation) in enumerate(zip(sample_points, elevation_data)):
-            sample = ElevationSample(
+        A road's samples can span two requests, so a failed request can leave
+        part of a road without elevations. Such roads get no profile: they
+        are returned as pending, for the caller to retry.
+        
+        Returns:
+            (profiles, pending roads)
+        """
+        sample_points = [self._generate_sample_points(road, sample_interval) for road in roads]
+        pooled = [point for points in sample_points for point in points]
+        node_ids = [
+            node_id
+            for road, points in zip(roads, sample_points)
+            for node_id in self._sample_node_ids(road, points)
+        ]
+        logger.info(f"Sampling elevation for {len(roads)} roads ({len(pooled)} points)")
+        elevation_data = await self._get_elevation_batch(pooled, node_ids)
+        
+        profiles = []
+        pending = []
+        offset = 0
+        for road, points in zip(roads, sample_points):
+            road_elevations = elevation_data[offset:offset + len(points)]
+            offset += len(points)
+            if None in road_elevations:
+                pending.append(road)
+                continue
+            try:
+                profiles.append(self._build_profile(road, points, road_elevations))
+            except Exception as e:
+                logger.error(f"Error building profile for road {road.osm_way_id}: {e}")
+        if pending:
+            logger.warning(f"{len(pending)} roads have samples without elevation, left pending")
+        return profiles, pending
+    
+    def _build_profile(self, road: RoadSegment, sample_points: List[Tuple[float, float, float]],
+                       elevation_data: List[float]) -> RoadElevationProfile:
+        """Profile of a road from its sample points and their elevations"""
+        distances = np.array([point[2] for point in sample_points])
+        stats = profile_statistics(distances, np.asarray(elevation_data, dtype=np.float64))
+        
+        # Create elevation samples with gradients (None where the next sample is no further along)
+        elevation_samples = [
+            ElevationSample(
                 lat=point[0],
-                lng=point[1], 
+                lng=point[1],
                 elevation=elevation,
-                distance_along_road=point[2]  # distance from start of road
+                distance_along_road=point[2],  # distance from start of road
+                gradient=None if math.isnan(gradient) else gradient,
+                local_max_gradient=None if math.isnan(local_max) else local_max
             )
-            
-            # Calculate gradient to next point
-            if i < len(elevation_data) - 1:
-                next_elevation = elevation_data[i + 1]
-                next_distance = sample_points[i + 1][2]
-                
-                rise = next_elevation - elevation
-                run = next_distance - sample.distance_along_road
-                
-                if run > 0:
-                    gradient = (rise / run) * 100  # Convert to percentage
-                    sample.gradient = round(gradient, 2)
-                    
-                    # Local max gradient (looking ahead 100m)
-                    local_gradients = []
-                    for j in range(i, min(i + 5, len(elevation_data) - 1)):
-                        if j + 1 < len(elevation_data):
-                            local_rise = elevation_data[j + 1] - elevation_data[j]
-                            local_run = sample_points[j + 1][2] - sample_points[j][2]
-                            if local_run > 0:
-                                local_gradients.append(abs((local_rise / local_run) * 100))
-                    
-                    if local_gradients:
-                        sample.local_max_gradient = round(max(local_gradients), 2)
-            
-            elevation_samples.append(sample)
-        
-        # Calculate profile statistics
-        elevations = [s.elevation for s in elevation_samples]
-        gradients = [s.gradient for s in elevation_samples if s.gradient is not None]
-        
-        min_elevation = min(elevations)
-        max_elevation = max(elevations)
-        
-        # Calculate total ascent/descent
-        total_ascent = 0.0
-        total_descent = 0.0
-        for i in range(len(elevation_samples) - 1):
-            elevation_diff = elevation_samples[i + 1].elevation - elevation_samples[i].elevation
-            if elevation_diff > 0:
-                total_ascent += elevation_diff
-            else:
-                total_descent += abs(elevation_diff)
-        
-        max_gradient = max(gradients) if gradients else 0.0
-        avg_gradient = sum(gradients) / len(gradients) if gradients else 0.0
+            for point, elevation, gradient, local_max in zip(
+                sample_points, elevation_data,
+                np.round(stats.gradients, 2).tolist(), np.round(stats.local_max_gradients, 2).tolist()
+            )
+        ]
         
         # Calculate cycling suitability score
-        cycling_score = self._calculate_cycling_suitability(road, max_gradient, avg_gradient)
+        cycling_score = self._calculate_cycling_suitability(road, stats.max_gradient, stats.avg_gradient)
         
         # Create unique segment ID
         segment_id = f"seg_{road.osm_way_id}_{hash(str(road.coordinates[:2]))}"
@@ -262,49 +306,130 @@ class RoadElevationScraper:
             surface=road.surface or 'unknown',
             length_meters=road.length_meters,
             elevation_samples=elevation_samples,
-            min_elevation=min_elevation,
-            max_elevation=max_elevation,
-            total_ascent=total_ascent,
-            total_descent=total_descent,
-            max_gradient=max_gradient,
-            avg_gradient=avg_gradient,
+            min_elevation=stats.min_elevation,
+            max_elevation=stats.max_elevation,
+            total_ascent=stats.total_ascent,
+            total_descent=stats.total_descent,
+            max_gradient=stats.max_gradient,
+            avg_gradient=stats.avg_gradient,
             cycling_suitability_score=cycling_score
         )
         
         return profile
     
     def _generate_sample_points(self, road: RoadSegment, interval: int) -> List[Tuple[float, float, float]]:
-        """Generate evenly spaced sampling points along road"""
-        points = []
-        
-        # Create LineString from road coordinates
-        line = LineString([(lng, lat) for lat, lng in road.coordinates])
-        
-        # Sample at regular intervals
-        current_distance = 0.0
-        total_length = road.length_meters
-        
-        while current_distance <= total_length:
-            # Get point at current distance along line
-            if current_distance == 0:
-                # Start point
-                lat, lng = road.coordinates[0]
-            elif current_distance >= total_length:
-                # End point
-                lat, lng = road.coordinates[-1]
-            else:
-                # Interpolate point along line
-                fraction = current_distance / total_length
-                point_on_line = line.interpolate(fraction, normalized=True)
-                lng, lat = point_on_line.x, point_on_line.y
-            
-            points.append((lat, lng, current_distance))
-            current_distance += interval
+        """Generate sampling points every ``interval`` metres along road, ending on its last node
+
+        Distances are measured along the road's vertices in metres, so the
+        spacing holds however the way bends or how far north it lies.
+        """
+        lats, lngs = zip(*road.coordinates)
+        sample_lats, sample_lngs, distances = resample_line(lats, lngs, interval, method=DISTANCE_METHOD)
+        
+        # Ways meet at their end nodes: pin the samples to them exactly
+        sample_lats[0], sample_lngs[0] = road.coordinates[0]
+        sample_lats[-1], sample_lngs[-1] = road.coordinates[-1]
         
-        return points
+        return list(zip(sample_lats.tolist(), sample_lngs.tolist(), distances.tolist()))
     
-    async def _get_elevation_batch(self, points: List[Tuple[float, float, float]]) -> List[float]:
-        """Get elevation for a batch of points"""
+    @staticmethod
+    def _sample_node_ids(road: RoadSegment, points: List[Tuple[float, float, float]]) -> List[Optional[int]]:
+        """OSM node of each sample point: the way's first and last, None in between"""
+        node_ids: List[Optional[int]] = [None] * len(points)
+        if road.node_ids:
+            node_ids[0] = road.node_ids[0]
+            if len(points) > 1:
+                node_ids[-1] = road.node_ids[-1]
+        return node_ids
+    
+    def dedup_stats(self, reset: bool = False) -> Dict[str, float]:
+        """Sample points versus points requested since the last reset
+        
+        ``dedup_ratio`` is the fraction of samples that didn't need a request:
+        node cache hits, points already stored, and repeats of a location
+        within a pack (junction nodes, overlapping ways).
+        """
+        stats = {
+            'samples': self.points_sampled,
+            'requested': self.points_requested,
+            'node_hits': self.node_hits,
+            'known_points': self.points_skipped,
+            'duplicates': self.duplicates,
+            'dedup_ratio': 1 - self.points_requested / self.points_sampled if self.points_sampled else 0.0
+        }
+        if reset:
+            self.points_sampled = self.points_requested = self.node_hits = self.points_skipped = self.duplicates = 0
+        return stats
+    
+    async def _get_elevation_batch(
+        self,
+        points: List[Tuple[float, float, float]],
+        node_ids: Optional[List[Optional[int]]] = None
+    ) -> List[Optional[float]]:
+        """Get elevation for points, requesting each location the caches lack once, in ``batch_size`` requests
+        
+        ``node_ids`` gives the OSM node at each point, if any. Locations are
+        compared at microdegree precision; node cache entries count only
+        while the node is still at the cached location. Points no cache or
+        request could answer are None.
+        """
+        node_ids = node_ids or [None] * len(points)
+        keys = [(round(lat * MICRODEGREES), round(lng * MICRODEGREES)) for lat, lng, _ in points]
+        first = {}
+        for i, key in enumerate(keys):
+            first.setdefault(key, i)
+        values: Dict[Tuple[int, int], float] = {}
+        
+        node_keys = {node_id: key for node_id, key in zip(node_ids, keys) if node_id is not None}
+        cached = {}
+        if self.nodes is not None:
+            # Node cache reads flush the writer and query SQLite: keep them off the event loop
+            cached = await asyncio.to_thread(self.nodes.get_node_elevations, node_keys)
+            for node_id, elevation in cached.items():
+                values[node_keys[node_id]] = elevation
+        
+        remaining = [i for key, i in first.items() if key not in values]
+        if self.points is not None and remaining:
+            # The lookup can take a query per point: run it off the event loop
+            known = (await asyncio.to_thread(
+                self.points.known_elevations,
+                [points[i][0] for i in remaining], [points[i][1] for i in remaining]
+            )).tolist()
+            for i, elevation in zip(remaining, known):
+                if not math.isnan(elevation):
+                    values[keys[i]] = elevation
+        missing = [i for i in remaining if keys[i] not in values]
+        
+        self.points_sampled += len(points)
+        self.points_requested += len(missing)
+        self.node_hits += len(first) - len(remaining)
+        self.points_skipped += len(remaining) - len(missing)
+        self.duplicates += len(points) - len(first)
+        self.requests_saved += math.ceil(len(points) / self.batch_size) - math.ceil(len(missing) / self.batch_size)
+        
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            fetched = await self._request_elevations([points[i] for i in chunk])
+            for i, elevation in zip(chunk, fetched):
+                if elevation is not None:
+                    values[keys[i]] = elevation
+        
+        if self.nodes is not None:
+            await asyncio.to_thread(self.nodes.save_node_elevations, {
+                node_id: (key, values[key])
+                for node_id, key in node_keys.items()
+                if node_id not in cached and key in values
+            })
+        
+        return [values.get(key) for key in keys]
+    
+    async def _request_elevations(self, points: List[Tuple[float, float, float]]) -> List[Optional[float]]:
+        """Request one batch of elevations from the API
+        
+        None for points the API had no elevation for, or all of them if the
+        request failed. With ``store_samples`` the elevations found are added
+        to the point store.
+        """
         # Rate limiting
         await asyncio.sleep(self.rate_limit_delay)
         
@@ -320,25 +445,36 @@ class RoadElevationScraper:
                 
                 if response.status == 200:
                     data = await response.json()
+                    results = data.get('results', [])
+                    if len(results) != len(points):
+                        # Results are matched to points by position, across roads
+                        logger.error(f"Elevation API returned {len(results)} results for {len(points)} points")
+                        return [None] * len(points)
                     elevations = []
                     
-                    for result in data.get('results', []):
+                    found = []
+                    
+                    for point, result in zip(points, results):
                         elevation = result.get('elevation')
                         if elevation is not None:
                             elevations.append(float(elevation))
+                            found.append((point[0], point[1], float(elevation)))
                         else:
-                            # Use interpolation or default if no data
-                            elevations.append(0.0)  # Could be smarter here
+                            elevations.append(None)
+                    
+                    if self.points is not None and self.store_samples and found:
+                        lats, lngs, values = zip(*found)
+                        self.points.add_elevation_arrays(lats, lngs, values, source='open_elevation', accuracy='medium')
                     
                     self.request_count += 1
                     return elevations
                 else:
                     logger.error(f"Elevation API error: {response.status}")
-                    return [0.0] * len(points)  # Return defaults
+                    return [None] * len(points)
                     
         except Exception as e:
             logger.error(f"Error getting elevation data: {e}")
-            return [0.0] * len(points)
+            return [None] * len(points)
     
     def _calculate_cycling_suitability(self, road: RoadSegment, max_gradient: float, avg_gradient: float) -> float:
         """Calculate cycling suitability score (0-100)"""
@@ -391,58 +527,102 @@ class RoadElevationScraper:
         return max(0.0, min(100.0, score))
 
 class RoadElevationDatabase:
-    """Manages storage of road elevation data"""
+    """Manages storage of road elevation data
+
+    Profiles are queued on a SQLiteWriter and committed in batches; ``close()``
+    commits whatever is still queued.
+    """
     
     def __init__(self, db_path: str = "road_elevation.db"):
         self.db_path = db_path
+        self.writer = SQLiteWriter(db_path)
         self.setup_database()
     
+    def close(self):
+        self.writer.close()
+    
     def setup_database(self):
         """Create database schema for road elevation data"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS road_elevation_profiles (
-                    segment_id TEXT PRIMARY KEY,
-                    osm_way_id INTEGER,
-                    road_type TEXT,
-                    surface TEXT,
-                    length_meters REAL,
-                    min_elevation REAL,
-                    max_elevation REAL,
-                    total_ascent REAL,
-                    total_descent REAL,
-                    max_gradient REAL,
-                    avg_gradient REAL,
-                    cycling_suitability_score REAL,
-                    elevation_samples TEXT,  -- JSON array of elevation samples
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_osm_way_id 
-                ON road_elevation_profiles (osm_way_id)
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_road_type 
-                ON road_elevation_profiles (road_type)
-            """)
-            
+        self.writer.execute(self._create_tables)
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS road_elevation_profiles (
+                segment_id TEXT PRIMARY KEY,
+                osm_way_id INTEGER,
+                road_type TEXT,
+                surface TEXT,
+                length_meters REAL,
+                min_elevation REAL,
+                max_elevation REAL,
+                total_ascent REAL,
+                total_descent REAL,
+                max_gradient REAL,
+                avg_gradient REAL,
+                cycling_suitability_score REAL,
+                elevation_samples TEXT,  -- JSON array of elevation samples
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_osm_way_id 
+            ON road_elevation_profiles (osm_way_id)
+        """)
+        
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_road_type 
+            ON road_elevation_profiles (road_type)
+        """)
+        
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_gradient 
+            ON road_elevation_profiles (max_gradient)
+        """)
+        
+        # R*Tree over profile bounding boxes, for snapping points to nearby roads
+        has_rtree = conn.execute("""
+            SELECT 1 FROM sqlite_master WHERE name = 'road_profile_rtree'
+        """).fetchone()
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS road_profile_rtree USING rtree(
+                id, min_lat, max_lat, min_lng, max_lng
+            )
+        """)
+        if not has_rtree:
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_gradient 
-                ON road_elevation_profiles (max_gradient)
+                INSERT INTO road_profile_rtree (id, min_lat, max_lat, min_lng, max_lng)
+                SELECT p.rowid,
+                    MIN(json_extract(s.value, '$.lat')), MAX(json_extract(s.value, '$.lat')),
+                    MIN(json_extract(s.value, '$.lng')), MAX(json_extract(s.value, '$.lng'))
+                FROM road_elevation_profiles p, json_each(p.elevation_samples) s
+                GROUP BY p.rowid
             """)
-            
-            conn.commit()
+        
+        # Elevations of OSM nodes, shared by every way through them
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS node_elevations (
+                node_id INTEGER PRIMARY KEY,
+                lat_e6 INTEGER NOT NULL,  -- microdegrees, to notice moved nodes
+                lng_e6 INTEGER NOT NULL,
+                elevation REAL NOT NULL,
+                updated_at INTEGER
+            )
+        """)
     
     def save_road_profile(self, profile: RoadElevationProfile):
-        """Save road elevation profile to database"""
-        with sqlite3.connect(self.db_path) as conn:
-            # Convert elevation samples to JSON
-            samples_json = json.dumps([asdict(sample) for sample in profile.elevation_samples])
-            
+        """Save road elevation profile to database (queued, committed with the next flush)"""
+        # Convert elevation samples to JSON
+        samples_json = json.dumps([asdict(sample) for sample in profile.elevation_samples])
+        
+        def write(conn: sqlite3.Connection):
+            # REPLACE gives the row a new rowid, so drop the old profile's box first
             conn.execute("""
+                DELETE FROM road_profile_rtree WHERE id IN (
+                    SELECT rowid FROM road_elevation_profiles WHERE segment_id = ?
+                )
+            """, (profile.segment_id,))
+            cursor = conn.execute("""
                 INSERT OR REPLACE INTO road_elevation_profiles 
                 (segment_id, osm_way_id, road_type, surface, length_meters,
                  min_elevation, max_elevation, total_ascent, total_descent,
@@ -463,11 +643,46 @@ class RoadElevationDatabase:
                 profile.cycling_suitability_score,
                 samples_json
             ))
-            conn.commit()
+            
+            if profile.elevation_samples:
+                lats = [sample.lat for sample in profile.elevation_samples]
+                lngs = [sample.lng for sample in profile.elevation_samples]
+                conn.execute("""
+                    INSERT INTO road_profile_rtree (id, min_lat, max_lat, min_lng, max_lng)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (cursor.lastrowid, min(lats), max(lats), min(lngs), max(lngs)))
+        
+        self.writer.submit(write, rows=len(profile.elevation_samples))
+    
+    def get_node_elevations(self, nodes: Dict[int, Tuple[int, int]]) -> Dict[int, float]:
+        """Cached elevations of nodes given as {node_id: (lat_e6, lng_e6)}, for nodes still at that location"""
+        if not nodes:
+            return {}
+        self.writer.flush()
+        with closing(read_connection(self.db_path)) as conn:
+            rows = conn.execute("""
+                SELECT node_id, lat_e6, lng_e6, elevation FROM node_elevations
+                WHERE node_id IN (SELECT value FROM json_each(?))
+            """, (json.dumps(list(nodes)),)).fetchall()
+        return {node_id: elevation for node_id, lat_e6, lng_e6, elevation in rows if nodes[node_id] == (lat_e6, lng_e6)}
+    
+    def save_node_elevations(self, nodes: Dict[int, Tuple[Tuple[int, int], float]]):
+        """Cache {node_id: ((lat_e6, lng_e6), elevation)} (queued, committed with the next flush)"""
+        if not nodes:
+            return
+        now = int(time.time())
+        self.writer.submit(lambda conn: conn.executemany("""
+            INSERT OR REPLACE INTO node_elevations (node_id, lat_e6, lng_e6, elevation, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [
+            (node_id, lat_e6, lng_e6, elevation, now)
+            for node_id, ((lat_e6, lng_e6), elevation) in nodes.items()
+        ]), rows=len(nodes))
     
     def get_stats(self) -> Dict:
         """Get database statistics"""
-        with sqlite3.connect(self.db_path) as conn:
+        self.writer.flush()
+        with closing(read_connection(self.db_path)) as conn:
             cursor = conn.execute("SELECT COUNT(*) FROM road_elevation_profiles")
             total_segments = cursor.fetchone()[0]
             
@@ -518,8 +733,11 @@ async def main():
     # Initialize components
     osm_extractor = OSMRoadExtractor()
     db = RoadElevationDatabase()
+    # Samples the grid database already holds are reused rather than requested
+    from elevation_scraper import ElevationDatabase
+    points = ElevationDatabase("elevation.db")
     
-    async with RoadElevationScraper() as scraper:
+    async with RoadElevationScraper(points=points, nodes=db) as scraper:
         for region in CYCLING_REGIONS:
             logger.info(f"Processing region: {region['name']}")
             
@@ -531,30 +749,49 @@ async def main():
             
             logger.info(f"Found {len(roads)} roads in {region['name']}")
             
-            # Process each road
-            for i, road in enumerate(roads):
+            # Process the roads in packs; the scraper paces its requests itself
+            pending = []
+            for start in range(0, len(roads), ROADS_PER_PACK):
+                pack = roads[start:start + ROADS_PER_PACK]
                 try:
-                    # Sample elevation along road
-                    profile = await scraper.sample_road_elevation(road)
-                    
-                    # Save to database
+                    profiles, failed = await scraper.sample_roads(pack)
+                except Exception as e:
+                    logger.error(f"Error processing roads {start + 1}-{start + len(pack)}: {e}")
+                    continue
+                pending.extend(failed)
+                
+                # Save to database
+                for profile in profiles:
                     db.save_road_profile(profile)
-                    
-                    logger.info(f"Processed road {i+1}/{len(roads)}: {road.osm_way_id} "
-                              f"({profile.max_gradient:.1f}% max gradient)")
-                    
-                    # Small delay to be nice to APIs
-                    await asyncio.sleep(0.5)
-                    
+                
+                logger.info(f"Processed roads {start + len(pack)}/{len(roads)} "
+                          f"({scraper.request_count} elevation requests so far)")
+            
+            # Roads with samples lost to failed requests get one more pass; the
+            # rest are sampled again by the next run
+            for start in range(0, len(pending), ROADS_PER_PACK):
+                try:
+                    profiles, failed = await scraper.sample_roads(pending[start:start + ROADS_PER_PACK])
                 except Exception as e:
-                    logger.error(f"Error processing road {road.osm_way_id}: {e}")
+                    logger.error(f"Error retrying pending roads: {e}")
                     continue
+                for profile in profiles:
+                    db.save_road_profile(profile)
+                if failed:
+                    logger.warning(f"{len(failed)} roads still without complete elevations, left for the next run")
             
             # Show progress
             stats = db.get_stats()
+            dedup = scraper.dedup_stats(reset=True)
             logger.info(f"Region {region['name']} complete! "
                        f"Total: {stats['total_segments']} segments, "
                        f"{stats['total_length_km']:.1f}km of roads")
+            logger.info(f"Region {region['name']}: {dedup['samples']} samples, {dedup['requested']} requested "
+                       f"(dedup ratio {dedup['dedup_ratio']:.1%}: {dedup['node_hits']} cached nodes, "
+                       f"{dedup['known_points']} known points, {dedup['duplicates']} repeats)")
+    
+    db.close()
+    points.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -6,8 +6,9 @@ Run this first to initialize the system and start scraping priority regions.
 """
 
 import asyncio
-import sqlite3
+from contextlib import closing
 from elevation_scraper import ElevationDatabase, GridGenerator
+from sqlite_writer import read_connection
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -24,8 +25,9 @@ def setup_database():
     logger.info("Generating priority grid for cycling regions...")
     GridGenerator.generate_world_grid(db, grid_size=0.01)
     
-    # Show statistics
-    with sqlite3.connect(db.db_path) as conn:
+    # Show statistics (read-only: the grid was written through the database's writer)
+    db.close()
+    with closing(read_connection(db.db_path)) as conn:
         cursor = conn.execute("SELECT COUNT(*) FROM scrape_progress WHERE priority = 1")
         priority1_count = cursor.fetchone()[0]
         
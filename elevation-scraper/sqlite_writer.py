@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Single-writer access to the scrapers' SQLite databases.
+
+Opening a connection and committing for every batch of points makes each
+write pay for connection setup, schema parsing and a journal sync. Instead
+each database gets one SQLiteWriter: a persistent connection in WAL mode
+that queues writes in memory and applies the queue in one transaction once
+it holds ``max_rows`` rows or its oldest write is ``max_delay`` seconds old.
+
+    writer = SQLiteWriter("elevation.db")
+    writer.submit(lambda conn: conn.executemany(UPSERT, rows), rows=len(rows))
+    writer.flush()   # before reading back what was just written
+
+Every transaction runs on the writer's own thread, so ``submit`` only
+appends to the queue: it never waits for a commit, or for another process
+holding the database's write lock, and is safe to call from an event loop.
+``flush`` and ``execute`` do wait, and belong on worker threads.
+
+Reads go through separate read-only connections (``read_connection``); WAL
+lets them run while the writer commits. Queued writes are not visible to
+readers until flushed.
+"""
+
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, NamedTuple, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# synchronous=NORMAL in WAL mode only syncs at checkpoints; a crash can lose
+# the last commits but never corrupts the database
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",  # 64 MiB
+    "PRAGMA busy_timeout = 10000",
+)
+
+Write = Callable[[sqlite3.Connection], None]
+
+
+def read_connection(db_path: str) -> sqlite3.Connection:
+    """Read-only connection that doesn't block, or get blocked by, the writer"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout = 10000")
+    return conn
+
+
+def _is_busy(error: Exception) -> bool:
+    """Whether a write failed on another connection's lock, which clears by itself"""
+    return isinstance(error, sqlite3.OperationalError) and "locked" in str(error)
+
+
+class _Write(NamedTuple):
+    write: Callable[[sqlite3.Connection], object]
+    rows: int
+    seq: int
+    # Set for execute(): the write gets a transaction of its own and its outcome goes here
+    result: Optional[Future]
+
+
+class SQLiteWriter:
+    """Persistent WAL connection applying queued writes in batched transactions
+
+    Safe to use from several threads; writes are applied in submission order.
+    A transaction that fails because another process holds the database lock
+    is retried until it commits. Any other failure drops just the write that
+    caused it.
+    """
+
+    def __init__(self, db_path: str, max_rows: int = 50_000, max_delay: float = 1.0, busy_retry_delay: float = 0.5):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.busy_retry_delay = busy_retry_delay
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        for pragma in WRITER_PRAGMAS:
+            self._conn.execute(pragma)
+        # Guards the queue and counters only; transactions run outside it
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._queue: List[_Write] = []
+        self._queued_rows = 0
+        self._oldest = 0.0
+        self._submitted = 0  # sequence number of the last queued write
+        self._done = 0  # ... of the last write committed or dropped
+        self._flush_to = 0  # ... of the last write a flush() waits for
+        self._closing = False
+        self.transactions = 0
+        self.writes = 0
+        self.rows = 0
+        self.failed = 0
+        self.busy_retries = 0
+        self._thread = threading.Thread(target=self._run, name=f"sqlite-writer {db_path}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, write: Write, rows: int = 1):
+        """Queue ``write(conn)``; it runs inside a transaction shared with other queued writes
+
+        ``rows`` is the write's size, counted towards ``max_rows``: a full
+        queue is committed straight away instead of after ``max_delay``.
+        Returns without waiting for the commit.
+        """
+        with self._lock:
+            self._enqueue(write, rows)
+
+    def execute(self, write: Callable[[sqlite3.Connection], T]) -> T:
+        """Run ``write(conn)`` in a transaction of its own after every write queued before it
+
+        Waits for the commit and returns the write's result, or raises its error.
+        """
+        self._check_thread()
+        result: Future = Future()
+        with self._lock:
+            self._enqueue(write, 0, result)
+        return result.result()
+
+    def flush(self):
+        """Wait until every write queued so far is committed (or dropped)"""
+        self._check_thread()
+        with self._lock:
+            target = self._submitted
+            self._flush_to = max(self._flush_to, target)
+            self._changed.notify_all()
+            while self._done < target:
+                self._changed.wait()
+
+    def close(self):
+        """Commit queued writes and close the connection; further writes raise"""
+        self._check_thread()
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+            self._changed.notify_all()
+        self._thread.join()
+        self._conn.close()
+        atexit.unregister(self.close)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "queued_writes": len(self._queue),
+                "queued_rows": self._queued_rows,
+                "transactions": self.transactions,
+                "writes": self.writes,
+                "rows": self.rows,
+                "failed": self.failed,
+                "busy_retries": self.busy_retries
+            }
+
+    def _check_thread(self):
+        if threading.current_thread() is self._thread:
+            raise RuntimeError(f"{self.db_path}: a queued write can't wait for the writer it runs on")
+
+    def _enqueue(self, write: Callable[[sqlite3.Connection], object], rows: int, result: Optional[Future] = None):
+        if self._closing:
+            raise sqlite3.ProgrammingError(f"{self.db_path}: writer is closed")
+        if not self._queue:
+            self._oldest = time.monotonic()
+        self._submitted += 1
+        self._queue.append(_Write(write, rows, self._submitted, result))
+        self._queued_rows += rows
+        self._changed.notify_all()
+
+    def _run(self):
+        """Writer thread: commit batches as they fall due, until closed and drained"""
+        while True:
+            with self._lock:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+            finished = self._commit(batch)
+            with self._lock:
+                if finished < len(batch):
+                    # Locked by another process: put the rest back in front and retry
+                    rest = batch[finished:]
+                    self._queue[:0] = rest
+                    self._queued_rows += sum(item.rows for item in rest)
+                if finished:
+                    self._done = batch[finished - 1].seq
+                self._changed.notify_all()
+            if finished < len(batch):
+                time.sleep(self.busy_retry_delay)
+
+    def _next_batch(self) -> Optional[List[_Write]]:
+        """Wait for writes that are due and take them off the queue; None once closed and empty"""
+        while True:
+            if self._queue:
+                head = self._queue[0]
+                due = self._oldest + self.max_delay - time.monotonic()
+                # Callers blocked in flush() or execute() don't wait for max_delay
+                waited_on = self._flush_to >= head.seq or any(item.result is not None for item in self._queue)
+                if self._closing or waited_on or due <= 0 or self._queued_rows >= self.max_rows:
+                    break
+                self._changed.wait(due)
+            elif self._closing:
+                return None
+            else:
+                self._changed.wait()
+
+        # An execute() write runs alone; queued writes batch up to the next one
+        if head.result is not None:
+            count = 1
+        else:
+            count = next((i for i, item in enumerate(self._queue) if item.result is not None), len(self._queue))
+        batch, self._queue = self._queue[:count], self._queue[count:]
+        self._queued_rows -= sum(item.rows for item in batch)
+        return batch
+
+    def _commit(self, batch: List[_Write]) -> int:
+        """Apply a batch, returning how many of its writes finished before a lock stopped it"""
+        if batch[0].result is not None:
+            return self._execute(batch[0])
+        try:
+            self._apply(batch)
+            return len(batch)
+        except Exception as e:
+            if _is_busy(e):
+                self._busy(e)
+                return 0
+            # Find the write that failed by retrying each on its own, so one
+            # bad write doesn't lose everything queued with it
+            logger.warning(f"{self.db_path}: batched commit failed ({e!r}), retrying writes one by one")
+        for i, item in enumerate(batch):
+            try:
+                self._apply([item])
+            except Exception as e:
+                if _is_busy(e):
+                    self._busy(e)
+                    return i
+                with self._lock:
+                    self.failed += 1
+                logger.error(f"{self.db_path}: dropped a write of {item.rows} rows: {e!r}")
+        return len(batch)
+
+    def _execute(self, item: _Write) -> int:
+        try:
+            result = self._apply([item])
+        except Exception as e:
+            if _is_busy(e):
+                self._busy(e)
+                return 0
+            item.result.set_exception(e)
+            return 1
+        item.result.set_result(result)
+        return 1
+
+    def _apply(self, writes: List[_Write]):
+        """Run writes in one transaction; returns the last one's result"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for item in writes:
+                result = item.write(self._conn)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self.transactions += 1
+            self.writes += len(writes)
+            self.rows += sum(item.rows for item in writes)
+        return result
+
+    def _busy(self, error: Exception):
+        with self._lock:
+            self.busy_retries += 1
+        logger.warning(f"{self.db_path}: database locked by another connection ({error}), retrying")
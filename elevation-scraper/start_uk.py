@@ -24,7 +24,7 @@ logger = logging.getLogger(__name__)
 
 def check_dependencies():
     """Check if all required packages are installed"""
-    required_packages = ['overpy', 'geopy', 'shapely', 'aiohttp']
+    required_packages = ['overpy', 'numpy', 'aiohttp']
     missing = []
     
     for package in required_packages:
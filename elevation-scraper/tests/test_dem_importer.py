@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+from dem_importer import DemError, SRTM_VOID, decode_chunk, import_dems, open_dem, open_hgt
+from elevation_scraper import ElevationDatabase, GridCell
+from sqlite_writer import read_connection
+
+# 5 x 5 samples, 0.25° apart: elevation 100 * row + col, one void
+TILE = (100 * np.arange(5)[:, None] + np.arange(5)[None, :]).astype(">i2")
+TILE[1, 2] = SRTM_VOID
+
+# GeoTIFF tags and GeoKeys
+MODEL_PIXEL_SCALE = 33550
+MODEL_TIEPOINT = 33922
+GEO_KEY_DIRECTORY = 34735
+GDAL_NODATA = 42113
+
+
+@pytest.fixture
+def hgt_path(tmp_path):
+    """Synthetic SRTM tile covering 51-52°N, 1°W-0°."""
+    path = tmp_path / "N51W001.hgt"
+    path.write_bytes(TILE.tobytes())
+    return str(path)
+
+
+def write_geotiff(path, data, nodata=None, epsg=4326):
+    """Single-band GeoTIFF with pixel-is-area georeferencing: top-left corner at 52°N 1°W, 0.25° pixels."""
+    tifffile = pytest.importorskip("tifffile")
+    geo_keys = [1, 1, 0, 3, 1024, 0, 1, 2, 1025, 0, 1, 1, 2048, 0, 1, epsg]
+    extratags = [
+        (MODEL_PIXEL_SCALE, 'd', 3, (0.25, 0.25, 0.0), False),
+        (MODEL_TIEPOINT, 'd', 6, (0.0, 0.0, 0.0, -1.0, 52.0, 0.0), False),
+        (GEO_KEY_DIRECTORY, 'H', len(geo_keys), geo_keys, False)
+    ]
+    if nodata is not None:
+        extratags.append((GDAL_NODATA, 's', 0, f"{nodata}", False))
+    tifffile.imwrite(path, data, extratags=extratags)
+    return str(path)
+
+
+class TestHgt:
+    def test_open(self, hgt_path):
+        """Test the tile's corner and spacing come from its name and size."""
+        raster = open_hgt(hgt_path)
+        assert (raster.rows, raster.cols) == (5, 5)
+        assert raster.lat_step == raster.lng_step == 0.25
+        assert raster.bounds == (51.0, 52.0, -1.0, 0.0)
+        assert raster.nodata == SRTM_VOID
+
+    def test_bad_tiles(self, tmp_path):
+        """Test tiles with a wrong name or size are rejected."""
+        misnamed = tmp_path / "tile.hgt"
+        misnamed.write_bytes(TILE.tobytes())
+        with pytest.raises(DemError):
+            open_hgt(str(misnamed))
+
+        truncated = tmp_path / "N51W001.hgt"
+        truncated.write_bytes(TILE.tobytes()[:-2])
+        with pytest.raises(DemError):
+            open_hgt(str(truncated))
+
+        with pytest.raises(DemError):
+            open_dem(str(tmp_path / "N51W001.asc"))
+
+    def test_decode_skips_voids(self, hgt_path):
+        """Test samples decode to their coordinates, leaving out voids."""
+        lats, lngs, elevations = decode_chunk(open_hgt(hgt_path), 0, 5)
+        assert lats.size == 24
+        assert SRTM_VOID not in elevations
+        samples = {(lat, lng): elevation for lat, lng, elevation in zip(lats, lngs, elevations)}
+        assert samples[(52.0, -1.0)] == 0
+        assert samples[(51.0, 0.0)] == 404
+        assert samples[(51.75, -0.75)] == 101
+        assert (51.75, -0.5) not in samples
+
+    def test_stride_and_bbox(self, hgt_path):
+        """Test striding keeps every other row and column of the whole tile, and bbox clips it."""
+        raster = open_hgt(hgt_path)
+        lats, lngs, _ = decode_chunk(raster, 0, 5, stride=2)
+        assert sorted(set(lats)) == [51.0, 51.5, 52.0]
+        assert sorted(set(lngs)) == [-1.0, -0.5, 0.0]
+
+        # A chunk starting between kept rows begins at the next one
+        lats, _, _ = decode_chunk(raster, 1, 5, stride=2)
+        assert sorted(set(lats)) == [51.0, 51.5]
+
+        lats, lngs, _ = decode_chunk(raster, 0, 5, bbox=(51.2, 51.6, -0.3, 0.0))
+        assert sorted(set(lats)) == [51.25, 51.5]
+        assert sorted(set(lngs)) == [-0.25, 0.0]
+
+    def test_import(self, hgt_path, tmp_path):
+        """Test importing writes every valid sample and completes the grid cells the tile covers."""
+        db = ElevationDatabase(str(tmp_path / "elevation.db"))
+        try:
+            db.add_subdivisions([
+                GridCell(51.0, 51.5, -1.0, -0.5, 1, "inside"),
+                GridCell(51.5, 52.5, -1.0, -0.5, 1, "overlapping")
+            ])
+            assert import_dems(db, [hgt_path], workers=1) == 24
+
+            elevations = db.known_elevations([52.0, 51.0, 51.75], [-1.0, 0.0, -0.5])
+            assert elevations[:2].tolist() == [0.0, 404.0]
+            assert np.isnan(elevations[2])
+
+            conn = read_connection(db.db_path)
+            statuses = dict(conn.execute("SELECT grid_id, status FROM scrape_progress"))
+            conn.close()
+            assert statuses == {"inside": "completed", "overlapping": "pending"}
+        finally:
+            db.close()
+
+
+class TestGeoTiff:
+    def test_open_and_decode(self, tmp_path):
+        """Test pixel-is-area rasters are sampled at pixel centres, leaving out nodata and NaN."""
+        data = TILE.astype(np.float32)
+        data[1, 2] = -9999
+        data[3, 3] = np.nan
+        path = write_geotiff(tmp_path / "dem.tif", data, nodata=-9999)
+
+        raster = open_dem(path)
+        assert raster.kind == "tiff"
+        assert raster.north == 51.875
+        assert raster.west == -0.875
+        assert raster.nodata == -9999
+
+        lats, lngs, elevations = decode_chunk(raster, 0, raster.rows)
+        assert lats.size == 23
+        samples = {(lat, lng): elevation for lat, lng, elevation in zip(lats, lngs, elevations)}
+        assert samples[(51.875, -0.875)] == 0
+        assert samples[(51.625, -0.625)] == 101
+        assert (51.625, -0.375) not in samples
+        assert (51.125, -0.125) not in samples
+
+    def test_projected_raster_rejected(self, tmp_path):
+        """Test rasters in another coordinate system must be reprojected first."""
+        path = write_geotiff(tmp_path / "utm.tif", TILE.astype(np.int16), epsg=32630)
+        with pytest.raises(DemError, match="EPSG:4326"):
+            open_dem(path)
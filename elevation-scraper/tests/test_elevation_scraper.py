@@ -0,0 +1,321 @@
+import asyncio
+import numpy as np
+import pytest
+import threading
+import time
+from elevation_scraper import (
+    ADAPTIVE_MAX_DEPTH,
+    ElevationDatabase,
+    ElevationPoint,
+    ElevationScraper,
+    GridCell,
+    MAX_ATTEMPTS,
+    RETRY_BACKOFF_SECONDS,
+    ScrapeScheduler,
+    TokenBucket,
+    refinement_error
+)
+from known_points import KnownPoints
+from sqlite_writer import read_connection
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Elevation database in a temp directory."""
+    db = ElevationDatabase(str(tmp_path / "elevation.db"))
+    yield db
+    db.close()
+
+
+def queue_cells(db, *grid_ids, priority=1):
+    db.add_subdivisions([
+        GridCell(50.0 + i, 51.0 + i, 0.0, 1.0, priority, grid_id)
+        for i, grid_id in enumerate(grid_ids)
+    ])
+
+
+def progress(db, grid_id):
+    """The cell's scrape_progress row, as committed."""
+    db.flush()
+    conn = read_connection(db.db_path)
+    try:
+        row = conn.execute("""
+            SELECT status, worker_id, lease_expires, retry_after, error_count
+            FROM scrape_progress WHERE grid_id = ?
+        """, (grid_id,)).fetchone()
+    finally:
+        conn.close()
+    return dict(zip(("status", "worker_id", "lease_expires", "retry_after", "error_count"), row))
+
+
+class TestGridLeases:
+    def test_claim_leases_highest_priority_cells(self, db):
+        """Test cells are claimed in priority order and never by two workers."""
+        queue_cells(db, "low", priority=5)
+        queue_cells(db, "high", priority=1)
+
+        claimed = db.claim_grids("a", lease_seconds=300)
+        assert [grid.grid_id for grid in claimed] == ["high"]
+        assert [grid.grid_id for grid in db.claim_grids("b", limit=5)] == ["low"]
+        assert db.claim_grids("c") == []
+
+        row = progress(db, "high")
+        assert row["status"] == "in_progress"
+        assert row["worker_id"] == "a"
+        assert row["lease_expires"] >= int(time.time()) + 299
+
+    def test_expired_lease_is_requeued(self, db):
+        """Test a cell whose lease ran out is claimed again, counting a failed attempt."""
+        queue_cells(db, "cell")
+        assert db.claim_grids("a", lease_seconds=-1)
+
+        claimed = db.claim_grids("b")
+        assert [grid.grid_id for grid in claimed] == ["cell"]
+        row = progress(db, "cell")
+        assert row["worker_id"] == "b"
+        assert row["error_count"] == 1
+
+    def test_heartbeat_extends_held_leases_only(self, db):
+        """Test the heartbeat extends the worker's own leases and reports the ones it lost."""
+        queue_cells(db, "mine", "theirs")
+        db.claim_grids("a", lease_seconds=10)
+        db.claim_grids("b", lease_seconds=10)
+
+        assert db.heartbeat("a", ["mine", "theirs"], lease_seconds=1000) == ["mine"]
+        assert progress(db, "mine")["lease_expires"] >= int(time.time()) + 999
+        assert progress(db, "theirs")["lease_expires"] <= int(time.time()) + 10
+        assert db.heartbeat("a", []) == []
+
+    def test_lost_lease_cannot_complete(self, db):
+        """Test a worker whose lease was taken over can't mark the cell completed."""
+        queue_cells(db, "cell")
+        db.claim_grids("a", lease_seconds=-1)
+        db.claim_grids("b")
+
+        db.mark_grid_completed("cell", "a")
+        db.mark_grid_failed("cell", "a")
+        row = progress(db, "cell")
+        assert row["status"] == "in_progress"
+        assert row["worker_id"] == "b"
+        assert row["error_count"] == 1
+
+        db.mark_grid_completed("cell", "b")
+        row = progress(db, "cell")
+        assert row["status"] == "completed"
+        assert row["worker_id"] is None
+
+    def test_failure_backoff(self, db):
+        """Test failed cells wait an exponential backoff and give up after MAX_ATTEMPTS."""
+        queue_cells(db, "cell")
+        for attempt in range(MAX_ATTEMPTS):
+            assert [grid.grid_id for grid in db.claim_grids("a")] == ["cell"]
+            started = int(time.time())
+            db.mark_grid_failed("cell", "a")
+            row = progress(db, "cell")
+            assert row["error_count"] == attempt + 1
+            if attempt + 1 < MAX_ATTEMPTS:
+                assert row["status"] == "pending"
+                backoff = row["retry_after"] - started
+                assert RETRY_BACKOFF_SECONDS * 2 ** attempt <= backoff <= RETRY_BACKOFF_SECONDS * 2 ** attempt + 1
+                assert db.claim_grids("a") == []
+                # Skip the wait
+                db.writer.execute(lambda conn: conn.execute("UPDATE scrape_progress SET retry_after = 0"))
+
+        assert progress(db, "cell")["status"] == "failed"
+        assert db.claim_grids("a") == []
+
+    def test_release_returns_cells_without_an_attempt(self, db):
+        """Test release_grids puts leased cells back in the queue on a clean shutdown."""
+        queue_cells(db, "cell")
+        db.claim_grids("a")
+        assert db.release_grids("a") == 1
+        row = progress(db, "cell")
+        assert row["status"] == "pending"
+        assert row["error_count"] == 0
+        assert [grid.grid_id for grid in db.claim_grids("b")] == ["cell"]
+
+
+class TestKnownPoints:
+    def test_added_points_are_known(self, db):
+        """Test points written after the filter is loaded are looked up, not requested again."""
+        lats = np.array([50.1, 50.2])
+        lngs = np.array([0.1, 0.2])
+        assert np.isnan(db.known_elevations(lats, lngs)).all()
+
+        db.add_elevation_arrays(lats, lngs, np.array([12.0, 34.0]), "test", "high")
+        assert db.known_elevations(lats, lngs).tolist() == [12.0, 34.0]
+
+    def test_add_waits_for_filter_swap(self, db):
+        """Test points added while the filter is being rebuilt go into the new filter."""
+        db.known_points()
+        rebuilt = KnownPoints(db.db_path, ())
+        rebuilt.load(iter(()), 0)
+
+        with db._lookup_lock:
+            adding = threading.Thread(
+                target=db.add_elevation_arrays,
+                args=(np.array([50.3]), np.array([0.3]), np.array([56.0]), "test", "high")
+            )
+            adding.start()
+            adding.join(0.1)
+            assert adding.is_alive()
+            db._known = rebuilt
+        adding.join()
+        assert rebuilt.might_contain(np.array([50.3]), np.array([0.3])).all()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Stands in for time.monotonic, so token buckets refill only when the test advances it."""
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+class TestTokenBucket:
+    def test_burst_capacity(self, clock):
+        """Test a full bucket lets burst requests out at once and spaces the rest."""
+        bucket = TokenBucket(rate=2, burst=3)
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == pytest.approx(1.0)
+
+    def test_refill_rate(self, clock):
+        """Test tokens come back at rate per second, up to burst."""
+        bucket = TokenBucket(rate=4, burst=2)
+        bucket.reserve()
+        bucket.reserve()
+        assert bucket.delay() == pytest.approx(0.25)
+
+        clock.now += 0.25
+        assert bucket.delay() == 0
+        assert bucket.tokens == pytest.approx(1)
+
+        clock.now += 60
+        assert bucket.delay() == 0
+        assert bucket.tokens == pytest.approx(2)
+
+    def test_pause(self, clock):
+        """Test a pause holds back the next request, e.g. for a Retry-After."""
+        bucket = TokenBucket(rate=1)
+        bucket.pause(5)
+        assert bucket.reserve() == pytest.approx(5)
+        assert bucket.delay() == pytest.approx(6)
+
+
+class TestScrapeScheduler:
+    RATE = 20
+
+    def test_requests_spread_over_apis(self, db, monkeypatch):
+        """Test concurrent workers share every API's quota without exceeding its rate."""
+        apis = [
+            {'name': name, 'url': '', 'method': 'GET', 'rate_limit': self.RATE, 'batch_size': 10, 'accuracy': 'medium'}
+            for name in ('first', 'second')
+        ]
+        scraper = ElevationScraper(db, apis=apis)
+        requests = []
+
+        async def scrape_with_api(coordinates, api):
+            requests.append((api['name'], time.monotonic()))
+            return [
+                ElevationPoint(lat, lng, 100.0, api['name'], api['accuracy'], 0)
+                for lat, lng in coordinates
+            ]
+
+        monkeypatch.setattr(scraper, "_scrape_with_api", scrape_with_api)
+        db.add_subdivisions([GridCell(50.0, 50.1, i / 5, i / 5 + 0.1, 3, f"cell{i}") for i in range(4)])
+
+        scheduler = ScrapeScheduler(db, scraper, workers=3, worker_id="test")
+        asyncio.run(scheduler.run(until_empty=True))
+
+        assert scheduler.completed == 4
+        # 6 x 6 lattices in batches of 10: 4 requests per cell
+        assert len(requests) == 16
+        for name in ('first', 'second'):
+            times = [at for api, at in requests if api == name]
+            assert len(times) == 8
+            gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+            assert min(gaps) >= 0.9 / self.RATE
+
+
+def curved_terrain(curvature):
+    """Fake API returning curvature * (lat - 50)² metres, from one source."""
+    async def scrape_with_api(coordinates, api):
+        return [
+            ElevationPoint(lat, lng, curvature * (lat - 50.0) ** 2, api['name'], api['accuracy'], 0)
+            for lat, lng in coordinates
+        ]
+    return scrape_with_api
+
+
+@pytest.fixture
+def adaptive_scraper(db):
+    """Adaptive scraper on one fake API, with a 10 m tolerance."""
+    apis = [{'name': 'fake', 'url': '', 'method': 'GET', 'rate_limit': 1000, 'batch_size': 100, 'accuracy': 'medium'}]
+    return ElevationScraper(db, apis=apis, adaptive=True, tolerance=10.0)
+
+
+class TestRefinement:
+    def test_refinement_error(self):
+        """Test the error is what interpolating from every other sample misses."""
+        lats, lngs = np.meshgrid(np.arange(5.0), np.arange(5.0), indexing='ij')
+        assert refinement_error(3 * lats - 2 * lngs + 100) == pytest.approx(0)
+
+        spike = np.zeros((5, 5))
+        spike[1, 3] = 25.0
+        assert refinement_error(spike) == pytest.approx(25.0)
+        spike[1, 3] = np.nan
+        assert refinement_error(spike) == 0
+
+        # Samples at even indices are never checked against anything
+        spike[2, 2] = 40.0
+        assert refinement_error(spike) == pytest.approx(20.0)
+
+    def test_quadrants(self):
+        """Test a cell splits into four quadrants that tile it, one level down."""
+        grid = GridCell(50.0, 51.0, 2.0, 4.0, 2, "root", depth=1)
+        quadrants = grid.quadrants()
+        assert [cell.grid_id for cell in quadrants] == ["root/0", "root/1", "root/2", "root/3"]
+        assert {(cell.lat_min, cell.lat_max, cell.lng_min, cell.lng_max) for cell in quadrants} == {
+            (50.0, 50.5, 2.0, 3.0), (50.0, 50.5, 3.0, 4.0),
+            (50.5, 51.0, 2.0, 3.0), (50.5, 51.0, 3.0, 4.0)
+        }
+        assert all(cell.depth == 2 and cell.priority == 2 for cell in quadrants)
+
+        # Quadrant lattices hold every other sample of their parent's
+        lats, lngs = grid.lattice(4)
+        sub_lats, sub_lngs = quadrants[0].lattice(4)
+        assert np.array_equal(sub_lats[::2, ::2], lats[:3, :3])
+        assert np.array_equal(sub_lngs[::2, ::2], lngs[:3, :3])
+
+    @pytest.mark.parametrize("curvature,subdivides", [(100.0, False), (1000.0, True)])
+    def test_split_threshold(self, db, adaptive_scraper, monkeypatch, curvature, subdivides):
+        """Test a cell is split only when its refinement error is above the tolerance."""
+        # Samples 0.25° apart on a parabola: the error is curvature / 16
+        monkeypatch.setattr(adaptive_scraper, "_scrape_with_api", curved_terrain(curvature))
+        grid = GridCell(50.0, 51.0, 0.0, 1.0, 1, "root")
+        assert asyncio.run(adaptive_scraper.scrape_grid_cell(grid))
+        assert adaptive_scraper.subdivided == int(subdivides)
+
+        claimed = db.claim_grids("a", limit=10)
+        if subdivides:
+            assert sorted(cell.grid_id for cell in claimed) == ["root/0", "root/1", "root/2", "root/3"]
+            assert all(cell.depth == 1 for cell in claimed)
+        else:
+            assert claimed == []
+
+    def test_depth_limit(self, db, adaptive_scraper, monkeypatch):
+        """Test cells at the maximum depth are never split further."""
+        monkeypatch.setattr(adaptive_scraper, "_scrape_with_api", curved_terrain(10_000.0))
+        grid = GridCell(50.0, 51.0, 0.0, 1.0, 1, "deep", depth=ADAPTIVE_MAX_DEPTH)
+        assert asyncio.run(adaptive_scraper.scrape_grid_cell(grid))
+        assert adaptive_scraper.subdivided == 0
+        assert db.claim_grids("a") == []
@@ -0,0 +1,223 @@
+import asyncio
+import numpy as np
+import pytest
+from elevation_common.geodesy import segment_lengths
+from elevation_scraper import ElevationDatabase
+from road_elevation_scraper import DISTANCE_METHOD, MICRODEGREES, RoadElevationDatabase, RoadElevationScraper, RoadSegment
+
+
+class FakeResponse:
+    def __init__(self, status, data=None):
+        self.status = status
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    async def json(self):
+        return self.data
+
+
+class FakeSession:
+    """Stands in for the aiohttp session: answers each POST with ``respond(locations)``.
+
+    ``respond`` returns a list of elevations (None where the API has none),
+    or an HTTP status for a failed request.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+
+    def post(self, url, json=None, timeout=None):
+        locations = [(location['latitude'], location['longitude']) for location in json['locations']]
+        self.requests.append(locations)
+        result = self.respond(locations)
+        if isinstance(result, int):
+            return FakeResponse(result)
+        return FakeResponse(200, {'results': [
+            {'latitude': lat, 'longitude': lng, 'elevation': elevation}
+            for (lat, lng), elevation in zip(locations, result)
+        ]})
+
+
+def by_latitude(locations):
+    """Fake terrain: 1000 m per degree of latitude."""
+    return [round(lat * 1000, 3) for lat, lng in locations]
+
+
+def make_scraper(respond=by_latitude, **kwargs):
+    scraper = RoadElevationScraper(**kwargs)
+    scraper.session = FakeSession(respond)
+    scraper.rate_limit_delay = 0
+    return scraper
+
+
+@pytest.fixture
+def nodes(tmp_path):
+    """Road database (node cache) in a temp directory."""
+    nodes = RoadElevationDatabase(str(tmp_path / "road_elevation.db"))
+    yield nodes
+    nodes.close()
+
+
+@pytest.fixture
+def points(tmp_path):
+    """Grid elevation database in a temp directory."""
+    points = ElevationDatabase(str(tmp_path / "elevation.db"))
+    yield points
+    points.close()
+
+
+class TestPointStore:
+    SAMPLES = [(50.1, 0.1, 0.0), (50.2, 0.2, 10.0)]
+
+    def test_samples_not_stored_by_default(self, points):
+        """Test fetched road samples stay out of the grid database unless asked for."""
+        scraper = make_scraper(points=points)
+        assert asyncio.run(scraper._get_elevation_batch(self.SAMPLES)) == [50100.0, 50200.0]
+        assert np.isnan(points.known_elevations([50.1, 50.2], [0.1, 0.2])).all()
+
+    def test_store_samples(self, points):
+        """Test store_samples adds fetched samples to the grid database, and they are reused."""
+        scraper = make_scraper(points=points, store_samples=True)
+        asyncio.run(scraper._get_elevation_batch(self.SAMPLES))
+        assert points.known_elevations([50.1, 50.2], [0.1, 0.2]).tolist() == [50100.0, 50200.0]
+
+        again = make_scraper(points=points)
+        assert asyncio.run(again._get_elevation_batch(self.SAMPLES)) == [50100.0, 50200.0]
+        assert again.session.requests == []
+        assert again.dedup_stats()['known_points'] == 2
+
+
+def e6(lat, lng):
+    return round(lat * MICRODEGREES), round(lng * MICRODEGREES)
+
+
+class TestNodeCache:
+    def test_cached_nodes(self, nodes):
+        """Test node elevations are returned for nodes still where they were cached."""
+        nodes.save_node_elevations({1: (e6(50.1, 0.1), 120.0), 2: (e6(50.2, 0.2), 80.5)})
+        assert nodes.get_node_elevations({1: e6(50.1, 0.1), 2: e6(50.2, 0.2), 3: e6(50.3, 0.3)}) == {1: 120.0, 2: 80.5}
+        assert nodes.get_node_elevations({}) == {}
+
+    def test_moved_node_is_invalidated(self, nodes):
+        """Test a node that moved is fetched again and its cache entry replaced."""
+        nodes.save_node_elevations({1: (e6(50.1, 0.1), 120.0)})
+        assert nodes.get_node_elevations({1: e6(50.1, 0.100001)}) == {}
+
+        scraper = make_scraper(nodes=nodes)
+        moved = [(50.2, 0.2, 0.0)]
+        assert asyncio.run(scraper._get_elevation_batch(moved, [1])) == [50200.0]
+        assert scraper.session.requests == [[(50.2, 0.2)]]
+        assert nodes.get_node_elevations({1: e6(50.2, 0.2)}) == {1: 50200.0}
+        assert nodes.get_node_elevations({1: e6(50.1, 0.1)}) == {}
+
+    def test_shared_nodes_fetched_once(self, nodes):
+        """Test ways meeting at a node fetch it once, and later batches read it from the cache."""
+        scraper = make_scraper(nodes=nodes)
+        junction = (50.5, 0.5, 0.0)
+        batch = [(50.4, 0.4, 0.0), junction, junction, (50.6, 0.6, 20.0)]
+        assert asyncio.run(scraper._get_elevation_batch(batch, [10, 11, 11, 12])) == [50400.0, 50500.0, 50500.0, 50600.0]
+        assert sum(map(len, scraper.session.requests)) == 3
+
+        assert asyncio.run(scraper._get_elevation_batch([(50.5, 0.5, 5.0)], [11])) == [50500.0]
+        assert sum(map(len, scraper.session.requests)) == 3
+        assert scraper.dedup_stats()['node_hits'] == 1
+        assert scraper.dedup_stats()['duplicates'] == 1
+
+
+def short_road(way_id):
+    """A road of three samples (0, 20 and ~33 m), its own longitude per way id."""
+    lng = way_id / 100
+    return RoadSegment(way_id, 'residential', [(50.0, lng), (50.0003, lng)], length_meters=33.4)
+
+
+def failing(request_number, failure):
+    """Fake API answering by latitude, except for one request: an HTTP status or too few results."""
+    calls = []
+
+    def respond(locations):
+        calls.append(locations)
+        if len(calls) != request_number:
+            return by_latitude(locations)
+        return failure if isinstance(failure, int) else by_latitude(locations)[:failure]
+    return respond
+
+
+class TestPacking:
+    def test_results_scattered_to_their_roads(self):
+        """Test pooled samples are packed into full requests and each road gets its own elevations."""
+        roads = [short_road(way_id) for way_id in range(4)]
+        scraper = make_scraper(batch_size=4)
+        assert [len(scraper._generate_sample_points(road, 20)) for road in roads] == [3, 3, 3, 3]
+
+        profiles, pending = asyncio.run(scraper.sample_roads(roads))
+        assert pending == []
+        assert [len(request) for request in scraper.session.requests] == [4, 4, 4]
+        assert [profile.osm_way_id for profile in profiles] == [0, 1, 2, 3]
+        for road, profile in zip(roads, profiles):
+            assert {sample.lng for sample in profile.elevation_samples} == {road.coordinates[0][1]}
+            assert [sample.elevation for sample in profile.elevation_samples] == [
+                round(sample.lat * 1000, 3) for sample in profile.elevation_samples
+            ]
+            assert profile.total_ascent == pytest.approx(0.3)
+
+    @pytest.mark.parametrize("failure", [500, 2], ids=["failed", "short"])
+    def test_bad_batch_only_loses_its_points(self, failure):
+        """Test a failed or short request leaves None for its own points and only their roads pending."""
+        roads = [short_road(way_id) for way_id in range(4)]
+        scraper = make_scraper(respond=failing(2, failure), batch_size=4)
+        points = [point for road in roads for point in scraper._generate_sample_points(road, 20)]
+
+        elevations = asyncio.run(scraper._get_elevation_batch(points))
+        assert [i for i, elevation in enumerate(elevations) if elevation is None] == [4, 5, 6, 7]
+
+        # Samples 4-7 belong to the second and third roads
+        scraper = make_scraper(respond=failing(2, failure), batch_size=4)
+        profiles, pending = asyncio.run(scraper.sample_roads(roads))
+        assert [profile.osm_way_id for profile in profiles] == [0, 3]
+        assert [road.osm_way_id for road in pending] == [1, 2]
+
+
+def road_length(coordinates):
+    lats, lngs = zip(*coordinates)
+    return float(segment_lengths(lats, lngs, method=DISTANCE_METHOD).sum())
+
+
+class TestSamplePoints:
+    @pytest.mark.parametrize("coordinates", [
+        [(50.0, 0.0), (50.01, 0.0)],  # north, ~1.1 km
+        [(70.0, 10.0), (70.0, 10.03)],  # east far north: a degree of longitude is ~38 km
+        [(50.0, 0.0), (50.004, 0.0), (50.004, 0.006), (50.001, 0.009)]  # bends
+    ], ids=["straight", "high-latitude", "bends"])
+    def test_spacing_and_endpoints(self, coordinates):
+        """Test samples are interval metres apart along the road and end exactly on its end nodes."""
+        road = RoadSegment(1, 'secondary', coordinates)
+        samples = make_scraper()._generate_sample_points(road, 100)
+        lats, lngs, distances = map(np.array, zip(*samples))
+
+        assert (samples[0][0], samples[0][1]) == coordinates[0]
+        assert (samples[-1][0], samples[-1][1]) == coordinates[-1]
+        length = road_length(coordinates)
+        assert distances[-1] == pytest.approx(length)
+        assert np.array_equal(distances[:-1], np.arange(0.0, length, 100))
+        assert 0 < distances[-1] - distances[-2] <= 100
+
+        # Along straight stretches the gap between samples is the interval; a
+        # gap cutting a corner is shorter
+        gaps = segment_lengths(lats, lngs, method=DISTANCE_METHOD)
+        assert gaps[:-1].max() == pytest.approx(100, abs=0.05)
+        assert (gaps[:-1] <= 100 + 0.05).all()
+        if len(coordinates) == 2:
+            assert gaps[:-1] == pytest.approx(100, abs=0.05)
+
+    def test_road_shorter_than_interval(self):
+        """Test a road shorter than the interval is sampled at its two ends."""
+        road = short_road(1)
+        samples = make_scraper()._generate_sample_points(road, 100)
+        assert [(lat, lng) for lat, lng, _ in samples] == road.coordinates
+        assert samples[-1][2] == pytest.approx(road_length(road.coordinates))
@@ -0,0 +1,127 @@
+import pytest
+import sqlite3
+import time
+from sqlite_writer import SQLiteWriter, read_connection
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll until condition() holds, for results the writer thread commits in the background"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def count_points(db_path):
+    conn = read_connection(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM points").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def insert(value):
+    return lambda conn: conn.execute("INSERT INTO points (value) VALUES (?)", (value,))
+
+
+def make_writer(tmp_path, **kwargs):
+    writer = SQLiteWriter(str(tmp_path / "writer.db"), **kwargs)
+    writer.execute(lambda conn: conn.execute("CREATE TABLE points (value INTEGER NOT NULL)"))
+    return writer
+
+
+@pytest.fixture
+def writer(tmp_path):
+    """Writer that only commits on flush, a full queue or close."""
+    writer = make_writer(tmp_path, max_rows=10, max_delay=60)
+    yield writer
+    writer.close()
+
+
+class TestSQLiteWriter:
+    def test_full_queue_commits_in_one_transaction(self, writer):
+        """Test writes are batched until they add up to max_rows."""
+        transactions = writer.stats()["transactions"]
+        for value in range(3):
+            writer.submit(insert(value), rows=3)
+        time.sleep(0.1)
+        assert count_points(writer.db_path) == 0
+
+        writer.submit(insert(3), rows=3)
+        wait_for(lambda: count_points(writer.db_path) == 4)
+        assert writer.stats()["transactions"] == transactions + 1
+        assert writer.stats()["queued_rows"] == 0
+
+    def test_oldest_write_commits_after_max_delay(self, tmp_path):
+        """Test a queue below max_rows is committed once its oldest write is max_delay old."""
+        writer = make_writer(tmp_path, max_rows=1000, max_delay=0.3)
+        try:
+            transactions = writer.stats()["transactions"]
+            writer.submit(insert(1))
+            writer.submit(insert(2))
+            assert count_points(writer.db_path) == 0
+            wait_for(lambda: count_points(writer.db_path) == 2)
+            assert writer.stats()["transactions"] == transactions + 1
+        finally:
+            writer.close()
+
+    def test_failing_write_is_dropped_alone(self, writer):
+        """Test a bad write is dropped while the rest of its batch still commits."""
+        writer.submit(insert(1))
+        writer.submit(insert(None))  # NOT NULL constraint
+        writer.submit(lambda conn: conn.execute("INSERT INTO points (value) VALUES (?)", (object(),)))
+        writer.submit(insert(2))
+        writer.flush()
+
+        conn = read_connection(writer.db_path)
+        assert [value for (value,) in conn.execute("SELECT value FROM points ORDER BY value")] == [1, 2]
+        conn.close()
+        assert writer.stats()["failed"] == 2
+
+    def test_execute_runs_after_queued_writes(self, writer):
+        """Test execute sees every write queued before it and returns its result."""
+        for value in range(3):
+            writer.submit(insert(value))
+        assert writer.execute(lambda conn: conn.execute("SELECT COUNT(*) FROM points").fetchone()[0]) == 3
+
+        with pytest.raises(sqlite3.OperationalError):
+            writer.execute(lambda conn: conn.execute("SELECT * FROM missing"))
+        assert writer.stats()["failed"] == 0
+        writer.submit(insert(4))
+        writer.flush()
+        assert count_points(writer.db_path) == 4
+
+    def test_close_flushes(self, tmp_path):
+        """Test close commits the queue and further writes are refused."""
+        writer = make_writer(tmp_path, max_rows=1000, max_delay=60)
+        for value in range(5):
+            writer.submit(insert(value))
+        writer.close()
+        assert count_points(writer.db_path) == 5
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            writer.submit(insert(6))
+        writer.close()
+
+    def test_locked_database_is_retried(self, tmp_path):
+        """Test writes wait out another process's lock instead of being dropped, without blocking submit."""
+        writer = make_writer(tmp_path, max_rows=1000, max_delay=0.05, busy_retry_delay=0.01)
+        try:
+            writer.execute(lambda conn: conn.execute("PRAGMA busy_timeout = 20"))
+            other = sqlite3.connect(writer.db_path, isolation_level=None)
+            other.execute("BEGIN IMMEDIATE")
+
+            started = time.monotonic()
+            for value in range(3):
+                writer.submit(insert(value))
+            assert time.monotonic() - started < 0.05
+            wait_for(lambda: writer.stats()["busy_retries"] >= 2)
+            assert count_points(writer.db_path) == 0
+
+            other.execute("COMMIT")
+            other.close()
+            writer.flush()
+            assert count_points(writer.db_path) == 3
+            assert writer.stats()["failed"] == 0
+        finally:
+            writer.close()
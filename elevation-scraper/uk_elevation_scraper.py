@@ -8,7 +8,7 @@ Covers all the iconic UK cycling regions from London to the Highlands.
 
 import asyncio
 import logging
-from road_elevation_scraper import OSMRoadExtractor, RoadElevationScraper, RoadElevationDatabase
+from road_elevation_scraper import ROADS_PER_PACK, OSMRoadExtractor, RoadElevationScraper, RoadElevationDatabase
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -144,20 +144,30 @@ class UKElevationScraper:
         
         osm_extractor = OSMRoadExtractor()
         
-        async with RoadElevationScraper() as scraper:
+        # Overlapping regions re-extract the same ways: the node cache and the
+        # point store make their junctions and samples a single fetch
+        from elevation_scraper import ElevationDatabase
+        points = ElevationDatabase("elevation.db")
+        
+        async with RoadElevationScraper(points=points, nodes=self.db) as scraper:
             for region in UK_CYCLING_REGIONS:
                 await self._process_region(region, osm_extractor, scraper)
                 
                 # Show progress after each region
                 stats = self.db.get_stats()
+                dedup = scraper.dedup_stats(reset=True)
                 logger.info("")
                 logger.info(f"🎯 PROGRESS UPDATE:")
+                logger.info(f"   {region['name']}: {dedup['samples']:,} samples, {dedup['requested']:,} requested "
+                          f"(dedup ratio {dedup['dedup_ratio']:.1%}: {dedup['node_hits']:,} cached nodes, "
+                          f"{dedup['known_points']:,} known points, {dedup['duplicates']:,} repeats)")
                 logger.info(f"   Total segments: {stats['total_segments']:,}")
                 logger.info(f"   Total road length: {stats['total_length_km']:.1f} km")
                 logger.info(f"   Regions completed: {UK_CYCLING_REGIONS.index(region) + 1}/{len(UK_CYCLING_REGIONS)}")
                 logger.info("=" * 60)
                 logger.info("")
                 
+        points.close()
         await self._generate_final_report()
     
     async def _process_region(self, region, osm_extractor, scraper):
@@ -176,36 +186,49 @@ class UKElevationScraper:
                 
             logger.info(f"✅ Found {len(roads):,} cyclable roads")
             
-            # Process roads with progress updates
-            for i, road in enumerate(roads):
+            # Process roads in packs whose samples share full API requests
+            pending = []
+            for start in range(0, len(roads), ROADS_PER_PACK):
+                pack = roads[start:start + ROADS_PER_PACK]
+                try:
+                    profiles, failed = await scraper.sample_roads(pack, sample_interval=15)
+                except Exception as e:
+                    logger.error(f"❌ Error processing roads {start + 1:,}-{start + len(pack):,}: {e}")
+                    continue
+                pending.extend(failed)
+                self._save_profiles(profiles)
+                
+                # Progress updates after every pack
+                done = start + len(pack)
+                percentage = (done / len(roads)) * 100
+                logger.info(f"   Progress: {done:,}/{len(roads):,} roads ({percentage:.1f}%) "
+                          f"| {scraper.request_count:,} elevation requests")
+            
+            # Roads with samples lost to failed requests get one more pass; the
+            # rest are sampled again by the next run
+            for start in range(0, len(pending), ROADS_PER_PACK):
                 try:
-                    # Sample elevation along road
-                    profile = await scraper.sample_road_elevation(road, sample_interval=15)
-                    
-                    # Save to database
-                    self.db.save_road_profile(profile)
-                    
-                    self.total_roads_processed += 1
-                    self.total_km_covered += profile.length_meters / 1000
-                    
-                    # Progress updates every 100 roads
-                    if (i + 1) % 100 == 0:
-                        percentage = ((i + 1) / len(roads)) * 100
-                        logger.info(f"   Progress: {i+1:,}/{len(roads):,} roads ({percentage:.1f}%) "
-                                  f"| Latest: {road.road_type} - {profile.max_gradient:.1f}% max gradient")
-                    
-                    # Respectful delay for APIs
-                    await asyncio.sleep(0.3)
-                    
+                    profiles, failed = await scraper.sample_roads(pending[start:start + ROADS_PER_PACK], sample_interval=15)
                 except Exception as e:
-                    logger.error(f"❌ Error processing road {road.osm_way_id}: {e}")
+                    logger.error(f"❌ Error retrying pending roads: {e}")
                     continue
+                self._save_profiles(profiles)
+                if failed:
+                    logger.warning(f"⚠️  {len(failed):,} roads still without complete elevations, left for the next run")
             
             logger.info(f"✅ {region['name']} complete! Processed {len(roads):,} roads")
             
         except Exception as e:
             logger.error(f"❌ Error processing region {region['name']}: {e}")
     
+    def _save_profiles(self, profiles):
+        """Save sampled road profiles and count them towards the totals"""
+        for profile in profiles:
+            self.db.save_road_profile(profile)
+            
+            self.total_roads_processed += 1
+            self.total_km_covered += profile.length_meters / 1000
+    
     async def _generate_final_report(self):
         """Generate comprehensive final report"""
         stats = self.db.get_stats()
@@ -12,26 +12,93 @@ interface OpenElevationResponse {
   }>
 }
 
+interface RouteProfileResponse {
+  distance: number
+  ascent: number
+  descent: number
+  min_elevation: number
+  max_elevation: number
+  samples: Array<{
+    distance: number
+    elevation: number
+    gradient: number | null
+  }>
+}
+
+interface RouteElevationProfile {
+  ascent: number
+  descent: number
+  maxElevation: number
+  minElevation: number
+  profile: ElevationPoint[]
+}
+
 class ElevationService {
   // Use local elevation service (with fallback to external APIs)
   private baseUrl = 'http://localhost:8000/api/elevation/lookup'
+  private profileUrl = 'http://localhost:8000/api/elevation/profile'
   private fallbackUrl = 'https://api.open-elevation.com/api/v1/lookup'
   
+  // Keep charts to at most ~1000 samples; never finer than 20m
+  private minSampleInterval = 20
+  private maxProfileSamples = 1000
+  
+  /**
+   * Fetches the route's elevation profile
+   * The local service resamples the whole route and computes gradients server-side;
+   * if it is unavailable, a subsample is looked up point by point instead
+   */
+  async getRouteElevationProfile(
+    coordinates: [number, number][], 
+    totalDistance: number
+  ): Promise<RouteElevationProfile> {
+    try {
+      return await this.getServerProfile(coordinates, totalDistance)
+    } catch (profileError) {
+      console.warn('Local profile service failed, looking up points instead:', profileError)
+      return this.getLookupProfile(coordinates, totalDistance)
+    }
+  }
+  
+  private async getServerProfile(
+    coordinates: [number, number][],
+    totalDistance: number
+  ): Promise<RouteElevationProfile> {
+    const interval = Math.max(this.minSampleInterval, Math.ceil(totalDistance / this.maxProfileSamples))
+    const response = await fetch(this.profileUrl, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json'
+      },
+      body: JSON.stringify({ coordinates, interval })
+    })
+    
+    if (!response.ok) {
+      throw new Error(`Profile service failed: ${response.status}`)
+    }
+    
+    const data: RouteProfileResponse = await response.json()
+    return {
+      ascent: data.ascent,
+      descent: data.descent,
+      maxElevation: data.max_elevation,
+      minElevation: data.min_elevation,
+      profile: data.samples.map(sample => ({
+        distance: Math.round(sample.distance),
+        elevation: sample.elevation,
+        grade: sample.gradient ?? 0
+      }))
+    }
+  }
   
   /**
    * Fetches real elevation data for route coordinates using Open-Topo-Data API
    * Uses ASTER 30m dataset which provides good global coverage
    */
-  async getRouteElevationProfile(
+  private async getLookupProfile(
     coordinates: [number, number][], 
     totalDistance: number
-  ): Promise<{
-    ascent: number
-    descent: number
-    maxElevation: number
-    minElevation: number
-    profile: ElevationPoint[]
-  }> {
+  ): Promise<RouteElevationProfile> {
     try {
       // Limit coordinates to reasonable number for API (max 100 points)
       const maxPoints = 100